@@ -220,7 +220,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     detailsHTML += `<li><strong>No. of Questions:</strong> ${data.subject.question_length || 'Not set'}</li>`;
                     detailsHTML += `<li><strong>Question File:</strong> ${data.subject.question_template_filename || 'Not set'}</li>`;
                     detailsHTML += `<li><strong>Answer File:</strong> ${data.subject.answer_template_filename || 'Not set'}</li>`;
-                    detailsHTML += `<li><strong>Contains Images:</strong> ${data.subject.contains_images ? 'Yes' : 'No'}</li>`;
+                    detailsHTML += `<li><strong>Contains Images:</strong> ${data.subject.auto_detect_images ? 'Auto-detect' : data.subject.contains_images ? 'Yes' : 'No'}</li>`;
                 } else {
                     detailsHTML += `<li><strong>Subject Details:</strong> Not set</li>`;
                 }
@@ -0,0 +1,141 @@
+# answer_vectors.py packs answer sheets into one byte per question for storage, marking and analytics
+
+import re
+from collections import Counter
+from functools import lru_cache
+
+# A packed answer sheet is a bytes object whose byte i is the answer to question
+# i + 1 ('q1' is byte 0):
+#   0x00         unanswered
+#   0x01 - 0x7F  the options chosen among A-G, one bit each (A = 0x01, B = 0x02,
+#                C = 0x04, ...); a multi-select answer 'A,C' is 0x05
+#   0x87 - 0x99  a single option H-Z, 0x80 + its position in the alphabet
+#   0xFF         an answer that is none of these
+# Answer keys use the same bytes, with NO_KEY for questions the key does not
+# cover; no student answer ever encodes to it, so those questions score nothing.
+UNANSWERED = 0x00
+NO_KEY = 0xFE
+UNRECOGNIZED = 0xFF
+MULTI_SELECT_OPTIONS = 7  # A-G, the options that fit in the low seven bits
+MAX_QUESTIONS = 4096      # Longest sheet accepted from a student
+
+OPTION_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_SEPARATORS = re.compile(r'[\s,;/|+&]+')
+_QUESTION_KEY = re.compile(r'^q(\d+)$', re.IGNORECASE)
+
+
+def encode_answer(text):
+    """Returns the byte for one answer, e.g. 'b' -> 0x02, 'A, C' -> 0x05, 'H' -> 0x87."""
+    letters = _SEPARATORS.sub('', str(text)).upper()
+    if not letters:
+        return UNANSWERED
+    if not (letters.isascii() and letters.isalpha()) or len(set(letters)) != len(letters):
+        return UNRECOGNIZED
+    if len(letters) == 1:
+        position = ord(letters) - ord('A')
+        return 1 << position if position < MULTI_SELECT_OPTIONS else 0x80 | position
+    mask = 0
+    for letter in letters:
+        position = ord(letter) - ord('A')
+        if position >= MULTI_SELECT_OPTIONS:
+            return UNRECOGNIZED
+        mask |= 1 << position
+    return mask
+
+
+def decode_answer(byte):
+    """Reverses `encode_answer`: the option letters of a byte ('A,C' for 0x05), '' if unanswered."""
+    if byte in (UNANSWERED, NO_KEY):
+        return ''
+    if byte == UNRECOGNIZED:
+        return '?'
+    if byte & 0x80:
+        return OPTION_LETTERS[byte & 0x7F]
+    return ','.join(OPTION_LETTERS[i] for i in range(MULTI_SELECT_OPTIONS) if byte & (1 << i))
+
+
+def question_number(key):
+    """Returns the number of a question key such as 'q12', or None for any other key."""
+    match = _QUESTION_KEY.match(str(key))
+    return int(match.group(1)) if match else None
+
+
+def pack_answers(answers, length=None):
+    """
+    Packs a student's answers, {'q1': 'A', ...}, into one byte per question.
+    Keys that are not question keys are ignored. The sheet runs to the highest
+    question answered unless `length` is given.
+    """
+    positions = {}
+    for key, text in answers.items():
+        number = question_number(key)
+        if number is not None and 0 < number <= MAX_QUESTIONS:
+            positions[number - 1] = encode_answer(text)
+    if length is None:
+        length = max(positions, default=-1) + 1
+    sheet = bytearray(length)
+    for position, byte in positions.items():
+        if position < length:
+            sheet[position] = byte
+    return bytes(sheet)
+
+
+def pack_answer_key(answer_key):
+    """Packs an answer key, {'q1': 'A', ...}; questions without a usable answer become NO_KEY."""
+    key = bytearray(pack_answers(answer_key))
+    for position, byte in enumerate(key):
+        if byte in (UNANSWERED, UNRECOGNIZED):
+            key[position] = NO_KEY
+    return bytes(key)
+
+
+def unpack_answers(sheet):
+    """Returns a packed sheet as {'q1': 'A', ...}, leaving out unanswered questions."""
+    return {f"q{position + 1}": decode_answer(byte) for position, byte in enumerate(sheet)
+            if byte not in (UNANSWERED, NO_KEY)}
+
+
+@lru_cache(maxsize=64)
+def _byte_masks(length):
+    low_bits = int.from_bytes(b'\x7f' * length, 'little')
+    high_bits = int.from_bytes(b'\x80' * length, 'little')
+    return low_bits, high_bits
+
+
+def score(answer_key, sheet):
+    """
+    Counts the questions where `sheet` matches the packed `answer_key`. Both are
+    compared whole, as integers: the XOR of two sheets has a zero byte exactly
+    where they agree, and those bytes are found and counted with word-wide
+    arithmetic instead of a loop over the questions.
+    """
+    length = len(answer_key)
+    sheet = sheet[:length].ljust(length, b'\x00')
+    difference = int.from_bytes(answer_key, 'little') ^ int.from_bytes(sheet, 'little')
+    low_bits, high_bits = _byte_masks(length)
+    # Bit 7 of each byte ends up set if and only if that byte of `difference` is zero.
+    zero_bytes = ~(((difference & low_bits) + low_bits) | difference | low_bits) & high_bits
+    return bin(zero_bytes).count('1')
+
+
+def question_statistics(answer_key, sheets):
+    """
+    Item analysis over packed sheets: for each question of the key, its correct
+    answer, how many students answered it and got it right, and how many chose
+    each answer.
+    """
+    sheets = list(sheets)
+    statistics = []
+    for position, correct in enumerate(answer_key):
+        if correct == NO_KEY:
+            continue
+        chosen = Counter(sheet[position] for sheet in sheets if position < len(sheet))
+        chosen.pop(UNANSWERED, None)
+        statistics.append({
+            'question': position + 1,
+            'answer': decode_answer(correct),
+            'answered': sum(chosen.values()),
+            'correct': chosen.get(correct, 0),
+            'choices': {decode_answer(byte): count for byte, count in sorted(chosen.items())},
+        })
+    return statistics
@@ -0,0 +1,53 @@
+# asset_store.py a content-addressed store for images extracted from exam documents
+
+import os
+import re
+import hashlib
+import logging
+import threading
+
+
+logger = logging.getLogger('asset_store')
+
+# Asset names are the sha256 of the bytes plus an extension, e.g. '3fa9...c2.png'.
+ASSET_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{2,5}$')
+
+
+class AssetStore:
+    """
+    Writes each distinct image to disk exactly once, named after the hash of its
+    bytes, and hands back a short URL for it. Because an asset's name is derived
+    from its content, the bytes behind a URL never change and browsers can cache
+    them forever.
+
+    The store only holds paths, so it can be passed to extraction worker processes.
+    """
+
+    def __init__(self, root_dir, url_prefix='/assets'):
+        self.root_dir = root_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def put(self, data, ext):
+        """Stores `data` (bytes) if it is not already present and returns its URL."""
+        ext = re.sub(r'[^a-z0-9]', '', ext.lower())[:5] or 'bin'
+        if ext == 'jpeg':
+            ext = 'jpg'
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)  # Atomic, so a concurrent reader never sees a partial file
+        return f"{self.url_prefix}/{name}"
+
+    def path_for(self, name):
+        """
+        Returns the on-disk path of an asset, or None if `name` is not a valid
+        asset name. Assets are sharded by the first two hex digits of their hash.
+        """
+        if not ASSET_NAME_PATTERN.match(name):
+            return None
+        return os.path.join(self.root_dir, name[:2], name)
@@ -0,0 +1,139 @@
+# bench_compression.py compares response sizes and compression latency on a sample text exam
+#
+# Usage:
+#   python benchmarks/bench_compression.py
+#   python benchmarks/bench_compression.py --questions 100 --students 300 --mbps 20 --output results.json
+#
+# The exam document is rendered by exam_store, as the server renders it.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import response_compression
+import question_index
+import exam_store
+
+# (label, encoding, level): no compression, the level used per request, and the
+# level used once for stored exam payloads.
+METHODS = [('identity', None, None)]
+for _encoding in response_compression.SUPPORTED_ENCODINGS:
+    METHODS.append((f"{_encoding}-{response_compression.DYNAMIC_LEVELS[_encoding]} (per request)",
+                    _encoding, response_compression.DYNAMIC_LEVELS[_encoding]))
+    METHODS.append((f"{_encoding}-{response_compression.STATIC_LEVELS[_encoding]} (stored)",
+                    _encoding, response_compression.STATIC_LEVELS[_encoding]))
+
+
+WORDS = ("the of and to in is that for it as was with be by on not he this are or his from at which but have an "
+         "they you were her she there been one all we their has would when if so no what up out who them some "
+         "could into its then two more these other time may only first over new such than most water cell energy "
+         "force price market voter river plant number angle reaction history author passage meaning colony").split()
+
+
+def make_sample_pages(questions, per_page=5, seed=1):
+    """A text exam as extractdocx yields it: numbered questions with four options each."""
+    rng = random.Random(seed)
+    sentence = lambda words: ' '.join(rng.choice(WORDS) for _ in range(words))
+    pages = []
+    for start in range(1, questions + 1, per_page):
+        text = ''
+        for number in range(start, min(start + per_page, questions + 1)):
+            text += f"{number}. {sentence(rng.randint(12, 30)).capitalize()}?\n"
+            for option in 'ABCD':
+                text += f"{option}. {sentence(rng.randint(2, 8))}\n"
+        pages.append({'page': len(pages) + 1, 'blocks': [{'text': text, 'formulas': []}], 'images': []})
+    return pages
+
+
+def sample_payloads(questions):
+    """Returns {name: bytes} for the responses that carry a sample exam."""
+    pages = make_sample_pages(questions)
+    document = exam_store.format_extracted_document_with_embedded_images(pages)
+    index = question_index.build_question_index(enumerate(pages, start=1))
+    answers = {f"q{number}": 'ABCD'[number % 4] for number in range(1, questions + 1)}
+    return {
+        'exam document (HTML)': document.encode('utf-8'),
+        'question index (JSON)': json.dumps(index).encode('utf-8'),
+        'score and answers (JSON)': json.dumps({
+            'score': questions // 2, 'student_answers': answers, 'correct_answers': answers,
+        }).encode('utf-8'),
+    }
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_payload(name, data, repeat, mbps):
+    """Returns one result row per compression method for a payload."""
+    rows = []
+    for label, encoding, level in METHODS:
+        if encoding is None:
+            body, compress_s, decompress_s = data, 0.0, 0.0
+        else:
+            body = response_compression.compress(data, encoding, level)
+            compress_s = best_time(lambda: response_compression.compress(data, encoding, level), repeat)
+            decompress_s = best_time(lambda: response_compression.decompress(body, encoding), repeat)
+        rows.append({
+            'payload': name,
+            'method': label,
+            'bytes': len(body),
+            'ratio': len(data) / len(body),
+            'compress_ms': compress_s * 1000,
+            'decompress_ms': decompress_s * 1000,
+            'transfer_ms': len(body) * 8 / (mbps * 1e6) * 1000,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response compression on a sample text exam.")
+    parser.add_argument('--questions', type=int, default=100, help="Questions in the sample exam.")
+    parser.add_argument('--students', type=int, default=300, help="Students served the same exam document.")
+    parser.add_argument('--mbps', type=float, default=20.0, help="Bandwidth shared by the exam hall, in Mbit/s.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    payloads = sample_payloads(args.questions)
+    results = []
+    print(f"{'payload':>25} {'method':>22} {'bytes':>8} {'ratio':>6} {'compress ms':>12} "
+          f"{'decompress ms':>14} {'transfer ms':>12}")
+    for name, data in payloads.items():
+        for row in benchmark_payload(name, data, args.repeat, args.mbps):
+            results.append(row)
+            print(f"{row['payload']:>25} {row['method']:>22} {row['bytes']:>8} {row['ratio']:>6.2f} "
+                  f"{row['compress_ms']:>12.3f} {row['decompress_ms']:>14.3f} {row['transfer_ms']:>12.2f}")
+
+    # Serving one exam document to a whole hall: compressing it on every request
+    # against sending the copy that was compressed once when it was stored.
+    document_rows = [row for row in results if row['payload'] == 'exam document (HTML)']
+    identity = document_rows[0]
+    print(f"\nServing the exam document to {args.students} students at {args.mbps:g} Mbit/s:")
+    print(f"{'method':>22} {'server CPU (ms)':>16} {'total egress (KB)':>18} {'hall transfer (s)':>18}")
+    for row in document_rows:
+        stored = row['method'].endswith('(stored)')
+        cpu_ms = row['compress_ms'] * (1 if stored else args.students)
+        egress = row['bytes'] * args.students
+        print(f"{row['method']:>22} {cpu_ms:>16.1f} {egress / 1024:>18.1f} "
+              f"{row['transfer_ms'] * args.students / 1000:>18.2f}")
+    print(f"(uncompressed: {identity['bytes'] * args.students / 1024:.1f} KB)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
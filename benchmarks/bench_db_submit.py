@@ -0,0 +1,215 @@
+# bench_db_submit.py measures how many exam submissions per second the database layer sustains
+#
+# Usage:
+#   python benchmarks/bench_db_submit.py
+#   python benchmarks/bench_db_submit.py --students 50 200 500 --questions 60 --output results.json
+#
+# Every student submits at the same moment, as a hall does when the timer runs
+# out. Each submission does the database work of /mark: read the exam's answers,
+# then write the student's answers and score to their attempt. It is run with
+#   - per-request connections: a new connection for the read and another for
+#     the write, in SQLite's default rollback-journal mode, as before pooling;
+#   - pooled WAL connections: one connection from db_pool, in WAL mode;
+#   - write-behind queue: the answers are scored against the packed answer key
+#     kept in memory, and the packed sheet goes to submission_queue's log, whose
+#     writer stores the submissions in batched transactions (as /mark does now).
+# The schema comes from exam_store, as the server creates it.
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import ConnectionPool, DEFAULT_PRAGMAS
+from submission_queue import SubmissionQueue
+import answer_vectors
+import exam_store
+
+
+def make_database(path, template, students, questions):
+    """Copies the empty server schema to `path` and adds one exam with an attempt per student."""
+    with sqlite3.connect(template) as source, sqlite3.connect(path) as target:
+        source.backup(target)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")  # Start every variant from SQLite's default
+    answers = {f"q{number}": random.choice('abcd') for number in range(1, questions + 1)}
+    cursor = conn.execute(
+        "INSERT INTO exam_sessions (session_id, admin_username, exam_code, extracted_answers_json) "
+        "VALUES ('bench', 'admin1', 'BENCH1', ?)",
+        (json.dumps(answers),)
+    )
+    exam_id = cursor.lastrowid
+    attempt_ids = [
+        conn.execute(
+            "INSERT INTO exam_attempts (exam_session_id, student_details_json) VALUES (?, ?)",
+            (exam_id, json.dumps({'name': f"Student {i}", 'class': 'SS2'}))
+        ).lastrowid
+        for i in range(students)
+    ]
+    conn.commit()
+    conn.close()
+    return attempt_ids
+
+
+def score_answers(read_conn, attempt_id, student_answers):
+    exam = read_conn.execute(
+        """SELECT e.extracted_answers_json FROM exam_attempts a
+           JOIN exam_sessions e ON e.id = a.exam_session_id WHERE a.id = ?""",
+        (attempt_id,)
+    ).fetchone()
+    correct_answers = json.loads(exam[0])
+    return sum(student_answers.get(q, '') == answer for q, answer in correct_answers.items())
+
+
+def mark(read_conn, write_conn, attempt_id, student_answers):
+    score = score_answers(read_conn, attempt_id, student_answers)
+    write_conn.execute(
+        """UPDATE exam_attempts SET student_answers_json = ?, student_score = ?,
+           submitted_at = CURRENT_TIMESTAMP WHERE id = ?""",
+        (json.dumps(student_answers), score, attempt_id)
+    )
+    write_conn.commit()
+
+
+def submit_per_request(path):
+    def submit(attempt_id, answers):
+        read_conn, write_conn = sqlite3.connect(path), sqlite3.connect(path)
+        try:
+            mark(read_conn, write_conn, attempt_id, answers)
+        finally:
+            read_conn.close()
+            write_conn.close()
+    return submit, lambda: None
+
+
+def submit_pooled(path):
+    pool = ConnectionPool(path, max_idle=32)
+
+    def submit(attempt_id, answers):
+        with pool.connect() as conn:
+            mark(conn, conn, attempt_id, answers)
+    return submit, pool.close_all
+
+
+def submit_write_behind(path):
+    write_pool = ConnectionPool(path, max_idle=1, pragmas=DEFAULT_PRAGMAS + (('synchronous', 'FULL'),))
+    with write_pool.connect() as conn:
+        # Loaded once, as the exam registry does when the exam code is generated.
+        answer_key = answer_vectors.pack_answer_key(json.loads(conn.execute(
+            "SELECT extracted_answers_json FROM exam_sessions WHERE exam_code = 'BENCH1'"
+        ).fetchone()[0]))
+    queue = SubmissionQueue(f"{path}-queue", lambda records: write_batch(write_pool, records))
+
+    def submit(attempt_id, answers):
+        sheet = answer_vectors.pack_answers(answers)
+        score = answer_vectors.score(answer_key, sheet)
+        queue.submit({'attempt_id': attempt_id, 'answer_vector': sheet.hex(), 'score': score})
+
+    def close():
+        queue.close()  # Waits for the writer, so the run includes storing every submission
+        write_pool.close_all()
+    return submit, close
+
+
+def write_batch(pool, records):
+    with pool.connect() as conn:
+        conn.executemany(
+            """UPDATE exam_attempts SET answer_vector = ?, student_score = ?,
+               submitted_at = CURRENT_TIMESTAMP WHERE id = ?""",
+            [(bytes.fromhex(r['answer_vector']), r['score'], r['attempt_id']) for r in records]
+        )
+
+
+VARIANTS = [
+    ('per-request connections', submit_per_request),
+    ('pooled WAL connections', submit_pooled),
+    ('write-behind queue', submit_write_behind),
+]
+
+
+def run(variant, path, attempt_ids, questions):
+    """Submits every attempt at once, one thread per student; returns the result row."""
+    submit, close = variant(path)
+    submissions = [
+        (attempt_id, {f"q{number}": random.choice('abcd') for number in range(1, questions + 1)})
+        for attempt_id in attempt_ids
+    ]
+    start_line = threading.Barrier(len(submissions))
+    latencies, failures = [], []
+
+    def student(submission):
+        start_line.wait()
+        start = time.perf_counter()
+        try:
+            submit(*submission)
+        except sqlite3.Error as e:
+            failures.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(submissions)) as executor:
+        list(executor.map(student, submissions))
+    close()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        'submitted': len(latencies),
+        'failed': len(failures),
+        'seconds': elapsed,
+        'per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure exam submission throughput of the database layer.")
+    parser.add_argument('--students', type=int, nargs='+', default=[50, 200, 500],
+                        help="Concurrent students per run.")
+    parser.add_argument('--questions', type=int, default=60, help="Questions in the exam.")
+    parser.add_argument('--output', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+    random.seed(1)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)  # exam_store creates users.db, with its schema, in the working directory
+        try:
+            exam_store.init_db()
+            exam_store.db_pool.close_all()
+            template = os.path.join(tmp_dir, exam_store.DATABASE_NAME)
+
+            print(f"{'students':>8} {'variant':>24} {'submitted':>9} {'failed':>6} {'seconds':>8} "
+                  f"{'per second':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            for students in args.students:
+                for label, variant in VARIANTS:
+                    path = os.path.join(tmp_dir, f"bench-{students}-{len(results)}.db")
+                    attempt_ids = make_database(path, template, students, args.questions)
+                    row = {'students': students, 'variant': label, **run(variant, path, attempt_ids, args.questions)}
+                    results.append(row)
+                    print(f"{students:>8} {label:>24} {row['submitted']:>9} {row['failed']:>6} {row['seconds']:>8.2f} "
+                          f"{row['per_second']:>10.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        finally:
+            os.chdir(cwd)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
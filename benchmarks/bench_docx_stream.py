@@ -0,0 +1,104 @@
+# bench_docx_stream.py compares the streaming DOCX reader with python-docx
+#
+# Usage:
+#   python benchmarks/bench_docx_stream.py                          (synthetic question banks)
+#   python benchmarks/bench_docx_stream.py --docx bank.docx --repeat 5
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Inches
+from PIL import Image
+import docx_stream
+
+
+def make_sample_docx(path, questions, table_every=10, image_every=25):
+    """Writes a synthetic question bank: four options per question, with some tables and images."""
+    doc = Document()
+    for number in range(1, questions + 1):
+        doc.add_paragraph(f"{number}. Sample question number {number}, asking about topic {number % 17}?")
+        for option in "ABCD":
+            doc.add_paragraph(f"{option}. Option {option} for question {number}")
+        if table_every and number % table_every == 0:
+            table = doc.add_table(rows=3, cols=3)
+            for row_num, row in enumerate(table.rows):
+                for col_num, cell in enumerate(row.cells):
+                    cell.text = f"r{row_num}c{col_num}"
+        if image_every and number % image_every == 0:
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 64), (number % 255, 90, 160)).save(buffer, 'PNG')
+            buffer.seek(0)
+            doc.add_picture(buffer, width=Inches(1))
+    doc.save(path)
+
+
+def python_docx_text(path):
+    """The reading path used before the streaming reader: body paragraphs via python-docx."""
+    doc = Document(path)
+    images = [rel.target_part.blob for rel in doc.part.rels.values() if "image" in rel.target_ref]
+    return '\n'.join(para.text for para in doc.paragraphs), images
+
+
+def streaming_text(path):
+    """Body paragraphs, tables and image bytes via docx_stream."""
+    text, images = [], []
+    with docx_stream.DocxReader(path) as reader:
+        for block in reader.iter_blocks():
+            if block['type'] == 'image':
+                images.append(reader.read_part(block['part']))
+            else:
+                text.append(docx_stream.block_text(block))
+    return '\n'.join(text), images
+
+
+def measure(function, path, repeat):
+    """Returns the best wall-clock time of `repeat` calls and the peak traced memory of one."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming DOCX reading against python-docx.")
+    parser.add_argument('--docx', help="DOCX to benchmark. Synthetic question banks are generated if omitted.")
+    parser.add_argument('--questions', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="Questions in each synthetic bank.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.docx:
+            paths = [args.docx]
+        else:
+            paths = []
+            for questions in args.questions:
+                path = os.path.join(tmp_dir, f'bank-{questions}.docx')
+                make_sample_docx(path, questions)
+                paths.append(path)
+
+        print(f"{'document':>16} {'python-docx (s)':>16} {'stream (s)':>11} {'speedup':>8} "
+              f"{'python-docx peak':>17} {'stream peak':>12}")
+        for path in paths:
+            docx_time, docx_peak = measure(python_docx_text, path, args.repeat)
+            stream_time, stream_peak = measure(streaming_text, path, args.repeat)
+            print(f"{os.path.basename(path):>16} {docx_time:>16.3f} {stream_time:>11.3f} {docx_time / stream_time:>7.2f}x "
+                  f"{docx_peak / 1e6:>15.1f}MB {stream_peak / 1e6:>10.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# bench_pdf_parallel.py compares serial and process-pool PDF extraction
+#
+# Usage:
+#   python benchmarks/bench_pdf_parallel.py                     (synthetic 60-page paper)
+#   python benchmarks/bench_pdf_parallel.py --pdf exam.pdf --workers 1 2 4 8
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import extractdocx
+
+
+def make_sample_pdf(path, pages):
+    """Writes a synthetic exam paper with a question and a small graphic on each page."""
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"{page_num + 1}. Sample question text for page {page_num + 1}.", fontsize=12)
+            for option_num, option in enumerate("ABCD"):
+                page.insert_text((90, 100 + option_num * 20), f"{option}. Option {option}", fontsize=11)
+            page.draw_circle((300, 400), 80 + page_num % 20, color=(0, 0, 1), fill=(0.8, 0.9, 1))
+        doc.save(path)
+
+
+def time_call(function, repeat):
+    """Returns the best wall-clock time of `repeat` calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial vs parallel PDF extraction.")
+    parser.add_argument('--pdf', help="PDF to benchmark. A synthetic paper is generated if omitted.")
+    parser.add_argument('--pages', type=int, default=60, help="Pages in the synthetic paper.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp_dir, 'sample.pdf')
+            make_sample_pdf(pdf_path, args.pages)
+
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+        print(f"{pdf_path}: {page_count} pages, {os.cpu_count()} CPUs, dpi={args.dpi}\n")
+        print(f"{'workers':>8} {'text (s)':>10} {'speedup':>8} {'render (s)':>11} {'speedup':>8}")
+
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            text_time = time_call(lambda: extractdocx.extract_text_and_images_from_pdf(pdf_path, workers=workers), args.repeat)
+            render_time = time_call(lambda: extractdocx.pdf_to_images(pdf_path, dpi=args.dpi, workers=workers), args.repeat)
+            if baseline is None:
+                baseline = (text_time, render_time)
+            print(f"{workers:>8} {text_time:>10.3f} {baseline[0] / text_time:>7.2f}x "
+                  f"{render_time:>11.3f} {baseline[1] / render_time:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# bench_text_backends.py measures the throughput of every plain text backend
+#
+# Usage:
+#   python benchmarks/bench_text_backends.py                       (synthetic answer keys)
+#   python benchmarks/bench_text_backends.py --files key.pdf key.docx --output results.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from docx import Document
+import extractdocx
+
+
+def make_sample_files(tmp_dir, questions):
+    """Writes the same synthetic answer key as PDF, DOCX and TXT. Returns their paths."""
+    lines = [f"{number}. {'ABCD'[number % 4]}" for number in range(1, questions + 1)]
+    per_page = 40
+
+    pdf_path = os.path.join(tmp_dir, 'answers.pdf')
+    with fitz.open() as doc:
+        for start in range(0, len(lines), per_page):
+            page = doc.new_page()
+            page.insert_text((72, 72), "\n".join(lines[start:start + per_page]), fontsize=11)
+        doc.save(pdf_path)
+
+    docx_path = os.path.join(tmp_dir, 'answers.docx')
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(docx_path)
+
+    txt_path = os.path.join(tmp_dir, 'answers.txt')
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+    return [pdf_path, docx_path, txt_path]
+
+
+def page_count(path):
+    if path.lower().endswith('.pdf'):
+        with fitz.open(path) as doc:
+            return len(doc)
+    return 1
+
+
+def benchmark_backend(path, backend, repeat):
+    """Returns one result row for a file and backend: best time, throughput and answers found."""
+    best = float('inf')
+    text = ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extractdocx.extract_text_from_any_file(path, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    pages = page_count(path)
+    return {
+        'file': os.path.basename(path),
+        'backend': backend,
+        'seconds': best,
+        'pages_per_second': pages / best if best else None,
+        'megabytes_per_second': os.path.getsize(path) / 1e6 / best if best else None,
+        'characters': len(text),
+        'answers': len(extractdocx.format_extracted_answers(text)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plain text backends used for answer keys.")
+    parser.add_argument('--files', nargs='+', help="Documents to benchmark. Synthetic answer keys are generated if omitted.")
+    parser.add_argument('--questions', type=int, default=2000, help="Answers in the synthetic keys.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.files or make_sample_files(tmp_dir, args.questions)
+
+        print(f"{'file':>16} {'backend':>12} {'time (s)':>9} {'pages/s':>9} {'MB/s':>7} {'answers':>8}  default")
+        for path in paths:
+            extension = path.rsplit('.', 1)[-1].lower()
+            backends = extractdocx.text_backends(extension)
+            for backend in backends:
+                row = benchmark_backend(path, backend, args.repeat)
+                row['default'] = backend == backends[0]
+                results.append(row)
+                print(f"{row['file']:>16} {backend:>12} {row['seconds']:>9.4f} {row['pages_per_second']:>9.1f} "
+                      f"{row['megabytes_per_second']:>7.2f} {row['answers']:>8}  {'*' if row['default'] else ''}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# db_pool.py keeps SQLite connections open and tuned for many students writing at once
+
+import os
+import sqlite3
+import logging
+import threading
+from urllib.request import pathname2url
+
+
+logger = logging.getLogger('db_pool')
+
+# Applied to every new connection. WAL lets readers carry on while a student's
+# answers are written and makes each commit a sequential append; with WAL,
+# synchronous=NORMAL only syncs at checkpoints and still never corrupts the
+# database (a power cut can lose at most the last commits).
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),            # Milliseconds to wait for another writer's lock
+    ('mmap_size', 256 * 1024 * 1024),  # Read pages through a memory map instead of read() calls
+    ('cache_size', -16 * 1024),        # Page cache per connection, in KiB when negative
+    ('temp_store', 'MEMORY'),
+)
+# Pragmas that change the database file, which a read-only connection may not run.
+_WRITE_PRAGMAS = {'journal_mode'}
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection that goes back to its pool, instead of closing, when it is closed
+    or when the `with` block it was opened for ends. As with a plain connection,
+    the block commits on success and rolls back on an exception.
+    """
+
+    _pool = None
+    _checked_out = False
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        elif self._checked_out:
+            self._checked_out = False
+            self._pool._release(self)
+
+
+class ConnectionPool:
+    """
+    Hands out SQLite connections one thread at a time and keeps up to `max_idle`
+    of them open between uses, so a request does not pay for opening the database
+    and applying the pragmas. Every `connect` returns a connection no other thread
+    is using; more than `max_idle` may be open at once, the extra ones are closed
+    when released.
+
+    With `read_only`, connections are opened with mode=ro: the database must
+    already exist, and any write fails with sqlite3.OperationalError.
+    """
+
+    def __init__(self, database, max_idle=16, read_only=False, pragmas=DEFAULT_PRAGMAS, row_factory=sqlite3.Row):
+        self.database = database
+        self.max_idle = max_idle
+        self.read_only = read_only
+        self.pragmas = pragmas
+        self.row_factory = row_factory
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def connect(self):
+        """Returns an idle connection, or opens a new one."""
+        conn = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child must not share the parent's SQLite handles.
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                conn = self._idle.pop()
+        if conn is None:
+            conn = self._open()
+        conn._checked_out = True
+        return conn
+
+    def close_all(self):
+        """Closes the idle connections. Connections in use close when released."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    # --- Internals ---
+
+    def _open(self):
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.database))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, factory=PooledConnection, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = self.row_factory
+        for name, value in self.pragmas:
+            if not (self.read_only and name in _WRITE_PRAGMAS):
+                conn.execute(f"PRAGMA {name} = {value}")
+        conn._pool = self
+        return conn
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Uncommitted work is discarded, as closing the connection would
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding a pooled connection that could not be reset: {e}")
+            sqlite3.Connection.close(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle and self._pid == os.getpid():
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
@@ -0,0 +1,200 @@
+# docx_stream.py a fast, streaming reader for the body of .docx files
+
+import zipfile
+import posixpath
+import logging
+import xml.etree.ElementTree as ET
+
+
+logger = logging.getLogger('docx_stream')
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+V = '{urn:schemas-microsoft-com:vml}'
+PKG_RELS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+PKG_TYPES = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+
+DOCUMENT_PART = 'word/document.xml'
+DOCUMENT_RELS_PART = 'word/_rels/document.xml.rels'
+
+# Run content elements and the text they stand for, as python-docx reads them.
+# <w:br> is handled separately: only line breaks count, not page or column breaks.
+RUN_TEXT = {W + 'tab': '\t', W + 'ptab': '\t', W + 'cr': '\n', W + 'noBreakHyphen': '-'}
+
+
+class DocxReader:
+    """
+    Reads a .docx file straight from its zip archive. `iter_blocks` streams
+    word/document.xml through an incremental parser instead of building the
+    python-docx object model, so large question banks are read quickly and
+    with memory proportional to one paragraph or table, not the whole document.
+
+    Use as a context manager, or call `close` when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._relationships = None
+        self._content_types = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def read_part(self, part_name):
+        """Returns the bytes of a part, e.g. 'word/media/image1.png'."""
+        return self._zip.read(part_name)
+
+    def content_type(self, part_name):
+        """Returns the declared content type of a part, e.g. 'image/png'."""
+        if self._content_types is None:
+            self._content_types = self._load_content_types()
+        overrides, defaults = self._content_types
+        extension = part_name.rsplit('.', 1)[-1].lower()
+        return overrides.get('/' + part_name) or defaults.get(extension, 'application/octet-stream')
+
+    def iter_blocks(self, text_boxes=True):
+        """
+        Yields the body of the document in order, as dicts:
+            {'type': 'paragraph', 'text': ...}
+            {'type': 'table', 'rows': [[cell text, ...], ...]}
+            {'type': 'image', 'part': 'word/media/image1.png'}
+        Images follow the paragraph or table they are anchored in. Text in text
+        boxes is kept inline in its paragraph (or dropped, with `text_boxes`
+        False), and nested tables are flattened into the text of their cell.
+        """
+        paragraphs = []  # Text buffers of the paragraphs being read, outermost first
+        tables = []      # Rows of the tables being read, outermost first
+        images = []      # Image parts seen since the last block was yielded
+        depth = 0
+        body = None
+
+        with self._zip.open(DOCUMENT_PART) as f:
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    depth += 1
+                    if tag == W + 'body':
+                        body = elem
+                    elif tag == W + 'p':
+                        paragraphs.append([])
+                    elif tag == W + 'tbl':
+                        tables.append([])
+                    elif tag == W + 'tr' and tables:
+                        tables[-1].append([])
+                    elif tag == W + 'tc' and tables and tables[-1]:
+                        tables[-1][-1].append([])
+                    continue
+
+                depth -= 1
+                if tag == W + 't' and paragraphs:
+                    paragraphs[-1].append(elem.text or '')
+                elif tag in RUN_TEXT and paragraphs:
+                    paragraphs[-1].append(RUN_TEXT[tag])
+                elif tag == W + 'br' and paragraphs:
+                    if elem.get(W + 'type', 'textWrapping') == 'textWrapping':
+                        paragraphs[-1].append('\n')
+                elif tag == A + 'blip' or tag == V + 'imagedata':
+                    part = self._image_part(elem.get(R + 'embed') or elem.get(R + 'id'))
+                    if part:
+                        images.append(part)
+                elif tag == W + 'p':
+                    text = ''.join(paragraphs.pop())
+                    if paragraphs:
+                        if text_boxes:
+                            paragraphs[-1].append(text + '\n')  # A text box inside a paragraph
+                    elif tables and tables[-1] and tables[-1][-1]:
+                        tables[-1][-1][-1].append(text)
+                    else:
+                        yield {'type': 'paragraph', 'text': text}
+                        yield from self._flush_images(images)
+                elif tag == W + 'tbl':
+                    rows = [['\n'.join(cell) for cell in row] for row in tables.pop()]
+                    if tables and tables[-1] and tables[-1][-1]:
+                        tables[-1][-1][-1].append(_table_text(rows))
+                    elif paragraphs:
+                        if text_boxes:
+                            paragraphs[-1].append(_table_text(rows) + '\n')
+                    else:
+                        yield {'type': 'table', 'rows': rows}
+                        yield from self._flush_images(images)
+
+                if depth == 2 and body is not None:
+                    body.remove(elem)  # Top-level element done; drop it to keep memory flat
+
+        yield from self._flush_images(images)
+
+    # --- Internals ---
+
+    @staticmethod
+    def _flush_images(images):
+        for part in images:
+            yield {'type': 'image', 'part': part}
+        images.clear()
+
+    def _image_part(self, relationship_id):
+        """Resolves an image relationship of the document to its part name."""
+        if self._relationships is None:
+            self._relationships = self._load_relationships()
+        return self._relationships.get(relationship_id)
+
+    def _load_relationships(self):
+        """Maps relationship ids of the main document to internal part names."""
+        relationships = {}
+        try:
+            root = ET.fromstring(self._zip.read(DOCUMENT_RELS_PART))
+        except KeyError:
+            return relationships
+        for rel in root.iter(PKG_RELS + 'Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue  # Linked rather than embedded; there are no bytes to read
+            target = rel.get('Target', '')
+            if target.startswith('/'):
+                part = target.lstrip('/')
+            else:
+                part = posixpath.normpath(posixpath.join('word', target))
+            relationships[rel.get('Id')] = part
+        return relationships
+
+    def _load_content_types(self):
+        overrides, defaults = {}, {}
+        root = ET.fromstring(self._zip.read('[Content_Types].xml'))
+        for override in root.iter(PKG_TYPES + 'Override'):
+            overrides[override.get('PartName')] = override.get('ContentType')
+        for default in root.iter(PKG_TYPES + 'Default'):
+            defaults[default.get('Extension', '').lower()] = default.get('ContentType')
+        return overrides, defaults
+
+
+def _table_text(rows):
+    """Renders table rows as text: one line per row, cells separated by tabs."""
+    return '\n'.join('\t'.join(row) for row in rows)
+
+
+def block_text(block):
+    """Returns the plain text of a paragraph or table block ('' for images)."""
+    if block['type'] == 'paragraph':
+        return block['text']
+    if block['type'] == 'table':
+        return _table_text(block['rows'])
+    return ''
+
+
+def docx_text(path, include_tables=False):
+    """
+    Returns the text of a .docx file, one body paragraph per line. This is the
+    same text as python-docx's `Document.paragraphs`: tables and text boxes are
+    left out unless `include_tables` is set, which adds table rows in place.
+    """
+    types = ('paragraph', 'table') if include_tables else ('paragraph',)
+    with DocxReader(path) as reader:
+        return '\n'.join(
+            block_text(block) for block in reader.iter_blocks(text_boxes=include_tables) if block['type'] in types
+        )
@@ -0,0 +1,179 @@
+# exam_payloads.py a store of rendered exam documents, compressed once and served to every student
+
+import os
+import re
+import glob
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import response_compression
+
+
+logger = logging.getLogger('exam_payloads')
+
+# A stored payload: `etag` is the sha256 of the rendered HTML, `bodies` maps each
+# supported content encoding ('gzip', and 'br' if brotli is installed) to the HTML
+# compressed with it. Parts of a document (see `put_part`) have the etag
+# '<document etag>.<part>'.
+ExamPayload = namedtuple('ExamPayload', 'exam_id etag bodies')
+
+# File extension of each content encoding. Every payload has a gzip file.
+ENCODING_EXTENSIONS = {'gzip': 'gz', 'br': 'br'}
+
+ETAG_PATTERN = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9-]{1,32})?$')
+
+
+def payload_etag(document):
+    """Returns the content hash that names and versions a rendered document."""
+    return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+
+class ExamPayloadStore:
+    """
+    Keeps each exam's rendered HTML compressed on disk, once per supported content
+    encoding at the highest level, in files named after the exam and the hash of
+    its content, and the most recently served ones in memory. Every student of an
+    exam gets the same bytes, so the document is rendered and compressed once and
+    each further request is a dictionary lookup, or a 304 when the browser already
+    holds that version.
+
+    Storing a new version of an exam's document keeps the previous one, which
+    students may still be loading, until `retire` is called for the new one once
+    it is committed. `root_dir` is created when the first payload is written.
+    """
+
+    def __init__(self, root_dir, max_memory_bytes=64 * 1024 * 1024):
+        self.root_dir = root_dir
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()  # (exam_id, etag) -> ExamPayload, least recently used first
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, exam_id, document):
+        """Compresses and stores a rendered document. Returns its ExamPayload."""
+        payload = self._store(exam_id, payload_etag(document), document)
+        sizes = ', '.join(f"{len(body)} {encoding}" for encoding, body in payload.bodies.items())
+        logger.info(f"Stored exam {exam_id} document: {len(document)} bytes, {sizes}.")
+        return payload
+
+    def put_part(self, exam_id, document_etag, part, html):
+        """
+        Compresses and stores `part` (e.g. 'pages-0') of the document version
+        `document_etag`, such as a chunk of its pages. Returns its ExamPayload.
+        """
+        return self._store(exam_id, f"{document_etag}.{part}", html)
+
+    def get(self, exam_id, etag):
+        """Returns the stored ExamPayload of a document version or part, or None."""
+        with self._lock:
+            payload = self._memory.get((exam_id, etag))
+            if payload is not None:
+                self._memory.move_to_end((exam_id, etag))
+                return payload
+        if not etag or not ETAG_PATTERN.match(etag):
+            return None
+        try:
+            with open(self._path(exam_id, etag, 'gzip'), 'rb') as f:
+                bodies = {'gzip': f.read()}
+        except FileNotFoundError:
+            return None
+        html = None
+        for encoding in response_compression.SUPPORTED_ENCODINGS:
+            if encoding in bodies:
+                continue
+            try:
+                with open(self._path(exam_id, etag, encoding), 'rb') as f:
+                    bodies[encoding] = f.read()
+            except FileNotFoundError:
+                # Stored before this encoding was available; add it now.
+                if html is None:
+                    html = response_compression.decompress(bodies['gzip'], 'gzip')
+                bodies[encoding] = self._write(exam_id, etag, encoding, html)
+        payload = ExamPayload(exam_id, etag, bodies)
+        self._remember(payload)
+        return payload
+
+    def retire(self, exam_id, keep):
+        """
+        Forgets every version of an exam's document except `keep` (an etag) and
+        the parts stored for it, from memory and from disk.
+        """
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == exam_id and not _is_version(key[1], keep)]:
+                self._memory_bytes -= _size(self._memory.pop(key))
+        self._remove_files(exam_id, keep=keep)
+
+    def discard(self, exam_id):
+        """Forgets every stored version of an exam's document."""
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == exam_id]:
+                self._memory_bytes -= _size(self._memory.pop(key))
+        self._remove_files(exam_id)
+
+    # --- Internals ---
+
+    def _store(self, exam_id, etag, html):
+        if not ETAG_PATTERN.match(etag):
+            raise ValueError(f"Invalid payload name: {etag}")
+        data = html.encode('utf-8')
+        bodies = {encoding: self._write(exam_id, etag, encoding, data)
+                  for encoding in response_compression.SUPPORTED_ENCODINGS}
+        payload = ExamPayload(exam_id, etag, bodies)
+        self._remember(payload)
+        return payload
+
+    def _write(self, exam_id, etag, encoding, data):
+        """Returns `data` compressed with `encoding`, compressing and writing it unless already stored."""
+        path = self._path(exam_id, etag, encoding)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        body = response_compression.compress(data, encoding, response_compression.STATIC_LEVELS[encoding])
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)  # Atomic, so a concurrent reader never sees a partial file
+        return body
+
+    def _path(self, exam_id, etag, encoding):
+        return os.path.join(self.root_dir, f"exam-{int(exam_id)}-{etag}.html.{ENCODING_EXTENSIONS[encoding]}")
+
+    def _remember(self, payload):
+        size = _size(payload)
+        if size > self.max_memory_bytes:
+            return
+        key = (payload.exam_id, payload.etag)
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= _size(previous)
+            self._memory[key] = payload
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= _size(evicted)
+
+    def _remove_files(self, exam_id, keep=None):
+        """Removes the stored files of an exam, except those of the version `keep` (an etag) and its parts."""
+        for extension in ENCODING_EXTENSIONS.values():
+            for path in glob.glob(os.path.join(self.root_dir, f"exam-{int(exam_id)}-*.html.{extension}")):
+                etag = os.path.basename(path)[len(f"exam-{int(exam_id)}-"):-len(f".html.{extension}")]
+                if keep is None or not _is_version(etag, keep):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass  # Removed concurrently
+
+
+def _is_version(etag, document_etag):
+    """Tells whether `etag` names the document version `document_etag` or one of its parts."""
+    return etag == document_etag or etag.startswith(document_etag + '.')
+
+
+def _size(payload):
+    return sum(len(body) for body in payload.bodies.values())
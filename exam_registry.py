@@ -0,0 +1,113 @@
+# exam_registry.py keeps the exams students are sitting in memory, so marking and page loads skip the database
+
+import json
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import answer_vectors
+
+
+logger = logging.getLogger('exam_registry')
+
+# An exam in memory. `answer_key` is the packed answer key /mark scores against
+# (see answer_vectors.py). Only the document's ETag is kept: the rendered bytes
+# stay in exam_payloads, which bounds their memory by size.
+ActiveExam = namedtuple('ActiveExam', [
+    'id', 'exam_code', 'subject_name', 'exam_class', 'exam_time', 'question_length',
+    'question_page_count', 'document_etag', 'answer_key',
+])
+
+
+def active_exam_from_row(row, document_etag=None):
+    """
+    Builds an ActiveExam from an exam_sessions row, packing its answer key if it
+    was not stored packed. `document_etag` overrides the row's, e.g. once the
+    document has been rendered for an exam stored before rendering was done up front.
+    """
+    answer_key = row['answer_key_vector']
+    if answer_key is None:
+        answer_key = answer_vectors.pack_answer_key(json.loads(row['extracted_answers_json'] or '{}'))
+    return ActiveExam(
+        id=row['id'],
+        exam_code=row['exam_code'],
+        subject_name=row['subject_name'],
+        exam_class=row['exam_class'],
+        exam_time=row['exam_time'],
+        question_length=row['question_length'],
+        question_page_count=row['question_page_count'],
+        document_etag=document_etag or row['document_etag'],
+        answer_key=bytes(answer_key),
+    )
+
+
+class ExamRegistry:
+    """
+    An LRU of up to `max_exams` ActiveExams, by id and by exam code. On a miss
+    `load(exam_id=..., exam_code=...)` is called to read the exam from the
+    database; it returns an ActiveExam or None, and only exams that have a code
+    are kept. Anything that changes an exam must `invalidate` it.
+    """
+
+    def __init__(self, load, max_exams=64):
+        self.load = load
+        self.max_exams = max_exams
+        self._exams = OrderedDict()  # Exam id -> ActiveExam, least recently used first
+        self._ids_by_code = {}
+        self._version = 0  # Bumped by every invalidation, so a load racing one is not kept
+        self._lock = threading.Lock()
+
+    def get(self, exam_id):
+        """Returns the ActiveExam with this id, loading it if needed, or None."""
+        with self._lock:
+            exam = self._exams.get(exam_id)
+            if exam is not None:
+                self._exams.move_to_end(exam_id)
+                return exam
+        return self._load(exam_id=exam_id)
+
+    def get_by_code(self, exam_code):
+        """Returns the ActiveExam with this exam code, loading it if needed, or None."""
+        with self._lock:
+            exam_id = self._ids_by_code.get(exam_code)
+            if exam_id is not None:
+                self._exams.move_to_end(exam_id)
+                return self._exams[exam_id]
+        return self._load(exam_code=exam_code)
+
+    def put(self, exam):
+        """Adds or replaces an exam, e.g. one just given a code."""
+        with self._lock:
+            self._put(exam)
+
+    def invalidate(self, exam_id):
+        """Forgets an exam; it is loaded again on its next use."""
+        with self._lock:
+            self._version += 1
+            exam = self._exams.pop(exam_id, None)
+            if exam is not None:
+                self._ids_by_code.pop(exam.exam_code, None)
+
+    # --- Internals ---
+
+    def _load(self, **key):
+        with self._lock:
+            version = self._version
+        exam = self.load(**key)
+        if exam is not None:
+            with self._lock:
+                if self._version == version:
+                    self._put(exam)
+        return exam
+
+    def _put(self, exam):
+        if not exam.exam_code:
+            return  # Not open to students yet
+        previous = self._exams.pop(exam.id, None)
+        if previous is not None:
+            self._ids_by_code.pop(previous.exam_code, None)
+        self._exams[exam.id] = exam
+        self._ids_by_code[exam.exam_code] = exam.id
+        while len(self._exams) > self.max_exams:
+            _, evicted = self._exams.popitem(last=False)
+            self._ids_by_code.pop(evicted.exam_code, None)
@@ -0,0 +1,634 @@
+# exam_store.py holds the exam database and the code that stores extracted exams in it
+#
+# It is shared by server2.py and provision_exams.py. Importing it has no side
+# effects: no connection is opened, no directory created and no thread started
+# until one of its functions is called, and it does not need the web app.
+
+import os
+import json
+import secrets
+import sqlite3
+import logging
+
+from werkzeug.security import generate_password_hash
+
+import extractdocx
+import question_index
+import answer_vectors
+from db_pool import ConnectionPool
+from exam_payloads import ExamPayloadStore, payload_etag
+
+
+logger = logging.getLogger('exam_app')
+
+# --- Directory Constants ---
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MAIN_DIR = os.path.join(BASE_DIR, 'ExamTester')
+UPLOAD_FOLDER = os.path.join(MAIN_DIR, 'Uploads')
+CACHE_FOLDER = os.path.join(MAIN_DIR, 'Cache')
+ASSETS_FOLDER = os.path.join(MAIN_DIR, 'Assets')
+EXTRACTION_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'extraction')
+PAYLOADS_FOLDER = os.path.join(CACHE_FOLDER, 'payloads')
+ASSETS_URL_PREFIX = '/assets'
+
+CLASS_SUBFOLDERS = ["Jss1", "Jss2", "Jss3", "SS1", "SS2", "SS3"]
+
+# --- Settings ---
+# Read once from the environment; server2 copies them into app.config.
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_MB', 512)) * 1024 * 1024
+EXTRACTION_JOB_TIMEOUT = int(os.environ.get('EXTRACTION_JOB_TIMEOUT', 300))  # Seconds
+EXTRACTION_JOB_MEMORY_LIMIT = int(os.environ.get('EXTRACTION_JOB_MEMORY_MB', 1024)) * 1024 * 1024
+# Memory the extractor aims to stay within (see extractdocx bounded-memory mode);
+# kept well below the hard limit above. 0 turns bounded-memory mode off.
+EXTRACTION_MEMORY_CEILING = int(os.environ.get('EXTRACTION_MEMORY_CEILING_MB', 256)) * 1024 * 1024
+EXAM_PAYLOAD_MEMORY = int(os.environ.get('EXAM_PAYLOAD_MEMORY_MB', 64)) * 1024 * 1024
+# Pages per chunk of /examcenter/pages/<chunk>, which students load as they go.
+EXAM_PAGE_CHUNK = max(1, int(os.environ.get('EXAM_PAGE_CHUNK', 4)))
+# Database connections kept open between requests, per pool (see get_db_connection).
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 32))
+
+# --- Exam Payload Store ---
+# Each exam's document is rendered once, stored gzip-compressed under its content
+# hash and served to every student from memory, with ETags for conditional GETs.
+exam_payloads = ExamPayloadStore(PAYLOADS_FOLDER, max_memory_bytes=EXAM_PAYLOAD_MEMORY)
+
+# ==============================================================================
+# DATABASE
+# ==============================================================================
+
+DATABASE_NAME = 'users.db'
+
+# Connections are reused across requests and opened in WAL mode (see db_pool.py),
+# so concurrent submits do not serialize on the rollback journal.
+db_pool = ConnectionPool(DATABASE_NAME, max_idle=DB_POOL_SIZE)
+db_read_pool = ConnectionPool(DATABASE_NAME, max_idle=DB_POOL_SIZE, read_only=True)
+
+def get_db_connection(read_only=False):
+    """
+    Returns a pooled connection to the SQLite database; rows can be accessed by
+    column name. Use it in a `with` block, which commits or rolls back and then
+    returns the connection to the pool. A `read_only` connection, for endpoints
+    that only read, cannot write and never takes the write lock.
+    """
+    return (db_read_pool if read_only else db_pool).connect()
+
+def init_db():
+    """Initializes the database and creates all necessary tables if they don't exist."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Admins table with hashed passwords
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+        ''')
+
+        # Create a default admin if none exist
+        cursor.execute("SELECT id FROM admins LIMIT 1")
+        if cursor.fetchone() is None:
+            default_username = 'admin1'
+            default_password = '@RoyalRangers'
+            hashed_password = generate_password_hash(default_password)
+            cursor.execute(
+                "INSERT INTO admins (username, password_hash) VALUES (?, ?)",
+                (default_username, hashed_password)
+            )
+            logger.info(f"Created default admin '{default_username}' with password '{default_password}'.")
+
+        # Table for files managed by the CRUD system
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            subdirectory TEXT NOT NULL,
+            filetype TEXT NOT NULL,
+            filepath TEXT NOT NULL  -- Store the path to the file on the filesystem
+        )
+        ''')
+
+        # Table for CORS origins
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cors_origins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT UNIQUE NOT NULL
+        )
+        ''')
+        
+        # The main table to replace the old `data_store` dictionary.
+        # This table persists the definition of an exam; the students sitting it
+        # are recorded in exam_attempts.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            admin_username TEXT NOT NULL,
+            
+            --  NEW COLUMN --
+            exam_code TEXT UNIQUE, 
+
+            exam_time TEXT,
+            subject_name TEXT,
+            question_length INTEGER,
+            question_template_filename TEXT,
+            answer_template_filename TEXT,
+            contains_images INTEGER DEFAULT 0,
+            extracted_questions_json TEXT,
+            extracted_answers_json TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        # Trigger to auto-update the 'updated_at' timestamp
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_exam_sessions_updated_at
+        AFTER UPDATE ON exam_sessions
+        FOR EACH ROW
+        BEGIN
+            UPDATE exam_sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
+        END;
+        ''')
+        # Number of rows in exam_pages; NULL until the questions have been extracted.
+        _ensure_column(cursor, 'exam_sessions', 'question_page_count', 'INTEGER')
+        # Maps each distinct image URL in the exam to the pages that reference it.
+        _ensure_column(cursor, 'exam_sessions', 'image_refs_json', 'TEXT')
+        # Numbered questions found in the pages (see question_index.py), built once per extraction.
+        _ensure_column(cursor, 'exam_sessions', 'question_index_json', 'TEXT')
+        # The exam page HTML, rendered once from exam_pages when extraction finishes.
+        _ensure_column(cursor, 'exam_sessions', 'rendered_document', 'TEXT')
+        # Content hash of rendered_document; names its compressed copy in exam_payloads.
+        _ensure_column(cursor, 'exam_sessions', 'document_etag', 'TEXT')
+        # Class the exam is set for, e.g. 'SS2'; recorded by provision_exams.py.
+        _ensure_column(cursor, 'exam_sessions', 'exam_class', 'TEXT')
+        # extracted_answers_json packed one byte per question (see answer_vectors.py), for marking.
+        _ensure_column(cursor, 'exam_sessions', 'answer_key_vector', 'BLOB')
+
+        # Extracted question pages, one row per page, so that neither extraction nor
+        # rendering ever has to hold a whole document in memory.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_session_id INTEGER NOT NULL,
+            page_number INTEGER NOT NULL,
+            content_json TEXT NOT NULL,
+            UNIQUE (exam_session_id, page_number)
+        )
+        ''')
+        _migrate_legacy_questions(cursor)
+
+        # One row per student sitting an exam, so a whole hall can sit the same
+        # exam code at once without overwriting each other's details or answers.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_session_id INTEGER NOT NULL,
+            student_details_json TEXT NOT NULL,
+            student_answers_json TEXT,
+            student_score INTEGER,  -- NULL until the answers are marked
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            submitted_at DATETIME
+        )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_exam_attempts_exam_session_id ON exam_attempts (exam_session_id)"
+        )
+        # The student's answers packed one byte per question; replaces student_answers_json.
+        _ensure_column(cursor, 'exam_attempts', 'answer_vector', 'BLOB')
+        _migrate_legacy_attempts(cursor)
+        _migrate_answer_vectors(cursor)
+
+        conn.commit()
+        logger.info("Database initialized successfully.")
+    except sqlite3.Error as e:
+        logger.error(f"Database initialization error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def _ensure_column(cursor, table, column, declaration):
+    """Adds a column to an existing table if an older database does not have it yet."""
+    existing = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column not in existing:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        logger.info(f"Added column '{column}' to table '{table}'.")
+
+def _migrate_legacy_attempts(cursor):
+    """
+    Moves the single student that older versions stored in the student_* columns
+    of exam_sessions into exam_attempts. The old columns are left in place, empty.
+    """
+    existing = [row[1] for row in cursor.execute("PRAGMA table_info(exam_sessions)")]
+    if 'student_details_json' not in existing:
+        return
+    rows = cursor.execute(
+        "SELECT id, student_details_json, student_answers_json, student_score, updated_at "
+        "FROM exam_sessions WHERE student_details_json IS NOT NULL"
+    ).fetchall()
+    for row in rows:
+        cursor.execute(
+            """INSERT INTO exam_attempts
+               (exam_session_id, student_details_json, student_answers_json, student_score, submitted_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (row['id'], row['student_details_json'], row['student_answers_json'], row['student_score'],
+             row['updated_at'] if row['student_score'] is not None else None)
+        )
+        cursor.execute(
+            "UPDATE exam_sessions SET student_details_json = NULL, student_answers_json = NULL, "
+            "student_score = NULL WHERE id = ?",
+            (row['id'],)
+        )
+    if rows:
+        logger.info(f"Moved {len(rows)} legacy student records into exam_attempts.")
+
+def _migrate_answer_vectors(cursor):
+    """Packs answer keys and student answers stored as JSON by older versions."""
+    exams = cursor.execute(
+        "SELECT id, extracted_answers_json FROM exam_sessions "
+        "WHERE extracted_answers_json IS NOT NULL AND answer_key_vector IS NULL"
+    ).fetchall()
+    for exam in exams:
+        cursor.execute(
+            "UPDATE exam_sessions SET answer_key_vector = ? WHERE id = ?",
+            (answer_vectors.pack_answer_key(json.loads(exam['extracted_answers_json'])), exam['id'])
+        )
+    attempts = cursor.execute(
+        "SELECT id, student_answers_json FROM exam_attempts "
+        "WHERE student_answers_json IS NOT NULL AND answer_vector IS NULL"
+    ).fetchall()
+    for attempt in attempts:
+        cursor.execute(
+            "UPDATE exam_attempts SET answer_vector = ?, student_answers_json = NULL WHERE id = ?",
+            (answer_vectors.pack_answers(json.loads(attempt['student_answers_json'])), attempt['id'])
+        )
+    if exams or attempts:
+        logger.info(f"Packed {len(exams)} answer keys and {len(attempts)} answer sheets.")
+
+def _migrate_legacy_questions(cursor):
+    """
+    Moves questions stored by older versions as a single JSON list in
+    `extracted_questions_json` into `exam_pages` as one page.
+    """
+    legacy_rows = cursor.execute(
+        "SELECT id, extracted_questions_json FROM exam_sessions "
+        "WHERE extracted_questions_json IS NOT NULL AND question_page_count IS NULL"
+    ).fetchall()
+    for exam_id, questions_json in legacy_rows:
+        items = json.loads(questions_json)
+        if not isinstance(items, list):
+            items = [items]
+        page = {
+            "page": 1,
+            "blocks": [item for item in items if not isinstance(item, str) or not item.startswith('data:image/')],
+            "images": [item for item in items if isinstance(item, str) and item.startswith('data:image/')],
+        }
+        cursor.execute(
+            "INSERT OR REPLACE INTO exam_pages (exam_session_id, page_number, content_json) VALUES (?, 1, ?)",
+            (exam_id, json.dumps(page))
+        )
+        cursor.execute(
+            "UPDATE exam_sessions SET question_page_count = 1, extracted_questions_json = NULL WHERE id = ?",
+            (exam_id,)
+        )
+    if legacy_rows:
+        logger.info(f"Migrated {len(legacy_rows)} legacy exam sessions to per-page storage.")
+
+def iter_exam_pages(conn, exam_session_db_id):
+    """Yields the stored question pages of an exam one at a time, in page order."""
+    cursor = conn.execute(
+        "SELECT content_json FROM exam_pages WHERE exam_session_id = ? ORDER BY page_number",
+        (exam_session_db_id,)
+    )
+    for row in cursor:
+        yield json.loads(row['content_json'])
+
+
+def load_question_index(conn, exam):
+    """
+    Returns the question index of an exam row. Exams extracted before indexing
+    existed, or by an older segmenter, are indexed from their stored pages once
+    and the result is saved.
+    """
+    if exam['question_index_json']:
+        index = json.loads(exam['question_index_json'])
+        if index.get('version') == question_index.QUESTION_INDEX_VERSION:
+            return index
+
+    cursor = conn.execute(
+        "SELECT page_number, content_json FROM exam_pages WHERE exam_session_id = ? ORDER BY page_number",
+        (exam['id'],)
+    )
+    index = question_index.build_question_index((row['page_number'], json.loads(row['content_json'])) for row in cursor)
+    conn.execute("UPDATE exam_sessions SET question_index_json = ? WHERE id = ?", (json.dumps(index), exam['id']))
+    conn.commit()
+    return index
+
+
+def prerender_exam_document(conn, exam_session_db_id):
+    """
+    Renders the exam's stored pages to HTML once and saves it in
+    `rendered_document`, with its content hash as `document_etag`. Returns the
+    document. Does not commit; callers store it together with the pages it was
+    rendered from, and call `publish_exam_document` once they have committed.
+    """
+    document = format_extracted_document_with_embedded_images(iter_exam_pages(conn, exam_session_db_id))
+    conn.execute(
+        "UPDATE exam_sessions SET rendered_document = ?, document_etag = ? WHERE id = ?",
+        (document, payload_etag(document), exam_session_db_id)
+    )
+    return document
+
+
+def publish_exam_document(conn, exam_session_db_id, document):
+    """
+    Compresses and stores the payload of a committed `prerender_exam_document`,
+    and of each chunk of its pages, so that students are all served the same
+    bytes. Returns the ExamPayload. Compression runs outside the transaction, and
+    nothing is written for a render that was rolled back. Previous versions are
+    kept; callers retire them once students are pointed at this one.
+    """
+    payload = exam_payloads.put(exam_session_db_id, document)
+    page_count = conn.execute(
+        "SELECT COUNT(*) FROM exam_pages WHERE exam_session_id = ?", (exam_session_db_id,)
+    ).fetchone()[0]
+    for chunk in range(exam_page_chunk_count(page_count)):
+        load_exam_chunk(conn, exam_session_db_id, payload.etag, chunk)
+    return payload
+
+
+def load_exam_payload(conn, exam):
+    """
+    Returns the ExamPayload of an exam row with extracted pages: from memory, from
+    its compressed file, recompressed from `rendered_document` if the file is gone,
+    or, for exams stored before rendering was done up front, rendered now.
+    """
+    payload = exam_payloads.get(exam['id'], exam['document_etag'])
+    if payload is not None:
+        return payload
+    document = exam['rendered_document']
+    if document is not None:
+        if payload_etag(document) == exam['document_etag']:
+            return exam_payloads.put(exam['id'], document)
+        conn.execute("UPDATE exam_sessions SET document_etag = ? WHERE id = ?", (payload_etag(document), exam['id']))
+    else:
+        document = prerender_exam_document(conn, exam['id'])
+    conn.commit()
+    payload = publish_exam_document(conn, exam['id'], document)
+    exam_payloads.retire(exam['id'], keep=payload.etag)
+    return payload
+
+
+def exam_page_chunk_count(page_count):
+    """Returns how many /examcenter/pages chunks `page_count` pages make."""
+    return -(-page_count // EXAM_PAGE_CHUNK)
+
+
+def exam_chunk_etag(document_etag, chunk):
+    """Returns the ETag of a page chunk of the document version `document_etag`."""
+    return f"{document_etag}.pages-{chunk}"
+
+
+def load_exam_chunk(conn, exam_session_db_id, document_etag, chunk):
+    """
+    Returns the ExamPayload of one chunk of an exam's pages, rendering and storing
+    it the first time it is needed. Chunks belong to the document version they
+    were rendered with. The first chunk starts with the document head, so its
+    styles arrive together with the first questions.
+    """
+    part = f"pages-{chunk}"
+    payload = exam_payloads.get(exam_session_db_id, exam_chunk_etag(document_etag, chunk))
+    if payload is not None:
+        return payload
+
+    first_page = chunk * EXAM_PAGE_CHUNK + 1
+    cursor = conn.execute(
+        """SELECT content_json FROM exam_pages WHERE exam_session_id = ? AND page_number BETWEEN ? AND ?
+           ORDER BY page_number""",
+        (exam_session_db_id, first_page, first_page + EXAM_PAGE_CHUNK - 1)
+    )
+    html = format_extracted_document_with_embedded_images(
+        (json.loads(row['content_json']) for row in cursor), first_page=first_page, standalone=False
+    )
+    if chunk == 0:
+        html = EXAM_DOCUMENT_HEAD + html
+    return exam_payloads.put_part(exam_session_db_id, document_etag, part, html)
+
+
+# Values of exam_sessions.contains_images
+IMAGE_MODE_OFF = 0   # Text document; pages are extracted as text
+IMAGE_MODE_ON = 1    # Image-based PDF; every page is rendered to an image
+IMAGE_MODE_AUTO = 2  # Hybrid PDF; only pages that need it are rendered
+
+def extractor_image_mode(contains_images_column):
+    """Maps the stored contains_images value to the argument `extractdocx` expects."""
+    if contains_images_column == IMAGE_MODE_AUTO:
+        return extractdocx.IMAGE_MODE_AUTO
+    return bool(contains_images_column)
+
+
+def generate_unique_code(conn):
+    """
+    Helper function to generate a unique 6-character alphanumeric code.
+    It checks the database to ensure the code is not already in use.
+    """
+    while True:
+        # Generate a simple, readable code (e.g., A9B2C1)
+        code = ''.join(secrets.choice('ABCDEFGHJKLMNPQRSTUVWXYZ23456789') for _ in range(6))
+        
+        # Check if this code already exists in the database
+        cursor = conn.execute("SELECT id FROM exam_sessions WHERE exam_code = ?", (code,))
+        if cursor.fetchone() is None:
+            # If it doesn't exist, we can use it.
+            return code
+
+
+# ==============================================================================
+# EXAM PAGES
+# ==============================================================================
+
+def store_question_pages(conn, exam_session_db_id, contains_images, pages):
+    """
+    Inserts extracted pages into `exam_pages` as they are produced. As before, text
+    documents keep only their text and image-based documents keep only their page
+    images; in hybrid mode each page already holds one or the other. Empty pages
+    are skipped.
+
+    Nothing is committed: the pages belong to the caller's transaction, together
+    with the removal of the exam's previous pages and its updated row.
+
+    Returns the number of pages stored, a map of each distinct image reference to
+    the pages it appears on, and the question index built from the stored pages.
+    Images are deduplicated during extraction, so a logo repeated on every page is
+    one entry here and one file in the asset store.
+    """
+    page_count = 0
+    image_refs = {}
+    index_builder = question_index.QuestionIndexBuilder()
+    for page in pages:
+        if contains_images != extractdocx.IMAGE_MODE_AUTO:
+            # DOCX pages place their images among the blocks as {"image": ref} blocks.
+            if contains_images:
+                page['blocks'] = [block for block in page['blocks'] if 'image' in block]
+            else:
+                page['blocks'] = [block for block in page['blocks'] if 'image' not in block]
+                page['images'] = []
+        if not page['blocks'] and not page['images']:
+            continue
+        page_count += 1
+        for ref in page['images']:
+            image_refs.setdefault(ref, []).append(page_count)
+        index_builder.add_page(page_count, page)
+        conn.execute(
+            "INSERT INTO exam_pages (exam_session_id, page_number, content_json) VALUES (?, ?, ?)",
+            (exam_session_db_id, page_count, json.dumps(page))
+        )
+    return page_count, image_refs, index_builder.finish()
+
+
+# The <head> of a rendered exam document, with the styles of everything below.
+EXAM_DOCUMENT_HEAD = '''
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Extracted Document</title>
+        <style>
+            body {
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                line-height: 1.6;
+                color: #ffff;
+                max-width: 100%;
+                margin: 0 auto;
+                padding: 15px;
+                font-size: 16px;
+
+            }
+            h1, h2, h3 {
+            color: #667eea;
+            margin-bottom: 15px;
+            line-height: 1.2;
+        }
+
+        h1 {
+            font-size: 2.5em;
+            border-bottom: 2px solid #e2e8f0;
+            padding-bottom: 10px;
+        }
+
+        h2 {
+            font-size: 2em;
+            margin-top: 30px;
+        }
+
+        h3 {
+            font-size: 1.5em;
+            margin-top: 25px;
+        }
+
+           p {
+            margin-bottom: 15px;
+            text-align: justify;
+        }
+           .math {
+            font-style: italic;
+            color: #2980b9;
+            background-color: #f1f8ff;
+            padding: 2px 5px;
+            border-radius: 4px;
+        }
+           .image-container {
+            margin: 20px 0;
+            text-align: center;
+        }
+
+        .image-container img {
+            max-width: 100%;
+            height: auto;
+            border-radius: 8px;
+            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+        }
+
+        .image-container img[data-full-src] {
+            width: 100%;
+            max-width: 1200px;
+        }
+
+            ol {
+                padding-left: 30px;
+            }
+            li {
+                margin-bottom: 10px;
+            }
+        </style>
+    </head>
+    <body>
+    '''
+
+# This function was in the original code, preserved for `/examcenter`.
+# `extracted_content` may be a string, a list of items, or any iterable of page
+# dicts from `extractdocx.iter_content`, which is consumed one page at a time.
+# Pages are numbered from `first_page`; with `standalone=False` only the body is
+# returned, for a chunk of pages added to an already loaded document.
+def format_extracted_document_with_embedded_images(extracted_content, first_page=1, standalone=True):
+    html_parts = [EXAM_DOCUMENT_HEAD] if standalone else []
+
+    def render_image(src, preview=None):
+        if preview:
+            # Show the low-resolution preview first; examprocess.js swaps in the
+            # full image from data-full-src as the page scrolls into view.
+            return (f'<div class="image-container"><img src="{preview}" data-full-src="{src}" '
+                    f'alt="Exam image"></div>\n')
+        return f'<div class="image-container"><img src="{src}" alt="Exam image"></div>\n'
+
+    rendered_pages = first_page - 1
+
+    def render_item(item):
+        nonlocal rendered_pages
+        if isinstance(item, str):
+            if item.startswith('data:image/'):
+                return render_image(item)
+            else:
+                return f'<p>{item}</p>\n'
+        elif isinstance(item, dict) and 'page' in item:
+            # A page from extractdocx.iter_content: its blocks in order, then any images
+            # not already placed among them. Images are either data URIs or /assets/ URLs.
+            # Pages are numbered as stored, which is how the question index refers to them.
+            rendered_pages += 1
+            previews = item.get('previews', {})
+            blocks = item.get('blocks', [])
+            placed = {block['image'] for block in blocks if 'image' in block}
+            return f'<div class="exam-page" id="exam-page-{rendered_pages}">\n' + \
+                   ''.join(render_item(block) for block in blocks) + \
+                   ''.join(render_image(image, previews.get(image))
+                           for image in item.get('images', []) if image not in placed) + \
+                   '</div>\n'
+        elif isinstance(item, dict) and 'image' in item:
+            return render_image(item['image'])
+        elif isinstance(item, dict):
+            text = item.get('text', '')
+            formulas = item.get('formulas', [])
+            rendered_text = f'<p>{text}</p>\n'
+            rendered_formulas = ''.join([f'<p class="math">{formula}</p>\n' for formula in formulas])
+            return rendered_text + rendered_formulas
+        else:
+            logger.warning(f"Unsupported item type: {type(item)}")
+            return ''
+
+    if isinstance(extracted_content, str):
+        html_parts.append(render_item(extracted_content))
+    elif isinstance(extracted_content, (list, tuple)) or hasattr(extracted_content, '__next__'):
+        for item in extracted_content:
+            html_parts.append(render_item(item))
+    else:
+        logger.error(f"Unsupported content type: {type(extracted_content)}")
+        html_parts.append('<p>Error: Unable to render content.</p>')
+
+    if standalone:
+        html_parts.append('''
+    </body>
+    </html>
+    ''')
+    return ''.join(html_parts)
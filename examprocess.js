@@ -25,6 +25,8 @@ document.addEventListener("DOMContentLoaded", async () => {
     let studentAnswers = {};
     let timerInterval;
     let currentCarouselIndex = 0; // Moved here to be accessible by all functions
+    let questionPages = {}; // Question number -> page of the rendered exam it starts on
+    let pageChunks = null; // The paged exam view: chunk layout from /examcenter and the chunks requested
     const beepAudio = new Audio('/static/img/assets/message-13716.mp3');
 
     /**
@@ -39,21 +41,25 @@ document.addEventListener("DOMContentLoaded", async () => {
                 throw new Error(errorData.error || `HTTP error! Status: ${response.status}`);
             }
             const data = await response.json();
-            
-            const { student_data, formatted_document, exam_time } = data;
 
-            if (!student_data || !formatted_document || !exam_time) {
+            const { student_data, pages, exam_time } = data;
+
+            if (!student_data || !pages || !exam_time) {
                 throw new Error("Incomplete exam data received from server.");
             }
 
             if (elements.welcomeMessage) elements.welcomeMessage.textContent = `Welcome, ${student_data.name || "Student"}`;
             if (elements.subjectDisplay) elements.subjectDisplay.textContent = student_data.exam_subject || "General Exam";
-            if (elements.questionContainer) elements.questionContainer.innerHTML = formatted_document;
+            if (elements.questionContainer) {
+                // Only the first pages are waited for; the rest follow as the student goes.
+                await setUpPagedDocument(elements.questionContainer, pages);
+            }
 
             const totalSeconds = timeStringToSeconds(exam_time);
             startCountdownTimer(totalSeconds);
             
             const questionLength = parseInt(student_data.question_length, 10);
+            await loadQuestionIndex();
             createOptionCarousel(questionLength);
             
         } catch (error) {
@@ -64,6 +70,142 @@ document.addEventListener("DOMContentLoaded", async () => {
         }
     }
 
+    /**
+     * Lays out a placeholder for every chunk of pages and loads the first one. The
+     * others are fetched when they come near the viewport or the student's current
+     * question, always one chunk ahead. Chunks are served with ETags, so reloads
+     * cost a 304.
+     * @param {HTMLElement} container - The element to hold the rendered exam.
+     * @param {Object} pages - The 'pages' layout from /examcenter.
+     */
+    async function setUpPagedDocument(container, pages) {
+        pageChunks = { ...pages, requests: {} };
+        container.innerHTML = '';
+        for (let chunk = 0; chunk < pages.chunks; chunk++) {
+            const placeholder = document.createElement('div');
+            placeholder.className = 'exam-chunk';
+            placeholder.id = `exam-chunk-${chunk}`;
+            placeholder.dataset.chunk = chunk;
+            placeholder.style.minHeight = '100vh'; // Keeps chunks that are not loaded yet out of view
+            container.appendChild(placeholder);
+        }
+
+        await loadPageChunk(0);
+        prefetchPageChunk(1);
+
+        if (!('IntersectionObserver' in window)) {
+            for (let chunk = 2; chunk < pages.chunks; chunk++) prefetchPageChunk(chunk);
+            return;
+        }
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    const chunk = parseInt(entry.target.dataset.chunk, 10);
+                    observer.unobserve(entry.target);
+                    prefetchPageChunk(chunk);
+                    prefetchPageChunk(chunk + 1);
+                }
+            });
+        }, { rootMargin: '600px 0px' });
+        container.querySelectorAll('.exam-chunk').forEach(placeholder => observer.observe(placeholder));
+    }
+
+    /**
+     * Fetches a chunk of pages into its placeholder, once. Returns a promise that
+     * settles when the chunk is in place; a failed chunk is retried when next needed.
+     */
+    function loadPageChunk(chunk) {
+        if (!pageChunks || chunk < 0 || chunk >= pageChunks.chunks) return Promise.resolve();
+        if (!pageChunks.requests[chunk]) {
+            pageChunks.requests[chunk] = fetch(`${pageChunks.url}${chunk}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(`Could not load exam pages. Status: ${response.status}`);
+                    return response.text();
+                })
+                .then(html => {
+                    const placeholder = document.getElementById(`exam-chunk-${chunk}`);
+                    placeholder.innerHTML = html;
+                    placeholder.style.minHeight = '';
+                    loadFullImagesLazily(placeholder);
+                })
+                .catch(error => {
+                    delete pageChunks.requests[chunk];
+                    throw error;
+                });
+        }
+        return pageChunks.requests[chunk];
+    }
+
+    function prefetchPageChunk(chunk) {
+        loadPageChunk(chunk).catch(error => console.warn(`Prefetch of page chunk ${chunk} failed:`, error));
+    }
+
+    function chunkOfPage(page) {
+        return Math.floor((page - 1) / pageChunks.chunk_size);
+    }
+
+    /**
+     * Page images arrive as small previews; swaps in each full-resolution image
+     * (from data-full-src) shortly before it scrolls into view.
+     * @param {HTMLElement} container - The element holding the rendered exam.
+     */
+    function loadFullImagesLazily(container) {
+        const images = container.querySelectorAll('img[data-full-src]');
+        const loadFull = (img) => {
+            const fullSrc = img.dataset.fullSrc;
+            if (!fullSrc) return;
+            delete img.dataset.fullSrc;
+            const full = new Image();
+            full.onload = () => { img.src = fullSrc; };
+            full.src = fullSrc; // Keep showing the preview until the full image has arrived
+        };
+
+        if (!('IntersectionObserver' in window)) {
+            images.forEach(loadFull);
+            return;
+        }
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    loadFull(entry.target);
+                }
+            });
+        }, { rootMargin: '600px 0px' });
+        images.forEach(img => observer.observe(img));
+    }
+
+    /**
+     * Fetches where each question starts, so the question panel can follow the
+     * option carousel. Navigation still works without it.
+     */
+    async function loadQuestionIndex() {
+        try {
+            const response = await fetch('/examcenter/questions');
+            if (!response.ok) return;
+            const { questions } = await response.json();
+            questions.forEach(q => { questionPages[q.number] = q.page; });
+        } catch (error) {
+            console.warn("Question index unavailable:", error);
+        }
+    }
+
+    async function scrollToQuestion(number) {
+        const page = questionPages[number];
+        if (!page) return;
+        if (pageChunks) {
+            await loadPageChunk(chunkOfPage(page)).catch(error => console.warn(error));
+        }
+        const pageElement = document.getElementById(`exam-page-${page}`);
+        if (pageElement) pageElement.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    }
+
+    /** Loads the chunk after the one holding a question, before the student gets there. */
+    function prefetchAhead(number) {
+        const page = questionPages[number];
+        if (page && pageChunks) prefetchPageChunk(chunkOfPage(page) + 1);
+    }
+
     function timeStringToSeconds(timeValue) {
         if (typeof timeValue === 'number') return timeValue;
         if (typeof timeValue === 'string') {
@@ -132,6 +274,9 @@ document.addEventListener("DOMContentLoaded", async () => {
         items.forEach((item, i) => {
             item.classList.toggle('hidden', i !== index);
         });
+        // Jump to the question's page when it starts on a different page.
+        if (questionPages[index + 1] !== questionPages[currentCarouselIndex + 1]) scrollToQuestion(index + 1);
+        prefetchAhead(index + 1);
         currentCarouselIndex = index;
     }
 
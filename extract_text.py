@@ -1,5 +1,5 @@
 import os
-from docx import Document
+from docx_stream import docx_text
 
 def extract_text_from_file(file_path):
     """Extract text from a given file (txt or docx)."""
@@ -27,11 +27,7 @@ def extract_text_from_txt(file_path):
 def extract_text_from_docx(file_path):
     """Extract text from a .docx file."""
     try:
-        document = Document(file_path)
-        text = []
-        for para in document.paragraphs:
-            text.append(para.text)
-        return '\n'.join(text)
+        return docx_text(file_path)
     except Exception as e:
         raise Exception(f"Error reading .docx file: {str(e)}")
 
@@ -3,11 +3,27 @@
 import os
 import fitz  # PyMuPDF
 import base64
+import hashlib
 import io
 import re
+import json
 import logging
-from docx import Document
-from PyPDF2 import PdfReader
+import tempfile
+import contextlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageChops, features
+from docx_stream import DocxReader, block_text as docx_block_text, docx_text
+
+# Optional text backends; the registry below skips them when they are not installed.
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    PdfReader = None
+try:
+    from docx import Document
+except ImportError:
+    Document = None
 
 
 # For cross-platform .doc to .docx conversion, you need 'unoconv' or a similar tool
@@ -18,38 +34,140 @@ from PyPDF2 import PdfReader
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(funcName)s] - %(message)s')
 logger = logging.getLogger('doc_extractor')
 
+# Bump this whenever a change to the extractors alters their output, so that
+# results cached by an older version are never served again.
+EXTRACTOR_VERSION = 7
+
+# Number of processes used to extract or render PDF pages. 1 keeps everything in
+# the calling process; it can be overridden per call with the `workers` argument.
+DEFAULT_PDF_WORKERS = int(os.environ.get('EXTRACTOR_WORKERS', 1))
+
+# Documents with fewer pages than this are always processed serially, since
+# starting a process pool costs more than it saves on short papers.
+PARALLEL_MIN_PAGES = 8
+
+# Pages handed to a pool worker at a time. Small chunks keep results flowing back
+# in order while bounding how many rendered pages are held in memory at once.
+PARALLEL_CHUNK_PAGES = 4
+
+# Resolution used when whole pages are rendered to images.
+PAGE_RENDER_DPI = 200
+
+# --- Page Image Encoding ---
+# Rendered pages are sized for the exam's question panel rather than for print:
+# wider images are scaled down before they are encoded.
+PAGE_IMAGE_MAX_WIDTH = 1200
+# Target size of one encoded page. Quality, colours and finally resolution are
+# reduced step by step until a page fits, so a class downloading pages over
+# school Wi-Fi fetches tens of KB per page rather than megabytes.
+PAGE_IMAGE_BYTE_BUDGET = 80 * 1024
+# Pages whose pixels are at least this fraction near-white or near-black are
+# line art (text, diagrams) and stay lossless with a small palette.
+LINE_ART_MIN_FLAT_FRACTION = 0.85
+# Lossy format used for photographic pages: WebP when Pillow supports it.
+PHOTO_IMAGE_FORMAT = 'webp' if features.check('webp') else 'jpeg'
+# Every rendered page also gets a small preview that the exam view shows at once,
+# loading the full-resolution image only as the student scrolls to it.
+PAGE_PREVIEWS = True
+PAGE_PREVIEW_WIDTH = 320
+PAGE_PREVIEW_BYTE_BUDGET = 8 * 1024
 
-def extract_content(file_path, contains_images=False):
+# Passing contains_images='auto' selects hybrid mode for PDFs: every page is
+# inspected and only pages that cannot be shown as text are rendered to images.
+IMAGE_MODE_AUTO = 'auto'
+
+# A page with fewer characters than this in its text layer is treated as scanned.
+HYBRID_MIN_TEXT_CHARS = 40
+# A page whose images or vector drawings cover more than this fraction of its area
+# carries content (diagrams, graphs, tables of symbols) that text alone would lose.
+HYBRID_MAX_GRAPHIC_COVERAGE = 0.15
+# Drawing paths thinner than this (in points) are rules and table borders, which
+# survive as text layout and do not justify rasterizing the page.
+HYBRID_MIN_DRAWING_SIZE = 4
+
+# --- Bounded-Memory Mode ---
+# Passing `memory_ceiling` (bytes) to iter_content keeps extraction of very large
+# documents within that budget: pool workers spill their pages to temp files
+# instead of sending them back in memory, only as many workers run as the ceiling
+# allows, and MuPDF's resource cache is emptied as pages go by.
+BOUNDED_WORKER_BYTES = 96 * 1024 * 1024  # Rough peak of one worker rendering a page
+BOUNDED_STORE_SHRINK_PAGES = 8
+
+
+def extract_content(file_path, contains_images=False, cache=None, workers=None, asset_store=None):
     """
     Master function to extract content from a file based on its extension.
     This function routes the request to the appropriate specialized extractor.
 
     Args:
         file_path (str): The path to the input file.
-        contains_images (bool): Flag to indicate if the PDF contains images.
+        contains_images (bool or str): Flag to indicate if the PDF contains images.
+            IMAGE_MODE_AUTO ('auto') decides page by page.
+        cache (ExtractionCache, optional): If given, results are looked up in and
+            stored to this cache, keyed by the file's content.
+        workers (int, optional): Number of processes used for PDF pages.
+            Defaults to DEFAULT_PDF_WORKERS.
+        asset_store (AssetStore, optional): If given, images are written to the
+            store and returned as short URLs instead of base64 data URIs.
 
     Returns:
-        tuple: A tuple of (extracted_text, extracted_images_base64_list).
+        tuple: A tuple of (extracted_text, extracted_images_list).
                'extracted_text' can be a string or a list of dicts.
-               'extracted_images' is a list of base64 data URIs.
+               'extracted_images' is a list of base64 data URIs or asset URLs.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"The file was not found at path: {file_path}")
 
+    if cache is None:
+        return _extract_content(file_path, contains_images, workers, asset_store)
+
+    key = cache.make_key(file_path, 'content', _image_mode_key(contains_images), asset_store is not None, EXTRACTOR_VERSION)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info(f"Extraction cache hit for '{file_path}'")
+        return tuple(cached)
+
+    result = _extract_content(file_path, contains_images, workers, asset_store)
+    # (None, None) means the extractor failed, and a result with neither text nor
+    # images is most likely a failure too; neither is cached, so the next upload
+    # of the file is extracted again.
+    if any(result):
+        cache.put(key, list(result))
+    return result
+
+
+def _extract_content(file_path, contains_images, workers=None, asset_store=None):
+    """Routes a file to its specialized extractor without consulting any cache."""
     file_extension = file_path.rsplit('.', 1)[-1].lower()
     logger.info(f"Extracting content from '{file_path}' (Type: {file_extension}, Images: {contains_images})")
 
     if file_extension == 'pdf':
-        if contains_images:
+        if contains_images == IMAGE_MODE_AUTO:
+            # Hybrid: text pages as text, and only pages that need it as images.
+            content = []
+            images = []
+            try:
+                for page in _iter_pdf_pages(_iter_pdf_hybrid_pages, file_path, workers, PAGE_RENDER_DPI, asset_store):
+                    content.extend(page["blocks"])
+                    images.extend(page["images"])
+            except Exception as e:
+                logger.error(f"Error processing PDF '{file_path}' in hybrid mode: {e}")
+                return None, None
+            return content, images
+        elif contains_images:
             # If the user says it's an image-based PDF, we treat each page as an image.
-            images = pdf_to_images(file_path)
+            try:
+                images = pdf_to_images(file_path, workers=workers, asset_store=asset_store)
+            except Exception as e:
+                logger.error(f"Error converting PDF pages to images: {e}")
+                return None, None
             return None, images # Return only images
         else:
             # Otherwise, extract structured text and any embedded images.
-            return extract_text_and_images_from_pdf(file_path)
+            return extract_text_and_images_from_pdf(file_path, workers=workers, asset_store=asset_store)
 
     elif file_extension == 'docx':
-        return extract_text_and_images_from_docx(file_path)
+        return extract_text_and_images_from_docx(file_path, asset_store=asset_store)
     
     elif file_extension == 'txt':
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -67,71 +185,603 @@ def extract_content(file_path, contains_images=False):
         raise ValueError(f"Unsupported file type: {file_extension}")
 
 
-def extract_text_and_images_from_pdf(pdf_path):
+def iter_content(file_path, contains_images=False, cache=None, workers=None, asset_store=None,
+                 memory_ceiling=None):
+    """
+    Streaming counterpart of `extract_content`. Yields the document one page at a
+    time, so that callers only ever hold a single page in memory.
+
+    Each page is a dict:
+        {"page": 1, "blocks": [{"text": ..., "formulas": [...]}], "images": [...]}
+    where 'images' holds base64 data URIs, or asset URLs when an `asset_store` is
+    given. DOCX and TXT files have no pages and are yielded as a single page.
+    In hybrid mode each page has either text blocks or a single page image.
+
+    Pages rendered to images also carry "previews", mapping each full image
+    reference to a small low-resolution version of it (see PAGE_PREVIEWS).
+    PDF pages carry a "fingerprint" of their content: with a cache, a re-uploaded
+    PDF only has its changed pages extracted again, and the rest are reused. PDFs
+    are cached as those pages plus an ordered manifest of their fingerprints, so
+    each page is stored once; other files are cached as a single stream.
+
+    With a `memory_ceiling` in bytes, PDFs are extracted in bounded-memory mode
+    (see BOUNDED_WORKER_BYTES), for 100+ MB compilations of past questions.
+
+    Unlike `extract_content`, errors are raised rather than swallowed, since a
+    partially consumed stream cannot be turned into an empty result.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"The file was not found at path: {file_path}")
+
+    if cache is None:
+        yield from _iter_content(file_path, contains_images, workers, asset_store, memory_ceiling=memory_ceiling)
+        return
+
+    if file_path.rsplit('.', 1)[-1].lower() == 'pdf':
+        manifest_key = cache.make_key(
+            file_path, 'manifest', _image_mode_key(contains_images), asset_store is not None, EXTRACTOR_VERSION
+        )
+        fingerprints = cache.get(manifest_key)
+        if fingerprints is not None:
+            logger.info(f"Extraction cache hit for the page manifest of '{file_path}'")
+        else:
+            fingerprints = pdf_page_fingerprints(file_path)
+        yield from _iter_content(file_path, contains_images, workers, asset_store, cache, memory_ceiling, fingerprints)
+        if not cache.contains(manifest_key):
+            cache.put(manifest_key, fingerprints)  # Only once every page is in the cache
+        return
+
+    key = cache.make_key(file_path, 'pages', _image_mode_key(contains_images), asset_store is not None, EXTRACTOR_VERSION)
+    cached_pages = cache.get_stream(key)
+    if cached_pages is not None:
+        logger.info(f"Extraction cache hit for '{file_path}'")
+        yield from cached_pages
+        return
+
+    yield from cache.put_stream(key, _iter_content(file_path, contains_images, workers, asset_store, cache, memory_ceiling))
+
+
+def count_pages(file_path):
+    """
+    Returns the number of pages `iter_content` will yield for a file at most, so
+    that callers can report extraction progress. DOCX and TXT files count as one.
+    """
+    if file_path.rsplit('.', 1)[-1].lower() == 'pdf':
+        with fitz.open(file_path) as doc:
+            return doc.page_count
+    return 1
+
+
+def _iter_content(file_path, contains_images, workers=None, asset_store=None, page_cache=None, memory_ceiling=None,
+                  fingerprints=None):
+    """
+    Routes a file to its page iterator. Whole documents are never looked up here,
+    but PDF pages are reused from `page_cache`, when given, by their fingerprint
+    (`fingerprints`, if already known).
+    """
+    file_extension = file_path.rsplit('.', 1)[-1].lower()
+    logger.info(f"Streaming content from '{file_path}' (Type: {file_extension}, Images: {contains_images})")
+
+    if file_extension == 'pdf':
+        if contains_images == IMAGE_MODE_AUTO:
+            page_iterator, args = _iter_pdf_hybrid_pages, (PAGE_RENDER_DPI, asset_store)
+        elif contains_images:
+            page_iterator, args = _iter_pdf_image_pages, (PAGE_RENDER_DPI, asset_store)
+        else:
+            page_iterator, args = _iter_pdf_text_pages, (asset_store,)
+
+        if page_cache is None:
+            yield from _iter_pdf_pages(page_iterator, file_path, workers, *args, memory_ceiling=memory_ceiling)
+        else:
+            options = ('page', _image_mode_key(contains_images), asset_store is not None, EXTRACTOR_VERSION)
+            yield from _iter_pdf_pages_incremental(
+                page_cache, options, page_iterator, file_path, workers, *args,
+                fingerprints=fingerprints, memory_ceiling=memory_ceiling
+            )
+
+    elif file_extension == 'docx':
+        # Images are kept where they occur, as {"image": ref} blocks between the text.
+        blocks = list(_iter_docx_blocks(file_path, asset_store))
+        images = list(dict.fromkeys(block["image"] for block in blocks if "image" in block))
+        yield {"page": 1, "blocks": blocks, "images": images}
+
+    elif file_extension == 'txt':
+        text, images = _extract_content(file_path, contains_images, workers, asset_store)
+        # Plain documents are rendered as a single paragraph, as before, so no
+        # formulas are split out of them.
+        yield {"page": 1, "blocks": [{"text": text, "formulas": []}], "images": images}
+
+    else:
+        # Let the non-streaming router raise its usual errors for .doc and unknown types.
+        _extract_content(file_path, contains_images, workers)
+
+
+def extract_text_and_images_from_pdf(pdf_path, workers=None, asset_store=None):
     """
     Extracts both structured text and any embedded images from a PDF file.
+    With more than one worker, page ranges are processed in parallel.
+    Each distinct image is returned once, however many pages it appears on.
     """
     content = []
-    images = []
+    images = {}  # Used as an ordered set of image references
     try:
-        with fitz.open(pdf_path) as doc:
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text("text")
-                if text.strip():
-                    content.append({"text": text, "formulas": extract_potential_formulas(text)})
-
-                # Extract embedded image objects
-                for img_index, img in enumerate(doc.get_page_images(page_num), 1):
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    img_data = base_image["image"]
-                    image_base64 = base64.b64encode(img_data).decode('utf-8')
-                    images.append(f'data:image/{base_image["ext"]};base64,{image_base64}')
+        for page in _iter_pdf_pages(_iter_pdf_text_pages, pdf_path, workers, asset_store):
+            content.extend(page["blocks"])
+            images.update(dict.fromkeys(page["images"]))
     except Exception as e:
         logger.error(f"Error processing PDF '{pdf_path}': {e}")
         return None, None
-    return content, images
+    return content, list(images)
 
 
-def extract_text_and_images_from_docx(docx_path):
+def extract_text_and_images_from_docx(docx_path, asset_store=None):
     """
     Extracts text and embedded images from a .docx file directly.
+    Images are returned in the order they appear in the document.
     """
-    doc = Document(docx_path)
-    full_text = [para.text for para in doc.paragraphs]
-    
+    full_text = []
     images = []
-    # docx images are stored in 'inlines' or 'blips'
-    for rel in doc.part.rels.values():
-        if "image" in rel.target_ref:
-            image_data = rel.target_part.blob
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            # You might need to determine the image type from headers if not obvious
-            images.append(f'data:image/png;base64,{image_base64}') # Assuming PNG for simplicity
-
+    for block in _iter_docx_blocks(docx_path, asset_store):
+        if "image" in block:
+            if block["image"] not in images:
+                images.append(block["image"])
+        else:
+            full_text.append(block["text"])
     return '\n'.join(full_text), images
 
 
-def pdf_to_images(pdf_path):
+def _iter_docx_blocks(docx_path, asset_store=None):
+    """
+    Streams a .docx file as page blocks in document order: consecutive paragraphs
+    and tables are merged into one text block, and each image becomes an
+    {"image": ref} block at the point where it occurs.
+    """
+    image_refs = _ImageDeduplicator(asset_store)
+    text_lines = []
+    with DocxReader(docx_path) as reader:
+        for block in reader.iter_blocks():
+            if block['type'] != 'image':
+                text_lines.append(docx_block_text(block))
+                continue
+            if text_lines:
+                yield {"text": '\n'.join(text_lines), "formulas": []}
+                text_lines = []
+            part = block['part']
+            # Several relationships may point at the same image part; key on the part's name.
+            # The part's content type (e.g. 'image/jpeg') gives the real image format.
+            yield {"image": image_refs.ref_for(
+                part, lambda: (reader.read_part(part), reader.content_type(part).rsplit('/', 1)[-1])
+            )}
+    if text_lines:
+        yield {"text": '\n'.join(text_lines), "formulas": []}
+
+
+def pdf_to_images(pdf_path, dpi=PAGE_RENDER_DPI, workers=None, asset_store=None):
     """
     Converts each page of a PDF into a high-quality image.
     Used when the entire page is treated as an image (e.g., scanned documents).
+    With more than one worker, page ranges are rendered in parallel. Errors are
+    raised, so that a failed conversion is never mistaken for a PDF without pages.
     """
-    images = []
-    try:
+    return [image
+            for page in _iter_pdf_pages(_iter_pdf_image_pages, pdf_path, workers, dpi, asset_store)
+            for image in page["images"]]
+
+
+# --- PDF Page Iteration ---
+# Each worker opens its own fitz document: PyMuPDF documents cannot be shared
+# between processes, and opening one is cheap compared to rendering pages.
+
+def _page_ranges(page_numbers, chunk_size):
+    """
+    Splits sorted page numbers into contiguous (start, stop) ranges of at most
+    `chunk_size` pages; a gap in the numbers always starts a new range.
+    """
+    ranges = []
+    for page_num in page_numbers:
+        if ranges and ranges[-1][1] == page_num and page_num - ranges[-1][0] < chunk_size:
+            ranges[-1][1] = page_num + 1
+        else:
+            ranges.append([page_num, page_num + 1])
+    return [tuple(page_range) for page_range in ranges]
+
+
+def _iter_pdf_pages(page_iterator, pdf_path, workers, *args, page_numbers=None, memory_ceiling=None):
+    """
+    Yields the pages produced by `page_iterator(pdf_path, start, stop, *args)` in page
+    order, for every page or only the (0-based, sorted) `page_numbers` given.
+    Small documents, or a worker count of 1, are processed in this process.
+    Otherwise small page ranges are handed to a process pool, with only a couple of
+    ranges per worker in flight so memory stays bounded while the pool is busy.
+    With a `memory_ceiling`, the pool's pages travel through temp files instead.
+    """
+    workers = workers or DEFAULT_PDF_WORKERS
+    if memory_ceiling:
+        workers = min(workers, max(1, memory_ceiling // BOUNDED_WORKER_BYTES))
+    if page_numbers is None:
         with fitz.open(pdf_path) as doc:
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                # Use a higher DPI for better quality
-                pix = page.get_pixmap(dpi=200)
-                img_data = pix.tobytes("png")
-                image_base64 = base64.b64encode(img_data).decode('utf-8')
-                images.append(f'data:image/png;base64,{image_base64}')
-    except Exception as e:
-        logger.error(f"Error converting PDF pages to images: {e}")
-        return []
-    return images
+            page_numbers = range(len(doc))
+    page_count = len(page_numbers)
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        for start, stop in _page_ranges(page_numbers, page_count or 1):
+            yield from _releasing_caches(page_iterator(pdf_path, start, stop, *args), memory_ceiling)
+        return
+
+    chunk_size = max(1, min(PARALLEL_CHUNK_PAGES, -(-page_count // workers)))
+    collect = _spill_pages if memory_ceiling else _collect_pages
+    logger.info(f"Processing {page_count} pages of '{pdf_path}' across {workers} workers")
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for start, stop in _page_ranges(page_numbers, chunk_size):
+                    pending.append(pool.submit(collect, page_iterator, pdf_path, start, stop, *args))
+                    if len(pending) >= workers * 2:
+                        # Results are taken in submission order, which keeps the pages in order.
+                        yield from _chunk_pages(pending.popleft().result())
+                while pending:
+                    yield from _chunk_pages(pending.popleft().result())
+            finally:
+                for future in pending:
+                    future.cancel()
+    finally:
+        # The pool has shut down, so every future left is cancelled or finished.
+        for future in pending:
+            if not future.cancelled() and future.exception() is None and isinstance(future.result(), str):
+                _remove_spill_file(future.result())
+
+
+def _collect_pages(page_iterator, pdf_path, start, stop, *args):
+    """Runs a page iterator inside a pool worker and returns its pages as a list."""
+    return list(page_iterator(pdf_path, start, stop, *args))
+
+
+def _spill_pages(page_iterator, pdf_path, start, stop, *args):
+    """
+    Bounded-memory counterpart of `_collect_pages`: writes the pages to a temp file,
+    one JSON line each, as they are produced, and returns the file's path.
+    """
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', prefix='extract-', suffix='.jsonl', delete=False) as f:
+        try:
+            for page in _releasing_caches(page_iterator(pdf_path, start, stop, *args), True):
+                f.write(json.dumps(page))
+                f.write('\n')
+        except BaseException:
+            f.close()
+            _remove_spill_file(f.name)
+            raise
+    return f.name
+
+
+def _chunk_pages(result):
+    """Yields the pages of a finished pool chunk: a list, or a spill file read line by line and then removed."""
+    if not isinstance(result, str):
+        yield from result
+        return
+    try:
+        with open(result, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    finally:
+        _remove_spill_file(result)
+
+
+def _remove_spill_file(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Could not remove spill file '{path}': {e}")
+
+
+def _releasing_caches(pages, bounded):
+    """Passes pages through, emptying MuPDF's resource cache every few pages when `bounded`."""
+    for count, page in enumerate(pages, 1):
+        yield page
+        if bounded and count % BOUNDED_STORE_SHRINK_PAGES == 0:
+            fitz.TOOLS.store_shrink(100)
+
+
+def _iter_pdf_pages_incremental(cache, options, page_iterator, pdf_path, workers, *args, fingerprints=None,
+                                memory_ceiling=None):
+    """
+    Like `_iter_pdf_pages`, but reuses pages whose fingerprint is already cached
+    under `options` and extracts only the rest. Fixing a typo on one page of a
+    re-uploaded paper therefore re-extracts that page alone.
+    """
+    if fingerprints is None:
+        fingerprints = pdf_page_fingerprints(pdf_path)
+    keys = [cache.make_fragment_key(fingerprint, *options) for fingerprint in fingerprints]
+    missing = [page_num for page_num, key in enumerate(keys) if not cache.contains(key)]
+    logger.info(f"Reusing {len(keys) - len(missing)} of {len(keys)} pages of '{pdf_path}' from the cache")
+    # Closed on the way out, so that an abandoned stream releases the open document
+    # and any worker pool or spill files behind it.
+    with contextlib.closing(_iter_pdf_pages(
+        page_iterator, pdf_path, workers, *args, page_numbers=missing, memory_ceiling=memory_ceiling
+    )) as fresh_pages:
+        missing = set(missing)
+        for page_num, (fingerprint, key) in enumerate(zip(fingerprints, keys)):
+            page = None if page_num in missing else cache.get(key)
+            if page is None:
+                if page_num in missing:
+                    page = next(fresh_pages)
+                else:
+                    # Evicted since we checked; extract it on its own.
+                    with contextlib.closing(page_iterator(pdf_path, page_num, page_num + 1, *args)) as single_page:
+                        page = next(single_page)
+                page["fingerprint"] = fingerprint
+                cache.put(key, page)
+            page["page"] = page_num + 1  # The page may have moved since it was cached
+            yield page
+
+
+def pdf_page_fingerprints(pdf_path):
+    """
+    Returns a fingerprint for every page of a PDF: a hash of everything that
+    affects how the page is extracted or rendered (its size and rotation, content
+    streams, fonts, images, form XObjects and annotations). Pages with the same
+    fingerprint give the same extraction result, whichever file they came from.
+    """
+    stream_digests = {}  # xref -> digest, as images and fonts are usually shared between pages
+
+    def stream_digest(doc, xref):
+        if xref not in stream_digests:
+            stream_digests[xref] = hashlib.sha256(doc.xref_stream_raw(xref) or b'').hexdigest()
+        return stream_digests[xref]
+
+    fingerprints = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            sha = hashlib.sha256()
+            sha.update(repr((tuple(page.rect), page.rotation)).encode('utf-8'))
+            sha.update(page.read_contents())
+            for font in page.get_fonts(full=True):
+                sha.update(repr(font[1:6]).encode('utf-8'))  # ext, type, basefont, name, encoding
+            for img in page.get_images(full=True):
+                sha.update(repr((img[2:8], stream_digest(doc, img[0]))).encode('utf-8'))
+            for xobject in page.get_xobjects():
+                sha.update(repr((xobject[1], stream_digest(doc, xobject[0]))).encode('utf-8'))
+            for annot in page.annots() or ():
+                sha.update(doc.xref_object(annot.xref, compressed=True).encode('utf-8'))
+            fingerprints.append(sha.hexdigest())
+    return fingerprints
+
+
+def _iter_pdf_text_pages(pdf_path, start, stop, asset_store=None):
+    """Yields the text blocks and embedded images of pages [start, stop) of a PDF."""
+    image_refs = _ImageDeduplicator(asset_store)
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
+            text = page.get_text("text")
+            blocks = []
+            if text.strip():
+                blocks.append({"text": text, "formulas": extract_potential_formulas(text)})
+
+            # Extract embedded image objects. A crest or logo repeated on every page is
+            # the same xref each time, so it is only decoded and encoded once.
+            images = []
+            for img_index, img in enumerate(doc.get_page_images(page_num), 1):
+                xref = img[0]
+                ref = image_refs.ref_for(xref, lambda: _load_pdf_image(doc, xref))
+                if ref not in images:
+                    images.append(ref)
+
+            yield {"page": page_num + 1, "blocks": blocks, "images": images}
+
+
+def _iter_pdf_image_pages(pdf_path, start, stop, dpi, asset_store=None):
+    """Yields pages [start, stop) of a PDF, each rendered to a single image."""
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
+            yield _rendered_page(page_num, page, dpi, asset_store)
+
+
+def _iter_pdf_hybrid_pages(pdf_path, start, stop, dpi, asset_store=None):
+    """
+    Yields pages [start, stop) of a PDF, emitting text blocks for pages whose text
+    layer carries the content and a rendered image only for pages that need one.
+    """
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
+            text = page.get_text("text")
+            if page_needs_raster(page, text):
+                yield _rendered_page(page_num, page, dpi, asset_store)
+            else:
+                yield {"page": page_num + 1,
+                       "blocks": [{"text": text, "formulas": extract_potential_formulas(text)}],
+                       "images": []}
+
+
+def _rendered_page(page_num, page, dpi, asset_store=None):
+    """Builds the page dict for a page shown as an image, with its preview if enabled."""
+    image = _render_page(page, dpi, PAGE_IMAGE_MAX_WIDTH)
+    full_ref = _image_ref(*encode_page_image(image), asset_store)
+    record = {"page": page_num + 1, "blocks": [], "images": [full_ref]}
+    if PAGE_PREVIEWS:
+        preview_data, preview_ext = encode_page_image(
+            image, max_width=PAGE_PREVIEW_WIDTH, byte_budget=PAGE_PREVIEW_BYTE_BUDGET
+        )
+        record["previews"] = {full_ref: _image_ref(preview_data, preview_ext, asset_store)}
+    return record
+
+
+def render_page_image(page, dpi=PAGE_RENDER_DPI, max_width=None, byte_budget=None):
+    """
+    Renders a PDF page and encodes it for delivery to students. Returns the
+    encoded bytes and their file extension.
+
+    The page is rendered at `dpi`, or lower if that would exceed `max_width`
+    pixels, and then handed to `encode_page_image`.
+    """
+    max_width = max_width or PAGE_IMAGE_MAX_WIDTH
+    image = _render_page(page, dpi, max_width)
+    return encode_page_image(image, max_width=max_width, byte_budget=byte_budget)
+
+
+def _render_page(page, dpi, max_width):
+    """Rasterizes a PDF page to an RGB Pillow image no wider than `max_width` pixels."""
+    page_width_inches = page.rect.width / 72
+    if page_width_inches:
+        dpi = min(dpi, int(max_width / page_width_inches))
+    pix = page.get_pixmap(dpi=max(dpi, 1), alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def encode_page_image(image, max_width=None, byte_budget=None):
+    """
+    Picks a format and quality for a rendered page and returns (bytes, ext).
+
+    Line art (text, diagrams) is encoded losslessly as a palette PNG, in greyscale
+    when the page has no colour. Photographic pages use PHOTO_IMAGE_FORMAT. Either
+    way the encoding is tightened until it fits `byte_budget`, and as a last resort
+    the page is scaled down.
+    """
+    max_width = max_width or PAGE_IMAGE_MAX_WIDTH
+    byte_budget = byte_budget or PAGE_IMAGE_BYTE_BUDGET
+
+    if image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+
+    is_grayscale = _is_grayscale(image)
+    if is_grayscale:
+        image = image.convert("L")
+    is_line_art = _is_line_art(image)
+
+    while True:
+        if is_line_art:
+            # Fewer palette colours first: antialiasing is all that the extra shades carry.
+            for colors in ((16, 8, 4) if is_grayscale else (64, 32, 16)):
+                if is_grayscale:
+                    paletted = _grayscale_palette_image(image, colors)
+                else:
+                    paletted = image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+                encoded = _encode(paletted, 'png', optimize=True)
+                if len(encoded[0]) <= byte_budget:
+                    return encoded
+        else:
+            for quality in (80, 65, 50, 40):
+                encoded = _encode(image, PHOTO_IMAGE_FORMAT, quality=quality)
+                if len(encoded[0]) <= byte_budget:
+                    return encoded
+
+        if image.width <= 320:
+            return encoded  # Small enough that further scaling would make it unreadable
+        image = image.resize((round(image.width * 0.8), round(image.height * 0.8)), Image.LANCZOS)
+
+
+def _encode(image, image_format, **options):
+    """Encodes a Pillow image and returns (bytes, ext)."""
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue(), 'jpg' if image_format == 'jpeg' else image_format
+
+
+def _grayscale_palette_image(image, levels):
+    """
+    Maps a greyscale image onto `levels` evenly spaced grey levels as a palette
+    image. This is much faster than Pillow's general-purpose quantizers.
+    """
+    indexed = image.point([round(value * (levels - 1) / 255) for value in range(256)])
+    paletted = Image.frombytes("P", indexed.size, indexed.tobytes())
+    paletted.putpalette([round(i * 255 / (levels - 1)) for i in range(levels) for _ in range(3)])
+    return paletted
+
+
+def _is_grayscale(image):
+    """True if no pixel of the (downsampled) image has a noticeable colour cast."""
+    if image.mode == "L":
+        return True
+    sample = image.copy()
+    sample.thumbnail((128, 128))
+    red, green, blue = sample.split()
+    spread = max(ImageChops.difference(red, green).getextrema()[1],
+                 ImageChops.difference(green, blue).getextrema()[1])
+    return spread <= 12
+
+
+def _is_line_art(image):
+    """True if the image is mostly flat background and ink, as text and diagrams are."""
+    histogram = image.convert("L").histogram()
+    flat_pixels = sum(histogram[:32]) + sum(histogram[224:])
+    return flat_pixels / sum(histogram) >= LINE_ART_MIN_FLAT_FRACTION
+
+
+def page_needs_raster(page, text=None):
+    """
+    Decides whether a PDF page must be shown as an image. That is the case for
+    scanned pages with little or no text layer, and for pages where images or
+    vector drawings cover a significant part of the page.
+    """
+    if text is None:
+        text = page.get_text("text")
+    if len(text.strip()) < HYBRID_MIN_TEXT_CHARS:
+        return True
+
+    page_area = abs(page.rect)
+    if not page_area:
+        return False
+
+    graphic_area = 0.0
+    for image_info in page.get_image_info():
+        graphic_area += abs(fitz.Rect(image_info["bbox"]) & page.rect)
+    for drawing in page.get_drawings():
+        rect = drawing["rect"] & page.rect
+        if rect.width >= HYBRID_MIN_DRAWING_SIZE and rect.height >= HYBRID_MIN_DRAWING_SIZE:
+            graphic_area += abs(rect)
+
+    return graphic_area / page_area > HYBRID_MAX_GRAPHIC_COVERAGE
+
+
+def _image_mode_key(contains_images):
+    """Normalises contains_images for cache keys, keeping 'auto' distinct from True."""
+    return IMAGE_MODE_AUTO if contains_images == IMAGE_MODE_AUTO else bool(contains_images)
+
+
+def _load_pdf_image(doc, xref):
+    """Returns the raw bytes and file extension of an embedded PDF image."""
+    base_image = doc.extract_image(xref)
+    return base_image["image"], base_image["ext"]
+
+
+class _ImageDeduplicator:
+    """
+    Hands out a single reference per distinct image within a document. Images are
+    matched first by their source key (a PDF xref or a DOCX part name), which
+    avoids decoding them again, and then by a hash of their bytes, which catches
+    identical images stored under different keys.
+    """
+
+    def __init__(self, asset_store=None):
+        self.asset_store = asset_store
+        self._refs_by_key = {}
+        self._refs_by_digest = {}
+
+    def ref_for(self, key, load):
+        """Returns the reference for `key`, calling `load()` -> (bytes, ext) only on first sight."""
+        ref = self._refs_by_key.get(key)
+        if ref is None:
+            img_data, ext = load()
+            digest = hashlib.sha256(img_data).digest()
+            ref = self._refs_by_digest.get(digest)
+            if ref is None:
+                ref = _image_ref(img_data, ext, self.asset_store)
+                self._refs_by_digest[digest] = ref
+            self._refs_by_key[key] = ref
+        return ref
+
+
+def _image_ref(img_data, ext, asset_store=None):
+    """
+    Returns how an image is referenced in extracted content: a URL into the asset
+    store when one is given, otherwise an inline base64 data URI.
+    """
+    if asset_store is not None:
+        return asset_store.put(img_data, ext)
+    image_base64 = base64.b64encode(img_data).decode('utf-8')
+    return f'data:image/{ext};base64,{image_base64}'
 
 
 def extract_potential_formulas(text):
@@ -142,29 +792,95 @@ def extract_potential_formulas(text):
     return re.findall(formula_pattern, text)
 
 
-def extract_text_from_any_file(file_path):
+# --- Plain Text Backends ---
+# Answer keys only need plain text. Each format maps to its text backends, fastest
+# first; backends whose library is not installed are skipped. PDFs default to
+# PyMuPDF, which question extraction already loads, rather than PyPDF2.
+# benchmarks/bench_text_backends.py measures the ranking on real documents.
+
+TextBackend = namedtuple('TextBackend', 'name function available')
+
+TEXT_BACKENDS = {}
+
+
+def register_text_backend(extension, name, function, available=True, rank=None):
+    """
+    Adds a plain text backend for files with `extension`. Backends are tried in
+    rank order (0 is the first choice); by default a new one is ranked last.
+    """
+    backends = TEXT_BACKENDS.setdefault(extension, [])
+    backends[:] = [backend for backend in backends if backend.name != name]
+    backends.insert(len(backends) if rank is None else rank, TextBackend(name, function, available))
+
+
+def text_backends(extension):
+    """Returns the names of the available text backends for `extension`, fastest first."""
+    return [backend.name for backend in TEXT_BACKENDS.get(extension, []) if backend.available]
+
+
+def _select_text_backend(extension, name=None):
+    """Returns the named backend, or the fastest available one, for `extension`."""
+    candidates = [backend for backend in TEXT_BACKENDS.get(extension, []) if backend.available]
+    if name is not None:
+        candidates = [backend for backend in candidates if backend.name == name]
+        if not candidates:
+            raise ValueError(f"Text backend '{name}' is not available for .{extension} files")
+    if not candidates:
+        raise ValueError(f"Cannot extract plain text from unsupported file type: {extension}")
+    return candidates[0]
+
+
+def _pdf_text_pymupdf(file_path):
+    with fitz.open(file_path) as doc:
+        return "\n".join(page.get_text("text") for page in doc)
+
+
+def _pdf_text_pypdf2(file_path):
+    text_parts = []
+    with open(file_path, 'rb') as f:
+        pdf_reader = PdfReader(f)
+        for page in pdf_reader.pages:
+            text_parts.append(page.extract_text())
+    return "\n".join(text_parts)
+
+
+def _docx_text_python_docx(file_path):
+    return "\n".join(para.text for para in Document(file_path).paragraphs)
+
+
+def _txt_text(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+register_text_backend('pdf', 'pymupdf', _pdf_text_pymupdf)
+register_text_backend('pdf', 'pypdf2', _pdf_text_pypdf2, available=PdfReader is not None)
+register_text_backend('docx', 'docx_stream', docx_text)
+register_text_backend('docx', 'python-docx', _docx_text_python_docx, available=Document is not None)
+register_text_backend('txt', 'plain', _txt_text)
+
+
+def extract_text_from_any_file(file_path, cache=None, backend=None):
     """
     Utility to get plain text from PDF, DOCX, or TXT for answer key processing.
+    The fastest available backend for the format is used unless `backend` names
+    one (see TEXT_BACKENDS). If a cache is given, the text is looked up in and
+    stored to it.
     """
-    file_extension = file_path.rsplit('.', 1)[-1].lower()
+    selected = _select_text_backend(file_path.rsplit('.', 1)[-1].lower(), backend)
+    if cache is None:
+        return selected.function(file_path)
 
-    if file_extension == 'pdf':
-        text_parts = []
-        with open(file_path, 'rb') as f:
-            pdf_reader = PdfReader(f)
-            for page in pdf_reader.pages:
-                text_parts.append(page.extract_text())
-        return "\n".join(text_parts)
-    
-    elif file_extension == 'docx':
-        doc = Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
+    key = cache.make_key(file_path, 'text', selected.name, EXTRACTOR_VERSION)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info(f"Extraction cache hit for '{file_path}'")
+        return cached
 
-    elif file_extension == 'txt':
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    else:
-        raise ValueError(f"Cannot extract plain text from unsupported file type: {file_extension}")
+    text = selected.function(file_path)
+    if text and text.strip():  # Empty text is not cached, so the file is read again next time
+        cache.put(key, text)
+    return text
 
 
 def format_extracted_answers(answer_content_string):
@@ -0,0 +1,285 @@
+# extraction_cache.py a persistent, content-addressed cache for extracted documents
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger('extraction_cache')
+
+# Files are hashed in chunks so that large PDFs never have to be held in memory.
+HASH_CHUNK_SIZE = 1024 * 1024
+# Temp files older than this were left behind by an interrupted write. Younger ones
+# may belong to another process that is still writing into the same directory.
+STALE_TMP_SECONDS = 60 * 60
+
+
+class ExtractionCache:
+    """
+    Stores extraction results on disk, keyed by a hash of the file bytes plus the
+    extraction options and the extractor version. Because the key is derived from
+    the file's content, the same question PDF uploaded under another name (or reused
+    for another class) is a cache hit.
+
+    Values are stored either whole (`get`/`put`) or as a stream of JSON records,
+    one per line (`get_stream`/`put_stream`), so that page-by-page extraction can
+    be cached without ever holding the full document in memory.
+
+    The cache is bounded by `max_bytes`. When it grows past that limit, the least
+    recently used entries are evicted first. Usage is tracked through each entry's
+    modification time, so the LRU order survives a server restart.
+
+    Several processes may share one cache directory; each keeps its own index and
+    picks up the others' entries on `reload`.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # entry filename -> size in bytes, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        # (path, size, mtime_ns) -> sha256 hex digest, to avoid re-hashing unchanged files
+        self._digest_memo = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    # --- Keys ---
+
+    def file_digest(self, file_path):
+        """Returns the sha256 hex digest of a file's bytes."""
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digest_memo.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self._digest_memo[memo_key] = digest
+        return digest
+
+    def make_key(self, file_path, *options):
+        """
+        Builds a cache key for a file and the options it was extracted with.
+        The key starts with the file digest so that every variant of a file
+        can be invalidated together.
+        """
+        return f"{self.file_digest(file_path)}-{self._options_digest(options)}"
+
+    def make_fragment_key(self, fingerprint, *options):
+        """
+        Builds a cache key for part of a document, such as a single page, from a
+        fingerprint of its content. Fragments are shared by every file containing
+        them, so they are not removed by `invalidate(file_path=...)`.
+        """
+        return f"fragment-{fingerprint}-{self._options_digest(options)}"
+
+    @staticmethod
+    def _options_digest(options):
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    # --- Lookups ---
+
+    def contains(self, key):
+        """Returns True if a whole value is cached under `key`, without reading it."""
+        with self._lock:
+            return f"{key}.json" in self._entries
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if it is not cached."""
+        entry = f"{key}.json"
+        with self._lock:
+            if not self._touch(entry):
+                return None
+            try:
+                with open(self._entry_path(entry), 'r', encoding='utf-8') as f:
+                    return json.load(f)['value']
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Dropping unreadable cache entry '{entry}': {e}")
+                self._remove(entry)
+                return None
+
+    def put(self, key, value):
+        """Stores a JSON-serialisable value under `key`, evicting old entries if needed."""
+        entry = f"{key}.json"
+        tmp_path = self._tmp_path(entry)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'value': value}, f)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Could not write cache entry '{entry}': {e}")
+            self._discard(tmp_path)
+            return
+        self._commit(entry, tmp_path)
+
+    def get_stream(self, key):
+        """
+        Returns an iterator over the records cached under `key`, or None if the
+        stream is not cached. Records are read lazily, one line at a time.
+        """
+        entry = f"{key}.jsonl"
+        with self._lock:
+            if not self._touch(entry):
+                return None
+        return self._read_stream(entry)
+
+    def put_stream(self, key, records):
+        """
+        Passes `records` through unchanged while writing each one to the cache.
+        The entry only becomes visible once the iterator is fully consumed, so an
+        interrupted or failed extraction never leaves a truncated entry behind.
+        """
+        entry = f"{key}.jsonl"
+        tmp_path = self._tmp_path(entry)
+        completed = False
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record))
+                    f.write('\n')
+                    yield record
+            completed = True
+        finally:
+            if completed:
+                self._commit(entry, tmp_path)
+            else:
+                self._discard(tmp_path)
+
+    # --- Invalidation ---
+
+    def invalidate(self, key=None, file_path=None):
+        """
+        Removes a single entry by key, or every entry derived from a file.
+        Returns the number of entries removed.
+        """
+        if key is None and file_path is None:
+            raise ValueError("Either 'key' or 'file_path' must be given.")
+
+        with self._lock:
+            if key is not None:
+                targets = [e for e in (f"{key}.json", f"{key}.jsonl") if e in self._entries]
+            else:
+                prefix = f"{self.file_digest(file_path)}-"
+                targets = [e for e in self._entries if e.startswith(prefix)]
+            for target in targets:
+                self._remove(target)
+        return len(targets)
+
+    def clear(self):
+        """Removes every entry from the cache. Returns the number of entries removed."""
+        with self._lock:
+            entries = list(self._entries)
+            for entry in entries:
+                self._remove(entry)
+        return len(entries)
+
+    def reload(self):
+        """Re-reads the index from disk, e.g. after another process has added entries."""
+        self._load_index()
+
+    def stats(self):
+        """Returns a small summary of the cache for logging and admin endpoints."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    # --- Internals ---
+
+    def _entry_path(self, entry):
+        return os.path.join(self.cache_dir, entry)
+
+    def _tmp_path(self, entry):
+        return f"{self._entry_path(entry)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _touch(self, entry):
+        """Marks an entry as recently used. Returns False if it is not cached. Caller holds the lock."""
+        if entry not in self._entries:
+            return False
+        try:
+            os.utime(self._entry_path(entry))  # Keeps the on-disk LRU order in step
+        except OSError:
+            self._remove(entry)
+            return False
+        self._entries.move_to_end(entry)
+        return True
+
+    def _read_stream(self, entry):
+        with open(self._entry_path(entry), 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _commit(self, entry, tmp_path):
+        """Atomically moves a finished temp file into place, so readers never see a half-written entry."""
+        try:
+            os.replace(tmp_path, self._entry_path(entry))
+            size = os.path.getsize(self._entry_path(entry))
+        except OSError as e:
+            logger.error(f"Could not commit cache entry '{entry}': {e}")
+            self._discard(tmp_path)
+            return
+        with self._lock:
+            self._total_bytes -= self._entries.pop(entry, 0)
+            self._entries[entry] = size
+            self._total_bytes += size
+            self._evict()
+
+    @staticmethod
+    def _discard(tmp_path):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        """Rebuilds the LRU index from the files already on disk."""
+        found = []
+        now = time.time()
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+                if filename.endswith('.tmp'):
+                    if now - stat.st_mtime > STALE_TMP_SECONDS:
+                        os.remove(path)  # Left behind by an interrupted write
+                    continue
+            except OSError:
+                continue  # Removed by another process while we were listing
+            if filename.endswith(('.json', '.jsonl')):
+                found.append((stat.st_mtime, filename, stat.st_size))
+
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            for _, entry, size in sorted(found):
+                self._entries[entry] = size
+                self._total_bytes += size
+            self._evict()
+        logger.info(f"Extraction cache ready: {len(self._entries)} entries, {self._total_bytes} bytes.")
+
+    def _evict(self):
+        """Drops least recently used entries until the cache fits. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest_entry = next(iter(self._entries))
+            logger.info(f"Evicting extraction cache entry '{oldest_entry}'.")
+            self._remove(oldest_entry)
+
+    def _remove(self, entry):
+        """Deletes an entry from disk and the index. Caller holds the lock."""
+        self._total_bytes -= self._entries.pop(entry, 0)
+        try:
+            os.remove(self._entry_path(entry))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. on Windows while another request is still streaming the entry
+            logger.warning(f"Could not delete cache entry '{entry}': {e}")
@@ -0,0 +1,158 @@
+# extraction_jobs.py a bounded background queue for document extraction jobs
+
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger('extraction_jobs')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when a job is submitted while the queue already holds its maximum."""
+
+
+class ExtractionJob:
+    """
+    The state of a single extraction job. Jobs are created by `ExtractionJobQueue`;
+    the function running a job reports progress through `report`.
+    """
+
+    def __init__(self, queue, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = JOB_QUEUED
+        self.pages_done = 0
+        self.total_pages = None
+        self.result = None
+        self.error = None
+        self.error_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._queue = queue
+
+    def report(self, pages_done, total_pages=None):
+        """Records how many pages have been processed and notifies listeners."""
+        self.pages_done = pages_done
+        if total_pages is not None:
+            self.total_pages = total_pages
+        self._queue._notify(self)
+
+    @property
+    def active(self):
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'total_pages': self.total_pages,
+            'result': self.result,
+            'error': self.error,
+            'error_code': self.error_code,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class ExtractionJobQueue:
+    """
+    Runs extraction jobs on a fixed number of background threads so that HTTP
+    requests return immediately instead of waiting for a whole document.
+
+    Each job has a `key` (e.g. the exam it extracts for). Submitting a key that
+    already has a queued or running job returns that job rather than starting a
+    second one. At most `max_pending` jobs may be queued or running at once.
+
+    `notify`, if given, is called with the job's `to_dict()` on every state change
+    and progress report; the server uses it to push Socket.IO events.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, notify=None, keep_finished=100):
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._notify_callback = notify
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extraction-job')
+        self._lock = threading.Lock()
+        # job id -> job, oldest first
+        self._jobs = OrderedDict()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queues `fn(job, *args, **kwargs)` and returns its job. The function's return
+        value becomes the job's result; an exception marks the job as failed, with
+        the exception's `code` attribute (if any) as its error code.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.active:
+                    logger.info(f"Extraction job {job.id} for '{key}' is already {job.status}.")
+                    return job
+            if sum(1 for job in self._jobs.values() if job.active) >= self.max_pending:
+                raise JobQueueFull(f"Too many extraction jobs are pending (limit {self.max_pending}).")
+            job = ExtractionJob(self, key)
+            self._jobs[job.id] = job
+            self._prune()
+
+        logger.info(f"Queued extraction job {job.id} for '{key}'.")
+        self._notify(job)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with the given id, or None if it is unknown or was pruned."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Returns every tracked job, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        self._notify(job)
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = JOB_DONE
+            logger.info(f"Extraction job {job.id} for '{job.key}' finished: {job.pages_done} pages.")
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.error_code = getattr(e, 'code', 'error')
+            job.status = JOB_FAILED
+            logger.error(f"Extraction job {job.id} for '{job.key}' failed: {e}", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+            self._notify(job)
+
+    def _notify(self, job):
+        if self._notify_callback is None:
+            return
+        try:
+            self._notify_callback(job.to_dict())
+        except Exception as e:
+            logger.warning(f"Could not send progress for extraction job {job.id}: {e}")
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond `keep_finished`. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
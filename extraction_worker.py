@@ -0,0 +1,185 @@
+# extraction_worker.py runs document extraction in a separate, resource-limited process
+
+import os
+import re
+import time
+import signal
+import logging
+import multiprocessing
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+import extractdocx
+from extraction_cache import ExtractionCache
+from asset_store import AssetStore
+
+
+logger = logging.getLogger('extraction_worker')
+
+# A worker that has not exited this long after its last record is killed.
+EXIT_GRACE_SECONDS = 5
+
+# Structured error codes reported for failed extractions.
+ERROR_TIMEOUT = 'timeout'
+ERROR_MEMORY_LIMIT = 'memory_limit'
+ERROR_CRASHED = 'worker_crashed'
+ERROR_UNSUPPORTED = 'unsupported_document'
+ERROR_FAILED = 'extraction_failed'
+
+# How MuPDF reports an allocation that failed, e.g. under the worker's RLIMIT_AS:
+# PyMuPDF raises these as its own exception types (or as RuntimeError) rather
+# than as MemoryError, e.g. "code=2: malloc (768000000 bytes) failed".
+MUPDF_ALLOCATION_FAILURE = re.compile(r'malloc \(\d+ bytes\) failed|out of memory|cannot allocate memory', re.IGNORECASE)
+
+
+class ExtractionWorkerError(RuntimeError):
+    """An extraction that failed, timed out or was killed inside its worker process."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def iter_isolated(target, args=(), timeout=None, memory_limit=None):
+    """
+    Runs the generator function `target(*args)` in a new worker process and yields
+    the values it produces, as they arrive.
+
+    `timeout` is a wall-clock limit in seconds for the whole run, and
+    `memory_limit` caps the worker's address space in bytes (POSIX only). A
+    worker that runs over time is killed along with any processes it started, and
+    every failure is raised as an `ExtractionWorkerError` with a code, so a
+    pathological document can never hang or exhaust the server process.
+    Because each run gets a fresh process, a killed worker needs no replacing.
+
+    `target` and `args` must be picklable; the values are sent back over a pipe.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_worker_main, args=(sender, target, args, memory_limit), name='extraction-worker'
+    )
+    process.start()
+    sender.close()  # Only the worker writes; we see EOF if it dies
+    deadline = time.monotonic() + timeout if timeout else None
+    finished = False
+
+    try:
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and (remaining <= 0 or not receiver.poll(remaining)):
+                raise ExtractionWorkerError(ERROR_TIMEOUT, f"Extraction did not finish within {timeout} seconds.")
+            try:
+                message = receiver.recv()
+            except EOFError:
+                process.join(EXIT_GRACE_SECONDS)
+                raise ExtractionWorkerError(
+                    ERROR_CRASHED, f"The extraction worker exited unexpectedly (exit code {process.exitcode})."
+                )
+
+            kind = message[0]
+            if kind == 'item':
+                yield message[1]
+            elif kind == 'error':
+                finished = True
+                raise ExtractionWorkerError(message[1], message[2])
+            else:  # 'done'
+                finished = True
+                return
+    finally:
+        receiver.close()
+        if finished:
+            process.join(EXIT_GRACE_SECONDS)
+        if process.is_alive():
+            logger.warning(f"Killing extraction worker {process.pid}.")
+            _kill_worker(process)
+
+
+def _worker_main(sender, target, args, memory_limit):
+    """Entry point of the worker process."""
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()  # Lets the parent kill the worker together with its page workers
+    if memory_limit:
+        _limit_memory(memory_limit)
+
+    try:
+        for item in target(*args):
+            sender.send(('item', item))
+        sender.send(('done',))
+    except Exception as e:  # Including MemoryError
+        sender.send(('error', *_classify_error(e)))
+    finally:
+        sender.close()
+
+
+def _classify_error(error):
+    """Returns the (code, message) reported for an exception raised by an extraction."""
+    if _is_allocation_failure(error):
+        return ERROR_MEMORY_LIMIT, "The document needs more memory than extraction is allowed."
+    if isinstance(error, (NotImplementedError, ValueError, FileNotFoundError)):
+        return ERROR_UNSUPPORTED, str(error)
+    return ERROR_FAILED, f"{error.__class__.__name__}: {error}"
+
+
+def _is_allocation_failure(error):
+    """True for MemoryError, or a MuPDF allocation failure, anywhere in the exception's chain."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, MemoryError) or MUPDF_ALLOCATION_FAILURE.search(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _limit_memory(memory_limit):
+    if resource is None:
+        logger.warning("Extraction memory limits are not supported on this platform.")
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not limit extraction worker memory: {e}")
+
+
+def _kill_worker(process):
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    process.kill()
+    process.join(EXIT_GRACE_SECONDS)
+
+
+# ==============================================================================
+# Exam extraction task
+# ==============================================================================
+
+def extract_exam(q_path, a_path, contains_images, cache_config, asset_config, workers, memory_ceiling=None):
+    """
+    Extracts an exam inside a worker process. Yields, in order:
+        ('answers', formatted_answers)
+        ('total_pages', n)
+        ('page', page) for every question page from `extractdocx.iter_content`
+
+    The cache and asset store are rebuilt here from their constructor arguments,
+    since their in-memory state cannot be shared with the server process.
+    `memory_ceiling` enables the extractor's bounded-memory mode.
+    """
+    cache = ExtractionCache(*cache_config)
+    asset_store = AssetStore(*asset_config)
+
+    # The answers are extracted first, so that a broken answer template fails the
+    # job before the previously extracted exam is touched.
+    answer_text = extractdocx.extract_text_from_any_file(a_path, cache=cache)
+    yield 'answers', extractdocx.format_extracted_answers(answer_text)
+
+    yield 'total_pages', extractdocx.count_pages(q_path)
+    pages = extractdocx.iter_content(
+        q_path, contains_images, cache=cache, workers=workers, asset_store=asset_store, memory_ceiling=memory_ceiling
+    )
+    for page in pages:
+        yield 'page', page
@@ -0,0 +1,428 @@
+# provision_exams.py sets up a batch of ready-to-use exams from a manifest
+#
+# Usage (run from the directory the server runs in, so the same users.db is used):
+#   python provision_exams.py exams.json
+#   python provision_exams.py exams.csv --admin admin1 --jobs 4 --output summary.json
+#   python provision_exams.py exams.json --dry-run            (only check the manifest)
+#
+# The manifest is a JSON list of exams (or {"exams": [...]}), or a CSV file with a
+# header row. Each exam has:
+#   subject          subject name shown to students
+#   questions        question template (.pdf, .docx or .txt)
+#   answers          answer template
+#   question_length  number of questions
+#   duration         exam time: seconds, "90m", "1h30m" or "01:30:00"
+#   class            class the exam is for, e.g. "SS2"; a JSON list (or "Jss1;Jss2"
+#                    in CSV) sets the same papers for several classes, one code each
+#   contains_images  optional: "false" (default), "true" or "auto", as on /Subject
+# Relative file paths are resolved against the manifest's directory.
+#
+# Every distinct set of papers is extracted once, in parallel, each in its own
+# isolated worker process, with its pages spooled to a temporary file. The exams
+# that extracted cleanly are then written one transaction each: their
+# exam_sessions rows with generated exam codes, their pages, answer keys and
+# rendered documents. Documents are compressed after each commit, so the server
+# is never kept waiting on the write lock. A summary table is printed last.
+
+import os
+import re
+import sys
+import csv
+import json
+import shutil
+import secrets
+import hashlib
+import logging
+import argparse
+import tempfile
+import filecmp
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+import exam_store
+import extraction_worker
+import question_index
+import answer_vectors
+
+logger = logging.getLogger('provision_exams')
+
+ExamSpec = namedtuple('ExamSpec', 'subject question_path answer_path question_length exam_time exam_class image_mode')
+
+# Values of the manifest's contains_images field, as /Subject reads them.
+IMAGE_MODES = {
+    'false': exam_store.IMAGE_MODE_OFF,
+    'true': exam_store.IMAGE_MODE_ON,
+    'auto': exam_store.IMAGE_MODE_AUTO,
+}
+QUESTION_EXTENSIONS = {'pdf', 'docx', 'txt'}
+DURATION_UNITS = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?$')
+
+
+class ManifestError(ValueError):
+    """Raised with every problem found in a manifest, one per line."""
+
+
+# ==============================================================================
+# MANIFEST
+# ==============================================================================
+
+def load_manifest(path):
+    """Returns the raw exam entries of a JSON or CSV manifest."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            return list(csv.DictReader(f))
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get('exams', [])
+    if not isinstance(entries, list):
+        raise ManifestError("A JSON manifest must be a list of exams or {\"exams\": [...]}.")
+    return entries
+
+
+def parse_manifest(entries, base_dir):
+    """
+    Validates the raw entries and returns one ExamSpec per exam to create, with
+    entries set for several classes expanded. Raises ManifestError listing every
+    problem, so a manifest can be fixed in one pass.
+    """
+    specs, problems = [], []
+    for number, entry in enumerate(entries, start=1):
+        label = f"Exam {number} ({entry.get('subject') or 'no subject'})" if isinstance(entry, dict) else f"Exam {number}"
+        if not isinstance(entry, dict):
+            problems.append(f"{label}: must be an object with the exam's fields.")
+            continue
+        try:
+            specs.extend(_parse_entry(entry, base_dir))
+        except ManifestError as e:
+            problems.extend(f"{label}: {problem}" for problem in str(e).splitlines())
+
+    if not specs and not problems:
+        problems.append("The manifest lists no exams.")
+    if problems:
+        raise ManifestError('\n'.join(problems))
+    return specs
+
+
+def _parse_entry(entry, base_dir):
+    problems = []
+    subject = str(entry.get('subject') or '').strip()
+    if not subject:
+        problems.append("'subject' is required.")
+
+    paths = {}
+    for field in ('questions', 'answers'):
+        value = str(entry.get(field) or '').strip()
+        if not value:
+            problems.append(f"'{field}' is required.")
+        elif not os.path.isfile(os.path.join(base_dir, value)):
+            problems.append(f"'{field}' file not found: {value}")
+        else:
+            paths[field] = os.path.abspath(os.path.join(base_dir, value))
+
+    question_length = _parse_int(entry.get('question_length'))
+    if question_length is None or question_length <= 0:
+        problems.append("'question_length' must be a positive whole number.")
+
+    exam_time = parse_duration(entry.get('duration'))
+    if exam_time is None:
+        problems.append("'duration' must be seconds, '90m', '1h30m' or 'HH:MM:SS'.")
+
+    classes, unknown = parse_classes(entry.get('class'))
+    if unknown:
+        problems.append(f"unknown class {', '.join(unknown)}; expected one of {', '.join(exam_store.CLASS_SUBFOLDERS)}.")
+    elif not classes:
+        problems.append("'class' is required.")
+
+    image_value = str(entry.get('contains_images') or 'false').strip().lower()
+    image_mode = IMAGE_MODES.get(image_value)
+    if image_mode is None:
+        problems.append("'contains_images' must be 'true', 'false' or 'auto'.")
+
+    question_path = paths.get('questions')
+    if question_path:
+        extension = question_path.rsplit('.', 1)[-1].lower()
+        if extension not in QUESTION_EXTENSIONS:
+            problems.append(f"question templates must be one of: {', '.join(sorted(QUESTION_EXTENSIONS))}.")
+        elif image_mode == exam_store.IMAGE_MODE_ON and extension != 'pdf':
+            problems.append("questions with images must be a PDF, as on /Subject.")
+
+    if problems:
+        raise ManifestError('\n'.join(problems))
+    return [
+        ExamSpec(subject, question_path, paths['answers'], question_length, exam_time, exam_class, image_mode)
+        for exam_class in classes
+    ]
+
+
+def _parse_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_duration(value):
+    """Returns a duration in seconds, as /Timer stores it, or None if it cannot be read."""
+    text = str(value if value is not None else '').strip().lower().replace(' ', '')
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    if re.fullmatch(r'\d+(:\d{1,2}){1,2}', text):
+        seconds = 0
+        for part in text.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds if text.count(':') == 2 else seconds * 60  # "01:30" is HH:MM
+    match = DURATION_UNITS.match(text)
+    if match and any(match.groups()):
+        hours, minutes, seconds = (int(group or 0) for group in match.groups())
+        return hours * 3600 + minutes * 60 + seconds
+    return None
+
+
+def parse_classes(value):
+    """Returns (classes, unknown) for a class name, a list of them, or 'Jss1;Jss2'."""
+    if isinstance(value, list):
+        names = [str(name).strip() for name in value]
+    else:
+        names = [name.strip() for name in re.split(r'[;,]', str(value or ''))]
+    known = {name.lower(): name for name in exam_store.CLASS_SUBFOLDERS}
+    classes, unknown = [], []
+    for name in filter(None, names):
+        if name.lower() in known:
+            if known[name.lower()] not in classes:
+                classes.append(known[name.lower()])
+        else:
+            unknown.append(name)
+    return classes, unknown
+
+
+# ==============================================================================
+# EXTRACTION
+# ==============================================================================
+
+def copy_to_uploads(path):
+    """
+    Copies a template into the upload folder, where /extractor expects it, and
+    returns its stored filename. A different file already stored under the same
+    name (e.g. every subject's "questions.pdf") is kept; this one gets a suffix.
+    """
+    os.makedirs(exam_store.UPLOAD_FOLDER, exist_ok=True)
+    filename = secure_filename(os.path.basename(path))
+    destination = os.path.join(exam_store.UPLOAD_FOLDER, filename)
+    if os.path.exists(destination) and not filecmp.cmp(path, destination, shallow=False):
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:8]
+        stem, extension = os.path.splitext(filename)
+        filename = f"{stem}-{digest}{extension}"
+        destination = os.path.join(exam_store.UPLOAD_FOLDER, filename)
+    if not os.path.exists(destination):
+        shutil.copyfile(path, destination)
+    return filename
+
+
+def extract_papers(q_path, a_path, image_mode, page_workers):
+    """
+    Extracts one set of papers in an isolated worker process, as an extraction job
+    does. Returns (formatted_answers, spool): the pages are written to `spool`, a
+    temporary file of one JSON page per line, rather than held in memory. Worker
+    failures raise ExtractionWorkerError.
+    """
+    results = extraction_worker.iter_isolated(
+        extraction_worker.extract_exam,
+        (
+            q_path, a_path, exam_store.extractor_image_mode(image_mode),
+            (exam_store.EXTRACTION_CACHE_FOLDER, exam_store.EXTRACTION_CACHE_MAX_BYTES),
+            (exam_store.ASSETS_FOLDER, exam_store.ASSETS_URL_PREFIX),
+            page_workers,
+            exam_store.EXTRACTION_MEMORY_CEILING or None,
+        ),
+        timeout=exam_store.EXTRACTION_JOB_TIMEOUT,
+        memory_limit=exam_store.EXTRACTION_JOB_MEMORY_LIMIT,
+    )
+    spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+    try:
+        _, formatted_answers = next(results)
+        next(results)  # Total page count; only needed for progress reports
+        for _, page in results:
+            spool.write(json.dumps(page) + '\n')
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        results.close()
+    return formatted_answers, spool
+
+
+def extract_all(papers, jobs):
+    """
+    Extracts every distinct (questions, answers, image mode) in parallel, `jobs` at
+    a time, splitting the cores between them. Returns {papers: (answers, spool)} for
+    the papers that extracted and {papers: error message} for those that failed.
+    """
+    page_workers = max(1, (os.cpu_count() or 1) // jobs)
+    extracted, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {key: pool.submit(extract_papers, *key, page_workers) for key in papers}
+        for key, future in futures.items():
+            try:
+                extracted[key] = future.result()
+            except extraction_worker.ExtractionWorkerError as e:
+                failed[key] = f"{e.code}: {e}"
+            except Exception as e:
+                logger.error(f"Extraction of {os.path.basename(key[0])} failed: {e}", exc_info=True)
+                failed[key] = f"error: {e}"
+    return extracted, failed
+
+
+# ==============================================================================
+# PROVISIONING
+# ==============================================================================
+
+def provision(specs, admin_username, jobs):
+    """
+    Copies the templates, extracts them and writes each exam that extracted in its
+    own transaction. Returns a summary row per spec, in manifest order.
+    """
+    stored = {}  # Source path -> filename in the upload folder
+    for spec in specs:
+        for path in (spec.question_path, spec.answer_path):
+            if path not in stored:
+                stored[path] = copy_to_uploads(path)
+
+    def papers_of(spec):
+        return (os.path.join(exam_store.UPLOAD_FOLDER, stored[spec.question_path]),
+                os.path.join(exam_store.UPLOAD_FOLDER, stored[spec.answer_path]),
+                spec.image_mode)
+
+    papers = list(dict.fromkeys(papers_of(spec) for spec in specs))
+    logger.info(f"Extracting {len(papers)} sets of papers for {len(specs)} exams, {jobs} at a time.")
+    extracted, failed = extract_all(papers, jobs)
+
+    exam_store.init_db()  # Creates or upgrades the schema, as the server does on startup
+    summary = []
+    try:
+        for spec in specs:
+            row = {
+                'subject': spec.subject, 'class': spec.exam_class, 'exam_code': None,
+                'exam_time': spec.exam_time, 'pages': 0, 'question_check': None,
+            }
+            summary.append(row)
+            key = papers_of(spec)
+            if key in failed:
+                row['status'] = 'failed'
+                row['error'] = failed[key]
+                continue
+            formatted_answers, spool = extracted[key]
+            spool.seek(0)  # Several classes may share the same papers
+            row.update(_insert_exam(spec, admin_username, stored, formatted_answers, spool))
+    finally:
+        for _, spool in extracted.values():
+            spool.close()
+    return summary
+
+
+def _insert_exam(spec, admin_username, stored, formatted_answers, spool):
+    """
+    Writes one exam in its own transaction, with its pages read from `spool`, and
+    stores its compressed document once that has committed.
+    """
+    with exam_store.get_db_connection() as conn:
+        exam_code, exam_id, page_count, index = _insert_exam_rows(
+            conn, spec, admin_username, stored, formatted_answers, (json.loads(line) for line in spool)
+        )
+        document = exam_store.prerender_exam_document(conn, exam_id)
+        conn.commit()
+        exam_store.publish_exam_document(conn, exam_id, document)
+
+    question_check = question_index.validate_question_index(index, spec.question_length)
+    if not formatted_answers:
+        status = 'no answers'
+    elif not question_check['ok']:
+        status = 'check questions'
+    else:
+        status = 'ready'
+    return {'exam_code': exam_code, 'pages': page_count, 'answers': len(formatted_answers),
+            'question_check': question_check, 'status': status}
+
+
+def _insert_exam_rows(conn, spec, admin_username, stored, formatted_answers, pages):
+    exam_code = exam_store.generate_unique_code(conn)
+    cursor = conn.execute(
+        """INSERT INTO exam_sessions
+           (session_id, admin_username, exam_code, exam_time, subject_name, question_length,
+            question_template_filename, answer_template_filename, contains_images, exam_class)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (f"provisioned-{secrets.token_hex(8)}", admin_username, exam_code, str(spec.exam_time), spec.subject,
+         spec.question_length, stored[spec.question_path], stored[spec.answer_path], spec.image_mode,
+         spec.exam_class)
+    )
+    exam_id = cursor.lastrowid
+    page_count, image_refs, index = exam_store.store_question_pages(
+        conn, exam_id, exam_store.extractor_image_mode(spec.image_mode), pages
+    )
+    conn.execute(
+        """UPDATE exam_sessions SET question_page_count = ?, image_refs_json = ?, question_index_json = ?,
+           extracted_answers_json = ?, answer_key_vector = ? WHERE id = ?""",
+        (page_count, json.dumps(image_refs), json.dumps(index), json.dumps(formatted_answers),
+         answer_vectors.pack_answer_key(formatted_answers), exam_id)
+    )
+    return exam_code, exam_id, page_count, index
+
+
+def format_duration(seconds):
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+
+def print_summary(summary):
+    subject_width = max([len('subject')] + [len(row['subject']) for row in summary])
+    print(f"\n{'subject':<{subject_width}} {'class':<6} {'code':<6} {'time':>8} {'pages':>5} {'questions':>9}  status")
+    for row in summary:
+        check = row['question_check']
+        questions = f"{check['found']}/{check['expected']}" if check else '-'
+        status = row['status']
+        if row.get('error'):
+            status += f" ({row['error']})"
+        elif check and check['missing']:
+            status += f" (missing {', '.join(map(str, check['missing'][:10]))}{'...' if len(check['missing']) > 10 else ''})"
+        print(f"{row['subject']:<{subject_width}} {row['class']:<6} {row['exam_code'] or '-':<6} "
+              f"{format_duration(row['exam_time']):>8} {row['pages']:>5} {questions:>9}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create ready-to-use exams from a manifest of subjects and papers.")
+    parser.add_argument('manifest', help="JSON or CSV manifest; see the top of this file for its fields.")
+    parser.add_argument('--admin', default='admin1', help="Admin username recorded as the exams' owner.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Papers extracted at the same time (default: one per core).")
+    parser.add_argument('--dry-run', action='store_true', help="Check the manifest without extracting or writing anything.")
+    parser.add_argument('--output', help="Also write the summary to this JSON file.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        specs = parse_manifest(load_manifest(args.manifest), os.path.dirname(os.path.abspath(args.manifest)))
+    except (OSError, ValueError) as e:  # ManifestError, unreadable files, malformed JSON
+        print(f"Invalid manifest {args.manifest}:\n{e}", file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        print(f"Manifest OK: {len(specs)} exams.")
+        return 0
+
+    summary = provision(specs, args.admin, max(1, args.jobs))
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary written to {args.output}")
+
+    failures = sum(row['status'] == 'failed' for row in summary)
+    print(f"\n{len(summary) - failures} exams provisioned, {failures} failed.")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
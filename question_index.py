@@ -0,0 +1,170 @@
+# question_index.py splits extracted exam pages into numbered questions and their options
+
+import re
+import logging
+
+
+logger = logging.getLogger('question_index')
+
+# Bump this when the segmentation rules change, so that stored indexes are rebuilt.
+QUESTION_INDEX_VERSION = 1
+
+# A question starts at the beginning of a line with its number, e.g. "12. " or "12) ".
+QUESTION_START = re.compile(r'^[ \t]*(\d{1,3})[ \t]*[.)][ \t]+', re.MULTILINE)
+# An option marker, e.g. "A. ", "(b) ", at the start of a line or after whitespace.
+OPTION_MARKER = re.compile(r'(?:^|(?<=\s))\(?([A-Ha-h])[.)][ \t]+', re.MULTILINE)
+# A question number is only accepted if it follows the previous one by at most this
+# much, so that numbers inside question text ("3. Hence...") are not mistaken for
+# new questions.
+MAX_NUMBER_GAP = 3
+
+
+class QuestionIndexBuilder:
+    """
+    Builds a question index from extracted pages, one page at a time, so it can
+    run while the pages are being stored.
+
+    Each question records where its text lies (spans of page, block and character
+    offsets), the pages it covers, its stem and options, and its images. Images
+    placed between blocks belong to the question they follow; images that a page
+    only lists (PDF text pages) belong to every question on that page, or to the
+    question continuing onto it.
+    """
+
+    def __init__(self):
+        self.questions = []
+        self._current = None
+
+    def add_page(self, page_number, page):
+        """Adds a page dict from `extractdocx.iter_content`, stored as `page_number`."""
+        touched = []
+        blocks = page.get('blocks', [])
+        for block_index, block in enumerate(blocks):
+            if 'image' in block:
+                if self._current is not None:
+                    self._add_image(self._current, block['image'])
+                continue
+            for question in self._add_text(page_number, block_index, block.get('text', '')):
+                if question not in touched:
+                    touched.append(question)
+
+        placed = {block['image'] for block in blocks if 'image' in block}
+        loose_images = [image for image in page.get('images', []) if image not in placed]
+        if not touched and self._current is not None:
+            touched = [self._current]  # A page without text, e.g. a rendered diagram
+        for question in touched:
+            if page_number not in question['pages']:
+                question['pages'].append(page_number)
+            for image in loose_images:
+                self._add_image(question, image)
+
+    def finish(self):
+        """Returns the index: {'version', 'questions': [...]} in question order."""
+        for question in self.questions:
+            question['text'] = ''.join(question.pop('_text')).strip()
+            question['stem'], question['options'] = split_options(question['text'])
+        logger.info(f"Indexed {len(self.questions)} questions.")
+        return {'version': QUESTION_INDEX_VERSION, 'questions': self.questions}
+
+    # --- Internals ---
+
+    def _add_text(self, page_number, block_index, text):
+        """Splits a text block at question starts. Returns the questions it touched."""
+        touched = []
+        position = 0
+        for match in QUESTION_START.finditer(text):
+            number = int(match.group(1))
+            if not self._accepts(number):
+                continue
+            if self._current is not None:
+                self._add_span(self._current, page_number, block_index, text, position, match.start())
+                if position < match.start():
+                    touched.append(self._current)
+            self._current = self._new_question(number, page_number)
+            self.questions.append(self._current)
+            position = match.start()
+        if self._current is not None and position < len(text):
+            self._add_span(self._current, page_number, block_index, text, position, len(text))
+            touched.append(self._current)
+        return touched
+
+    def _accepts(self, number):
+        if self._current is None:
+            return True
+        last = self._current['number']
+        return last < number <= last + MAX_NUMBER_GAP
+
+    @staticmethod
+    def _new_question(number, page_number):
+        return {'number': number, 'page': page_number, 'pages': [page_number],
+                'spans': [], 'images': [], '_text': []}
+
+    @staticmethod
+    def _add_span(question, page_number, block_index, text, start, end):
+        if start >= end or not text[start:end].strip():
+            return
+        question['spans'].append({'page': page_number, 'block': block_index, 'start': start, 'end': end})
+        question['_text'].append(text[start:end])
+
+    @staticmethod
+    def _add_image(question, image):
+        if image not in question['images']:
+            question['images'].append(image)
+
+
+def split_options(text):
+    """
+    Splits a question's text into its stem and an ordered {letter: text} dict of
+    options. Options must run A, B, C... in order, which keeps a stray "A." in the
+    question text from being read as an option.
+    """
+    markers = []
+    expected = 'A'
+    for match in OPTION_MARKER.finditer(text):
+        if match.group(1).upper() == expected:
+            markers.append((expected, match.start(), match.end()))
+            expected = chr(ord(expected) + 1)
+    if len(markers) < 2:
+        return QUESTION_START.sub('', text, count=1).strip(), {}
+
+    stem = QUESTION_START.sub('', text[:markers[0][1]], count=1).strip()
+    options = {}
+    for i, (letter, _, text_start) in enumerate(markers):
+        text_end = markers[i + 1][1] if i + 1 < len(markers) else len(text)
+        options[letter] = text[text_start:text_end].strip()
+    return stem, options
+
+
+def build_question_index(pages):
+    """Builds the index for an iterable of (page_number, page) pairs."""
+    builder = QuestionIndexBuilder()
+    for page_number, page in pages:
+        builder.add_page(page_number, page)
+    return builder.finish()
+
+
+def validate_question_index(index, question_length):
+    """
+    Checks an index against the number of questions the exam is set up for.
+    Returns a summary the admin can act on before students start.
+    """
+    numbers = [question['number'] for question in index.get('questions', [])]
+    found = set(numbers)
+    expected = set(range(1, question_length + 1)) if question_length else set()
+    missing = sorted(expected - found)
+    extra = sorted(found - expected) if question_length else []
+    return {
+        'found': len(found),
+        'expected': question_length,
+        'missing': missing,
+        'extra': extra,
+        'ok': bool(found) and not missing and not extra,
+    }
+
+
+def find_question(index, number):
+    """Returns the indexed question with `number`, or None."""
+    for question in index.get('questions', []):
+        if question['number'] == number:
+            return question
+    return None
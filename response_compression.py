@@ -0,0 +1,68 @@
+# response_compression.py negotiates and applies gzip or brotli compression for HTTP responses
+
+import gzip
+import logging
+
+# Brotli is optional; without it everything is served with gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger('response_compression')
+
+# Encodings the server can produce, preferred first when a client accepts several equally.
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+# Levels for responses compressed on every request: fast, and most of the gain.
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+# Levels for artifacts compressed once and stored: the smallest output.
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+# Text formats worth compressing. Images and other media are compressed already.
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+    'text/csv',
+    'image/svg+xml',
+}
+
+
+def choose_encoding(accept_encodings, available=SUPPORTED_ENCODINGS):
+    """
+    Returns the encoding in `available` the client prefers, going by the quality
+    values of its Accept-Encoding header (a werkzeug Accept object), or None if
+    it accepts none of them.
+    """
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level=None):
+    """Compresses bytes with 'gzip' or 'br', at the dynamic level unless `level` is given."""
+    if level is None:
+        level = DYNAMIC_LEVELS[encoding]
+    if encoding == 'gzip':
+        # mtime=0 keeps the output a pure function of the input.
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=level)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data, encoding):
+    """Reverses `compress`."""
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'br' and brotli is not None:
+        return brotli.decompress(data)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -8,6 +8,9 @@ import sqlite3
 import atexit
 import signal
 import datetime
+import mimetypes
+import tempfile
+import threading
 from functools import wraps
 from multiprocessing import Process, freeze_support
 from io import BytesIO
@@ -47,14 +50,14 @@ from dns import (
 # --- Werkzeug & Flask ---
 from flask import (
     Flask, send_from_directory, render_template, request, session,
-    flash, jsonify, Response, send_file, abort
+    flash, jsonify, Response, send_file, abort, url_for
 )
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import HTTPException
 
 # --- Flask Extensions ---
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 
 # --- File Processing Libraries ---
@@ -62,6 +65,25 @@ from PIL import Image
 from PyPDF2 import PdfReader
 from docx import Document
 import extractdocx  
+from extraction_cache import ExtractionCache
+from asset_store import AssetStore
+import response_compression
+from static_pipeline import StaticAssetPipeline
+from extraction_jobs import ExtractionJobQueue, JobQueueFull
+import extraction_worker
+import question_index
+import answer_vectors
+from db_pool import ConnectionPool, DEFAULT_PRAGMAS
+import exam_store
+from exam_store import (
+    BASE_DIR, MAIN_DIR, UPLOAD_FOLDER, CACHE_FOLDER, ASSETS_FOLDER, CLASS_SUBFOLDERS, DATABASE_NAME,
+    IMAGE_MODE_OFF, IMAGE_MODE_ON, IMAGE_MODE_AUTO, extractor_image_mode,
+    get_db_connection, init_db, exam_payloads, load_question_index, prerender_exam_document, publish_exam_document,
+    load_exam_payload, exam_page_chunk_count, exam_chunk_etag, load_exam_chunk, store_question_pages,
+    generate_unique_code,
+)
+from submission_queue import SubmissionQueue, SubmissionQueueLocked
+from exam_registry import ExamRegistry, active_exam_from_row
 
 # --- Server & Multiprocessing ---
 from pyQtwin import FuturisticBrowser, QApplication  # For the GUI launcher
@@ -75,14 +97,13 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%
 logger = logging.getLogger('exam_app')
 
 # --- Directory Constants ---
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-MAIN_DIR = os.path.join(BASE_DIR, 'ExamTester')
-UPLOAD_FOLDER = os.path.join(MAIN_DIR, 'Uploads')
+# BASE_DIR, MAIN_DIR, UPLOAD_FOLDER, CACHE_FOLDER, ASSETS_FOLDER and CLASS_SUBFOLDERS
+# come from exam_store.py, which provision_exams.py shares.
 RESULTS_FOLDER = os.path.join(MAIN_DIR, 'Results')
 QUESTIONS_FOLDER = os.path.join(MAIN_DIR, 'Questions')
+SUBMISSIONS_FOLDER = os.path.join(MAIN_DIR, 'Submissions')
 
 SUBDIRECTORIES = ["Class", "Results", "Questions", "Passwords", "Logger", "Uploads"]
-CLASS_SUBFOLDERS = ["Jss1", "Jss2", "Jss3", "SS1", "SS2", "SS3"]
 
 # Ensure core directories exist
 for folder in [UPLOAD_FOLDER, RESULTS_FOLDER, QUESTIONS_FOLDER]:
@@ -101,7 +122,31 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
 app.config['QUESTIONS_FOLDER'] = QUESTIONS_FOLDER
 app.config['ALLOWED_EXTENSIONS'] = {'txt', 'pdf', 'doc', 'docx', 'jpeg', 'jpg', 'png', 'json'}
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB file size limit
+# Uploads are spooled to disk and extracted in bounded-memory mode, so large
+# compilations of past questions can be accepted.
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 128)) * 1024 * 1024
+app.config['EXTRACTOR_WORKERS'] = int(os.environ.get('EXTRACTOR_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['EXTRACTION_CACHE_MAX_BYTES'] = exam_store.EXTRACTION_CACHE_MAX_BYTES
+app.config['EXTRACTION_JOB_WORKERS'] = int(os.environ.get('EXTRACTION_JOB_WORKERS', 2))
+app.config['EXTRACTION_JOB_MAX_PENDING'] = int(os.environ.get('EXTRACTION_JOB_MAX_PENDING', 16))
+app.config['EXTRACTION_JOB_TIMEOUT'] = exam_store.EXTRACTION_JOB_TIMEOUT  # Seconds
+app.config['EXTRACTION_JOB_MEMORY_LIMIT'] = exam_store.EXTRACTION_JOB_MEMORY_LIMIT
+app.config['EXTRACTION_MEMORY_CEILING'] = exam_store.EXTRACTION_MEMORY_CEILING
+app.config['EXAM_PAYLOAD_MEMORY'] = exam_store.EXAM_PAYLOAD_MEMORY
+app.config['EXAM_PAGE_CHUNK'] = exam_store.EXAM_PAGE_CHUNK
+# Smaller text responses are sent uncompressed (see compress_response); 0 turns compression off.
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+# How long browsers may reuse the pre-rendered pages before revalidating them.
+app.config['STATIC_PAGE_MAX_AGE'] = int(os.environ.get('STATIC_PAGE_MAX_AGE', 12 * 60 * 60))
+app.config['DB_POOL_SIZE'] = exam_store.DB_POOL_SIZE
+# Submissions to /mark are written to the database in batches of up to this many,
+# gathered for at most SUBMISSION_BATCH_DELAY_MS (see submission_queue.py).
+app.config['SUBMISSION_BATCH'] = int(os.environ.get('SUBMISSION_BATCH', 256))
+app.config['SUBMISSION_BATCH_DELAY_MS'] = int(os.environ.get('SUBMISSION_BATCH_DELAY_MS', 20))
+# How long /get_score waits for the student's own submission to be written.
+app.config['SUBMISSION_WAIT_TIMEOUT'] = int(os.environ.get('SUBMISSION_WAIT_TIMEOUT', 10))  # Seconds
+# Exams kept in memory for students (see exam_registry.py); the least recently used are dropped.
+app.config['ACTIVE_EXAMS_MAX'] = int(os.environ.get('ACTIVE_EXAMS_MAX', 64))
 
 # --- Socket.IO Initialization ---
 # Using the simpler and stable 'threading' mode.
@@ -110,111 +155,152 @@ socketio = SocketIO(app, async_mode='threading', logger=True, engineio_logger=Tr
 # --- Global In-Memory State (for non-persistent data) ---
 # Used to track currently connected clients and their roles.
 connected_clients = {}
+# Socket.IO room joined by every admin connection, for admin-only broadcasts.
+ADMIN_ROOM = 'admins'
+
+def session_room(flask_session_id):
+    """The Socket.IO room joined by the admin connections of one browser session."""
+    return f"session-{flask_session_id}"
+
+# --- Extraction Cache ---
+# Re-extracting an unchanged question or answer template is served from disk.
+extraction_cache = ExtractionCache(
+    exam_store.EXTRACTION_CACHE_FOLDER,
+    max_bytes=app.config['EXTRACTION_CACHE_MAX_BYTES']
+)
+
+# --- Image Asset Store ---
+# Extracted images are written once, named by their content hash, and served from
+# /assets/ with immutable cache headers instead of being inlined as base64.
+asset_store = AssetStore(ASSETS_FOLDER, url_prefix=exam_store.ASSETS_URL_PREFIX)
+ASSET_MAX_AGE = 365 * 24 * 60 * 60  # One year; asset URLs never change content
+
+# --- Static Asset Pipeline ---
+# Scripts, styles and images from the static folder are fingerprinted, minified and
+# pre-compressed at startup, and templates link to the built copies, which are
+# served from /static-build/ with immutable cache headers.
+static_assets = StaticAssetPipeline(os.path.join(BASE_DIR, app.static_folder), os.path.join(CACHE_FOLDER, 'static-build'))
+static_assets.build()
+
+def fingerprinted_url_for(endpoint, **values):
+    """`url_for` for templates: static files are linked to their fingerprinted build."""
+    if endpoint == 'static':
+        built_url = static_assets.url_for(values.get('filename', ''))
+        if built_url:
+            return built_url
+    return url_for(endpoint, **values)
+
+app.jinja_env.globals['url_for'] = fingerprinted_url_for
+
+# --- Extraction Job Queue ---
+# /extractor queues a job and returns at once; a small pool of background threads
+# does the extraction and pushes 'extraction_progress' events to the session that
+# queued it. Each job parses the uploaded documents in its own time- and
+# memory-limited process (see extraction_worker.py), so a malformed file cannot
+# stall the server.
+extraction_job_rooms = {}  # Job key -> room of the session that last queued it
+
+def notify_extraction_progress(job):
+    room = extraction_job_rooms.get(job['key'])
+    if room is not None:
+        socketio.emit('extraction_progress', job, room=room)
+
+extraction_jobs = ExtractionJobQueue(
+    max_workers=app.config['EXTRACTION_JOB_WORKERS'],
+    max_pending=app.config['EXTRACTION_JOB_MAX_PENDING'],
+    notify=notify_extraction_progress
+)
 
 # ==============================================================================
 # 2. DATABASE SETUP & HELPERS
 # ==============================================================================
 
-DATABASE_NAME = 'users.db'
-
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row  # Makes accessing columns by name easy
-    return conn
-
-def init_db():
-    """Initializes the database and creates all necessary tables if they don't exist."""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+# The schema, the connection pools and the code that stores and renders extracted
+# exams are in exam_store.py, which provision_exams.py uses without the web app.
 
-        # Admins table with hashed passwords
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL
-        )
-        ''')
-
-        # Create a default admin if none exist
-        cursor.execute("SELECT id FROM admins LIMIT 1")
-        if cursor.fetchone() is None:
-            default_username = 'admin1'
-            default_password = '@RoyalRangers'
-            hashed_password = generate_password_hash(default_password)
-            cursor.execute(
-                "INSERT INTO admins (username, password_hash) VALUES (?, ?)",
-                (default_username, hashed_password)
-            )
-            logger.info(f"Created default admin '{default_username}' with password '{default_password}'.")
-
-        # Table for files managed by the CRUD system
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL,
-            subdirectory TEXT NOT NULL,
-            filetype TEXT NOT NULL,
-            filepath TEXT NOT NULL  -- Store the path to the file on the filesystem
-        )
-        ''')
+# Initialize the database on startup
+init_db()
 
-        # Table for CORS origins
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS cors_origins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            origin TEXT UNIQUE NOT NULL
-        )
-        ''')
-        
-        # The main table to replace the old `data_store` dictionary.
-        # This table persists all data related to a single exam session.
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS exam_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT UNIQUE NOT NULL,
-            admin_username TEXT NOT NULL,
-            
-            --  NEW COLUMN --
-            exam_code TEXT UNIQUE, 
-
-            exam_time TEXT,
-            subject_name TEXT,
-            question_length INTEGER,
-            question_template_filename TEXT,
-            answer_template_filename TEXT,
-            contains_images INTEGER DEFAULT 0,
-            extracted_questions_json TEXT,
-            extracted_answers_json TEXT,
-            student_details_json TEXT,
-            student_answers_json TEXT,
-            student_score INTEGER,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+# --- Active Exam Registry ---
+# Exams with a code are kept in memory with their packed answer key and the ETag of
+# their rendered document, so /student, /mark and the exam pages do not read them
+# from the database. The document itself is served from exam_payloads, whose
+# memory is bounded by EXAM_PAYLOAD_MEMORY.
+def load_active_exam(exam_id=None, exam_code=None):
+    """Reads an exam for the registry by id or by code, making sure its payload is stored once it has pages."""
+    with get_db_connection() as conn:
+        if exam_id is not None:
+            exam = conn.execute("SELECT * FROM exam_sessions WHERE id = ?", (exam_id,)).fetchone()
+        else:
+            exam = conn.execute("SELECT * FROM exam_sessions WHERE exam_code = ?", (exam_code,)).fetchone()
+        if exam is None:
+            return None
+        document_etag = load_exam_payload(conn, exam).etag if exam['question_page_count'] is not None else None
+    return active_exam_from_row(exam, document_etag)
+
+exam_registry = ExamRegistry(load_active_exam, max_exams=app.config['ACTIVE_EXAMS_MAX'])
+
+# --- Submission Queue ---
+# /mark acknowledges a submission once it is in the queue's log on disk; the
+# writer thread then stores submissions in batches, one transaction each. Its
+# connection syncs every commit (synchronous=FULL), as the log is emptied once
+# the database has the submissions.
+submission_db_pool = ConnectionPool(DATABASE_NAME, max_idle=1, pragmas=DEFAULT_PRAGMAS + (('synchronous', 'FULL'),))
+
+def write_submissions(records):
+    """Stores a batch of /mark submissions on their exam attempts, in one transaction."""
+    with submission_db_pool.connect() as conn:
+        conn.executemany(
+            """UPDATE exam_attempts SET answer_vector = ?, student_score = ?,
+               submitted_at = ? WHERE id = ?""",
+            [(bytes.fromhex(r['answer_vector']), r['score'], r['submitted_at'], r['attempt_id']) for r in records]
         )
-        ''')
-        # Trigger to auto-update the 'updated_at' timestamp
-        cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS update_exam_sessions_updated_at
-        AFTER UPDATE ON exam_sessions
-        FOR EACH ROW
-        BEGIN
-            UPDATE exam_sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-        END;
-        ''')
+    logger.info(f"Stored {len(records)} exam submissions.")
 
-        conn.commit()
-        logger.info("Database initialized successfully.")
-    except sqlite3.Error as e:
-        logger.error(f"Database initialization error: {e}")
-    finally:
-        if conn:
-            conn.close()
+# Opened by start_submission_queue() when the server starts (see run_flask), or
+# by get_submission_queue() on the first submission: the queue replays and owns
+# its log, so a process that merely imports this module must not open it.
+submission_queue = None
+submission_queue_lock = threading.Lock()
 
-# Initialize the database on startup
-init_db()
+def start_submission_queue():
+    """
+    Opens the submission queue, storing any submissions logged but not yet
+    written. Raises SubmissionQueueLocked if another process has it open.
+    """
+    global submission_queue
+    submission_queue = SubmissionQueue(
+        SUBMISSIONS_FOLDER, write_submissions,
+        max_batch=app.config['SUBMISSION_BATCH'],
+        max_delay=app.config['SUBMISSION_BATCH_DELAY_MS'] / 1000,
+    )
+    atexit.register(submission_queue.close)
+
+def get_submission_queue():
+    """
+    Returns the submission queue, opening it if the server has not. Returns None
+    if another process has it open; submissions are then written directly.
+    """
+    if submission_queue is None:
+        with submission_queue_lock:
+            if submission_queue is None:
+                try:
+                    start_submission_queue()
+                except SubmissionQueueLocked as e:
+                    logger.warning(f"{e} Writing submissions directly.")
+    return submission_queue
+
+def submission_pending(attempt_id):
+    """Tells whether a submission for the attempt is in the queue but not yet in the database."""
+    return submission_queue is not None and submission_queue.has_pending(attempt_id=attempt_id)
+
+def wait_for_submission():
+    """Waits until the answers this browser session submitted to /mark are in the database."""
+    seq = session.get('student_submission_seq')
+    if seq is None or submission_queue is None:
+        return
+    if not submission_queue.wait_applied(seq, app.config['SUBMISSION_WAIT_TIMEOUT']):
+        logger.warning(f"Submission {seq} is not stored yet; answering from the database as it is.")
 
 def get_or_create_exam_session(flask_session_id, admin_username):
     """
@@ -338,22 +424,6 @@ def search_file_in_database(filename, subdirectory):
         result = cursor.fetchone()
     return result['filepath'] if result else None
 
-# create exam code for admin2
-def _generate_unique_code(conn):
-    """
-    Helper function to generate a unique 6-character alphanumeric code.
-    It checks the database to ensure the code is not already in use.
-    """
-    while True:
-        # Generate a simple, readable code (e.g., A9B2C1)
-        code = ''.join(secrets.choice('ABCDEFGHJKLMNPQRSTUVWXYZ23456789') for _ in range(6))
-        
-        # Check if this code already exists in the database
-        cursor = conn.execute("SELECT id FROM exam_sessions WHERE exam_code = ?", (code,))
-        if cursor.fetchone() is None:
-            # If it doesn't exist, we can use it.
-            return code
-        
 def result_format(file_content):
     """
     Parses and formats a raw result file content into a more structured format.
@@ -416,17 +486,55 @@ def require_login(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --- Response Compression ---
+@app.after_request
+def compress_response(response):
+    """
+    Compresses large text responses (JSON, HTML, ...) with brotli or gzip, as the
+    client's Accept-Encoding allows. Responses that are already encoded, such as
+    the stored exam payloads, and files streamed from disk are left alone.
+    """
+    if (not app.config['COMPRESS_MIN_BYTES'] or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in response_compression.COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_BYTES']:
+        return response
+    encoding = response_compression.choose_encoding(request.accept_encodings)
+    if encoding:
+        response.set_data(response_compression.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 # ==============================================================================
 # 6. CORE FLASK ROUTES AND ADMIN CONTROL (File Management, Pages, etc.)
 # ==============================================================================
 
+def render_static_page(template_name):
+    """
+    Serves a template that uses no request data. It is rendered and compressed
+    once, then sent from memory with an ETag, so browsers revalidate it cheaply;
+    templates are re-rendered on every request while they are being edited.
+    """
+    if app.debug or app.config.get('TEMPLATES_AUTO_RELOAD'):
+        return render_template(template_name)
+    page = static_assets.page(template_name, lambda: render_template(template_name))
+    return encoded_response(
+        page.etag, page.bodies, lambda: page.body,
+        f"public, max-age={app.config['STATIC_PAGE_MAX_AGE']}"
+    )
+
 @app.route('/')
 def loader():
-    return render_template('loader.html')
+    return render_static_page('loader.html')
 
 @app.route('/home')
 def home():
-    return render_template('Home.html')
+    return render_static_page('Home.html')
 
 #the dirgod that brings to birth the main directories
 @app.route('/init', methods=['GET'])
@@ -532,32 +640,41 @@ def new_admin():
 @require_login
 def get_active_sessions():
     """
-    Retrieves a list of all exam sessions that have been prepared (have a code)
-    or are currently in progress (have student details).
+    Retrieves a list of all exam sessions that have been prepared (have a code),
+    with the number of students who have started and submitted each of them.
     """
     try:
-        with get_db_connection() as conn:
-            # Fetches sessions that are relevant for monitoring
+        with get_db_connection(read_only=True) as conn:
+            # Fetches sessions that are relevant for monitoring, most recently joined first
             cursor = conn.execute(
-                """SELECT id, exam_code, subject_name, student_details_json 
-                   FROM exam_sessions 
-                   WHERE exam_code IS NOT NULL 
-                   ORDER BY updated_at DESC"""
+                """SELECT e.id, e.exam_code, e.subject_name, e.exam_class,
+                          COUNT(a.id) AS attempts, COUNT(a.submitted_at) AS submitted,
+                          (SELECT student_details_json FROM exam_attempts
+                           WHERE exam_session_id = e.id ORDER BY id DESC LIMIT 1) AS latest_student_json
+                   FROM exam_sessions e
+                   LEFT JOIN exam_attempts a ON a.exam_session_id = e.id
+                   WHERE e.exam_code IS NOT NULL
+                   GROUP BY e.id
+                   ORDER BY COALESCE(MAX(a.started_at), e.updated_at) DESC"""
             )
             sessions = cursor.fetchall()
             
             session_list = []
             for row in sessions:
                 student_name = "Waiting for student..."
-                if row['student_details_json']:
-                    student_details = json.loads(row['student_details_json'])
-                    student_name = student_details.get('name', 'In Progress')
+                if row['attempts'] == 1:
+                    student_name = json.loads(row['latest_student_json']).get('name', 'In Progress')
+                elif row['attempts'] > 1:
+                    student_name = f"{row['attempts']} students ({row['submitted']} submitted)"
 
                 session_list.append({
                     "id": row['id'],
                     "exam_code": row['exam_code'],
                     "subject": row['subject_name'],
-                    "student": student_name
+                    "class": row['exam_class'],
+                    "student": student_name,
+                    "attempts": row['attempts'],
+                    "submitted": row['submitted']
                 })
                 
         return jsonify(session_list), 200
@@ -565,6 +682,43 @@ def get_active_sessions():
         logger.error(f"Error fetching active sessions: {e}")
         return jsonify({"error": "Failed to fetch active sessions."}), 500
 
+@app.route('/exam_analytics/<int:exam_session_id>', methods=['GET'])
+@require_login
+def exam_analytics(exam_session_id):
+    """
+    Item analysis of an exam's submitted attempts, computed from the packed answer
+    sheets: the score distribution, and for every question how many students
+    answered it, how many got it right and how often each answer was chosen.
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            exam = conn.execute(
+                "SELECT exam_code, subject_name, answer_key_vector FROM exam_sessions WHERE id = ?",
+                (exam_session_id,)
+            ).fetchone()
+            if not exam or exam['answer_key_vector'] is None:
+                return jsonify({"error": "No answer key has been extracted for this exam."}), 404
+            attempts = conn.execute(
+                """SELECT answer_vector, student_score FROM exam_attempts
+                   WHERE exam_session_id = ? AND answer_vector IS NOT NULL""",
+                (exam_session_id,)
+            ).fetchall()
+
+        scores = [attempt['student_score'] for attempt in attempts]
+        return jsonify({
+            "exam_code": exam['exam_code'],
+            "subject": exam['subject_name'],
+            "submitted": len(attempts),
+            "mean_score": sum(scores) / len(scores) if scores else None,
+            "score_counts": {score: scores.count(score) for score in sorted(set(scores))},
+            "questions": answer_vectors.question_statistics(
+                exam['answer_key_vector'], (attempt['answer_vector'] for attempt in attempts)
+            ),
+        }), 200
+    except Exception as e:
+        logger.error(f"Error computing analytics for exam {exam_session_id}: {e}")
+        return jsonify({"error": "Failed to compute exam analytics."}), 500
+
 @socketio.on('terminate_session')
 @require_login # Custom decorator to check if the user is an admin via session
 def handle_terminate_session(data):
@@ -572,16 +726,23 @@ def handle_terminate_session(data):
     Allows an admin to forcefully terminate an active exam session.
     This could involve deleting the session record or marking it as 'terminated'.
     """
-    session_id_to_terminate = data.get('session_id')
-    if not session_id_to_terminate:
+    try:
+        session_id_to_terminate = int(data.get('session_id'))
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring terminate_session with an invalid session ID: {data.get('session_id')!r}")
+        return
+    if session_id_to_terminate <= 0:
         return
         
     try:
         with get_db_connection() as conn:
             # For now, we'll just delete the record.
             # A softer approach would be to set a 'status' column to 'terminated'.
+            conn.execute("DELETE FROM exam_attempts WHERE exam_session_id = ?", (session_id_to_terminate,))
             conn.execute("DELETE FROM exam_sessions WHERE id = ?", (session_id_to_terminate,))
             conn.commit()
+        exam_payloads.discard(session_id_to_terminate)
+        exam_registry.invalidate(session_id_to_terminate)
         
         logger.warning(f"Admin '{session.get('username')}' terminated exam session ID: {session_id_to_terminate}")
         # Notify all admins that the session list has changed
@@ -625,6 +786,40 @@ def upload_file():
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+@app.route('/assets/<name>', methods=['GET'])
+def serve_asset(name):
+    """
+    Serves an extracted image from the content-addressed asset store. The URL is
+    derived from the image's bytes, so browsers may cache it indefinitely.
+    """
+    asset_path = asset_store.path_for(name)
+    if not asset_path or not os.path.isfile(asset_path):
+        abort(404)
+
+    response = send_file(asset_path, max_age=ASSET_MAX_AGE, etag=name.split('.', 1)[0], conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+@app.route('/static-build/<path:name>', methods=['GET'])
+def serve_built_static(name):
+    """
+    Serves a fingerprinted static file, from its pre-compressed copy when the
+    client accepts one. The name changes whenever the content does, so browsers
+    may cache it indefinitely.
+    """
+    built = static_assets.built_file(name, request.accept_encodings)
+    if built is None:
+        abort(404)
+    path, encoding = built
+
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/downloads')
 def download_from_server():
     """Lists all available files for download."""
@@ -697,7 +892,7 @@ def get_files():
     # --- Step 2: Query the database and merge results ---
     # This ensures files tracked by the DB are always included.
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(read_only=True) as conn:
             cursor = conn.execute('SELECT subdirectory, filename, filetype FROM files')
             db_files = cursor.fetchall()
 
@@ -956,6 +1151,9 @@ def Timer_function():
     with get_db_connection() as conn:
         conn.execute("UPDATE exam_sessions SET exam_time = ? WHERE session_id = ?", (set_time, flask_session_id))
         conn.commit()
+        exam = conn.execute("SELECT id FROM exam_sessions WHERE session_id = ?", (flask_session_id,)).fetchone()
+    if exam:
+        exam_registry.invalidate(exam['id'])
 
     return jsonify({'success': True, 'message': 'Time has been set successfully.'}), 200
 
@@ -974,7 +1172,7 @@ def generate_exam_code():
     try:
         with get_db_connection() as conn:
             # First, find the database ID for the admin's current session
-            cursor = conn.execute("SELECT id FROM exam_sessions WHERE session_id = ?", (admin_flask_session_id,))
+            cursor = conn.execute("SELECT * FROM exam_sessions WHERE session_id = ?", (admin_flask_session_id,))
             exam_session_row = cursor.fetchone()
 
             if not exam_session_row:
@@ -983,7 +1181,7 @@ def generate_exam_code():
             exam_session_db_id = exam_session_row['id']
 
             # Generate a unique code
-            new_code = _generate_unique_code(conn)
+            new_code = generate_unique_code(conn)
             
             # Update the specific exam session row with the new code
             conn.execute(
@@ -991,6 +1189,10 @@ def generate_exam_code():
                 (new_code, exam_session_db_id)
             )
             conn.commit()
+
+            # Load the exam, with its document ready, before the first student asks for it.
+            exam_registry.invalidate(exam_session_db_id)
+            exam_registry.get(exam_session_db_id)
             
             logger.info(f"Generated exam code '{new_code}' for session ID {exam_session_db_id} by admin '{session.get('username')}'")
 
@@ -1025,8 +1227,11 @@ def set_subject():
     question_length = request.form.get('question-length')
     question_template = request.files['question-template']
     answer_template = request.files['answer-template']
-    # The 'contains-images' value from JS will be 'true' or 'false' as a string
-    contains_images = request.form.get('contains-images') == 'true'
+    # The 'contains-images' value from JS will be 'true', 'false' or 'auto' as a string.
+    # 'auto' lets the extractor decide page by page which pages need to be images.
+    contains_images_value = request.form.get('contains-images')
+    contains_images = contains_images_value == 'true'
+    auto_detect_images = contains_images_value == 'auto'
 
     # --- 3. Server-Side Security and Logic Validation ---
     # This is the crucial backstop validation.
@@ -1050,7 +1255,7 @@ def set_subject():
         
         # --- 5. Update Database ---
         # Ensure a session record exists before updating.
-        get_or_create_exam_session(flask_session_id, admin_username)
+        exam_session = get_or_create_exam_session(flask_session_id, admin_username)
         
         with get_db_connection() as conn:
             conn.execute(
@@ -1058,9 +1263,12 @@ def set_subject():
                    subject_name = ?, question_length = ?, question_template_filename = ?, 
                    answer_template_filename = ?, contains_images = ?
                    WHERE session_id = ?""",
-                (subject, question_length, q_filename, a_filename, 1 if contains_images else 0, flask_session_id)
+                (subject, question_length, q_filename, a_filename,
+                 IMAGE_MODE_AUTO if auto_detect_images else IMAGE_MODE_ON if contains_images else IMAGE_MODE_OFF,
+                 flask_session_id)
             )
             conn.commit()
+        exam_registry.invalidate(exam_session['id'])
 
         logger.info(f"Admin '{admin_username}' successfully configured subject '{subject}'.")
         # The 'success' flag is for compatibility with your JS.
@@ -1084,7 +1292,7 @@ def viewer():
         return jsonify({"message": "No active session found. Please log in again."}), 404
 
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(read_only=True) as conn:
             # Fetch the entire session row using the session_id
             exam = conn.execute(
                 "SELECT * FROM exam_sessions WHERE session_id = ?",
@@ -1103,7 +1311,8 @@ def viewer():
                 "question_length": exam['question_length'],
                 "question_template_filename": exam['question_template_filename'],
                 "answer_template_filename": exam['answer_template_filename'],
-                "contains_images": bool(exam['contains_images'])
+                "contains_images": exam['contains_images'] == IMAGE_MODE_ON,
+                "auto_detect_images": exam['contains_images'] == IMAGE_MODE_AUTO
             }
             # We can add more details here in the future if needed
         }
@@ -1127,8 +1336,10 @@ def viewer():
 @require_login
 def extractor():
     """
-    Extracts questions and answers from the templates configured for the current
-    admin's session and stores the extracted data in the database.
+    Queues extraction of the question and answer templates configured for the
+    current admin's session. Responds immediately with a job id; progress is
+    pushed over Socket.IO to this session's connections as 'extraction_progress'
+    events and can also be polled from /extractor/jobs/<job_id>.
     """
     flask_session_id = session.get('session_id')
     logger.info(f"Extractor called for session: {flask_session_id}")
@@ -1137,7 +1348,8 @@ def extractor():
     try:
         with get_db_connection() as conn:
             exam = conn.execute(
-                "SELECT question_template_filename, answer_template_filename, contains_images FROM exam_sessions WHERE session_id = ?",
+                """SELECT id, question_template_filename, answer_template_filename, contains_images, question_length
+                   FROM exam_sessions WHERE session_id = ?""",
                 (flask_session_id,)
             ).fetchone()
     except sqlite3.Error as e:
@@ -1149,56 +1361,141 @@ def extractor():
 
     q_path = os.path.join(app.config['UPLOAD_FOLDER'], exam['question_template_filename'])
     a_path = os.path.join(app.config['UPLOAD_FOLDER'], exam['answer_template_filename'])
-    contains_images = bool(exam['contains_images'])
+    contains_images = extractor_image_mode(exam['contains_images'])
 
-    # --- 2. Process Files using the Corrected `extractdocx` Module ---
+    # --- 2. Queue the Extraction ---
+    # Queuing again while this exam's job is still pending returns the same job.
+    extraction_job_rooms[f"exam-{exam['id']}"] = session_room(flask_session_id)
     try:
-        # --- Question Processing ---
-        # The new `extract_content` handles all the logic internally.
-        question_content, question_images = extractdocx.extract_content(q_path, contains_images)
-        
-        # If the question file only contained images, the 'question_content' will be the list of images.
-        # Otherwise, it's text. We store whatever is most relevant.
-        extracted_questions_data = question_images if contains_images else question_content
-        
-        # --- Answer Processing ---
-        # We always need plain text from the answer file.
-        answer_text = extractdocx.extract_text_from_any_file(a_path)
-        formatted_answers = extractdocx.format_extracted_answers(answer_text)
+        job = extraction_jobs.submit(
+            f"exam-{exam['id']}", run_extraction_job, exam['id'], q_path, a_path, contains_images,
+            exam['question_length']
+        )
+    except JobQueueFull as e:
+        logger.warning(f"Extraction for session {flask_session_id} rejected: {e}")
+        return jsonify({'error': str(e)}), 503
 
-        if not formatted_answers:
-             logger.warning(f"No answers could be formatted from file: {exam['answer_template_filename']}")
-             # Optionally, you can decide to return an error here if no answers are found.
-             # For now, we'll proceed but it's good to be aware of.
+    return jsonify({
+        'message': 'Extraction queued',
+        'job_id': job.id,
+        'status': job.status,
+    }), 202
+
+
+@app.route('/extractor/jobs', methods=['GET'])
+@require_login
+def list_extraction_jobs():
+    """Lists the extraction jobs the server still remembers, oldest first."""
+    return jsonify({'jobs': [job.to_dict() for job in extraction_jobs.jobs()]}), 200
+
+
+@app.route('/extractor/jobs/<job_id>', methods=['GET'])
+@require_login
+def extraction_job_status(job_id):
+    """Returns the status, progress and (once done) result of one extraction job."""
+    job = extraction_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown extraction job.'}), 404
+    return jsonify(job.to_dict()), 200
 
-    except (NotImplementedError, ValueError, FileNotFoundError) as e:
-        logger.error(f"File processing error for session {flask_session_id}: {e}")
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        logger.error(f"Unexpected error during extraction: {e}", exc_info=True)
-        return jsonify({'error': 'An unexpected error occurred during file extraction.'}), 500
 
-    # --- 3. Store Extracted Data in the Database ---
+def run_extraction_job(job, exam_session_db_id, q_path, a_path, contains_images, question_length=None):
+    """
+    Runs on an extraction job thread. The documents are parsed in an isolated worker
+    process, which sends back the answers and then the question pages one at a
+    time; they are spooled to a temporary file, reporting progress after every
+    page, and once the worker has finished they replace the exam's pages in a
+    single transaction. The exam keeps its previous pages if the job fails, and
+    the database write lock is only held while the pages are stored. The returned
+    summary becomes the job's result, including a check of the questions found
+    against `question_length`. A worker that times out, runs out of memory or
+    crashes fails the job with an `ExtractionWorkerError` and its error code.
+    """
+    results = extraction_worker.iter_isolated(
+        extraction_worker.extract_exam,
+        (
+            q_path, a_path, contains_images,
+            (extraction_cache.cache_dir, extraction_cache.max_bytes),
+            (asset_store.root_dir, asset_store.url_prefix),
+            app.config['EXTRACTOR_WORKERS'],
+            app.config['EXTRACTION_MEMORY_CEILING'] or None,
+        ),
+        timeout=app.config['EXTRACTION_JOB_TIMEOUT'],
+        memory_limit=app.config['EXTRACTION_JOB_MEMORY_LIMIT'],
+    )
     try:
-        with get_db_connection() as conn:
-            conn.execute(
-                "UPDATE exam_sessions SET extracted_questions_json = ?, extracted_answers_json = ? WHERE session_id = ?",
-                (json.dumps(extracted_questions_data), json.dumps(formatted_answers), flask_session_id)
-            )
-            conn.commit()
-    except sqlite3.Error as e:
-        logger.error(f"DB error saving extracted data: {e}")
-        return jsonify({'error': 'Database error occurred while saving results.'}), 500
+        # --- Answer Processing ---
+        _, formatted_answers = next(results)
+        if not formatted_answers:
+            logger.warning(f"No answers could be formatted from file: {os.path.basename(a_path)}")
+
+        # --- Question Processing ---
+        _, total_pages = next(results)
+        job.report(0, total_pages)
+
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            for _, page in results:
+                spool.write(json.dumps(page) + '\n')
+                job.report(page['page'], total_pages)
+            spool.seek(0)
+
+            # One transaction: students see the old pages or the new ones, never a mix.
+            with get_db_connection() as conn:
+                conn.execute("DELETE FROM exam_pages WHERE exam_session_id = ?", (exam_session_db_id,))
+                page_count, image_refs, index = store_question_pages(
+                    conn, exam_session_db_id, contains_images, (json.loads(line) for line in spool)
+                )
+                conn.execute(
+                    """UPDATE exam_sessions SET question_page_count = ?, image_refs_json = ?, question_index_json = ?,
+                       extracted_questions_json = NULL, extracted_answers_json = ?, answer_key_vector = ? WHERE id = ?""",
+                    (page_count, json.dumps(image_refs), json.dumps(index), json.dumps(formatted_answers),
+                     answer_vectors.pack_answer_key(formatted_answers), exam_session_db_id)
+                )
+                document = prerender_exam_document(conn, exam_session_db_id)
+                conn.commit()
+                payload = publish_exam_document(conn, exam_session_db_id, document)
+            exam_registry.invalidate(exam_session_db_id)
+            # The previous version is only dropped once students are served this one.
+            exam_payloads.retire(exam_session_db_id, keep=payload.etag)
+    finally:
+        results.close()  # Kills the worker if we stopped early
+        extraction_cache.reload()  # Pick up the entries the worker added
+
+    question_check = question_index.validate_question_index(index, int(question_length or 0))
+    if not question_check['ok']:
+        logger.warning(f"Question check failed for exam {exam_session_db_id}: {question_check}")
+
+    logger.info(f"Extraction successful for exam {exam_session_db_id}: {page_count} pages.")
+    return {
+        'question_pages': page_count,
+        'question_images': len(image_refs),
+        'question_check': question_check,
+        'answer_content': formatted_answers,
+    }
 
-    logger.info(f"Extraction successful for session {flask_session_id}.")
 
-    # --- 4. Return a Consistent Response to the Frontend ---
-    return jsonify({
-        'message': 'Extraction successful',
-        'question_content': question_content,
-        'question_images': question_images,
-        'answer_content': formatted_answers, # Return the structured answers
-    }), 200
+@app.route('/admin/extraction_cache', methods=['GET', 'DELETE'])
+@require_login
+def manage_extraction_cache():
+    """
+    GET returns cache statistics. DELETE invalidates the cached extractions of a
+    single uploaded file (when 'filename' is given) or clears the whole cache.
+    """
+    if request.method == 'GET':
+        return jsonify(extraction_cache.stats()), 200
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    if filename:
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+        if not os.path.exists(file_path):
+            return jsonify({"error": f"File '{filename}' not found in uploads."}), 404
+        removed = extraction_cache.invalidate(file_path=file_path)
+    else:
+        removed = extraction_cache.clear()
+
+    logger.info(f"Admin '{session.get('username')}' removed {removed} extraction cache entries.")
+    return jsonify({"message": "Extraction cache updated.", "removed": removed}), 200
     
     
 @app.route('/student', methods=['POST'])
@@ -1223,33 +1520,39 @@ def create_student_portfolio():
         return jsonify({"error": "Both Name and Class are required."}), 400
 
     try:
-        with get_db_connection() as conn:
-            # --- KEY LOGIC: Find the exam session using the provided code ---
-            cursor = conn.execute(
-                "SELECT id FROM exam_sessions WHERE exam_code = ? AND extracted_questions_json IS NOT NULL",
-                (exam_code,)
-            )
-            exam_session_row = cursor.fetchone()
+        # --- KEY LOGIC: Find the exam session using the provided code ---
+        exam = exam_registry.get_by_code(exam_code)
+        if exam is None or exam.question_page_count is None:
+            return jsonify({"error": "Invalid or expired Exam Code, or the exam is not yet ready."}), 404
 
-            if not exam_session_row:
-                return jsonify({"error": "Invalid or expired Exam Code, or the exam is not yet ready."}), 404
-            
-            # The specific database ID of the exam this student will take
-            exam_session_db_id = exam_session_row['id']
-            
-            # Store this specific ID in the student's secure Flask session.
-            # This links the student to this exam for subsequent requests.
-            session['student_exam_session_id'] = exam_session_db_id
+        # The specific database ID of the exam this student will take
+        exam_session_db_id = exam.id
 
-            # Update the specific exam session row with this student's details.
-            # This is useful for the admin to see who took which exam.
-            conn.execute(
-                "UPDATE exam_sessions SET student_details_json = ? WHERE id = ?",
-                (json.dumps(student_details), exam_session_db_id)
-            )
+        with get_db_connection() as conn:
+            # Every student gets their own attempt row, so students sharing a code
+            # never overwrite each other. Submitting the form again before marking
+            # continues the same attempt. The queue is checked before the attempt
+            # is read, so a submission being written is seen in one or the other.
+            pending = session.get('student_attempt_id') is not None and submission_pending(session['student_attempt_id'])
+            attempt = fetch_session_attempt(conn)
+            if (attempt and attempt['exam_session_id'] == exam_session_db_id
+                    and attempt['submitted_at'] is None and not pending
+                    and json.loads(attempt['student_details_json']) == student_details):
+                attempt_id = attempt['attempt_id']
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO exam_attempts (exam_session_id, student_details_json) VALUES (?, ?)",
+                    (exam_session_db_id, json.dumps(student_details))
+                )
+                attempt_id = cursor.lastrowid
             conn.commit()
 
-        logger.info(f"Student '{student_details['name']}' started exam with code '{exam_code}' (Session ID: {exam_session_db_id})")
+            # Store these IDs in the student's secure Flask session.
+            # This links the student to this exam and attempt for subsequent requests.
+            session['student_exam_session_id'] = exam_session_db_id
+            session['student_attempt_id'] = attempt_id
+
+        logger.info(f"Student '{student_details['name']}' started exam with code '{exam_code}' (Session ID: {exam_session_db_id}, Attempt ID: {attempt_id})")
         
         # On success, the frontend will redirect to /examcenter
         return jsonify({"message": "Student portfolio created successfully. Redirecting to exam..."}), 200
@@ -1267,50 +1570,48 @@ def mark():
     Marks the student's submitted answers against the correct answers
     for their specific, code-linked exam session.
     """
-    # Check if the student has an active exam session ID stored.
-    if 'student_exam_session_id' not in session:
+    # Check if the student has an active exam attempt stored.
+    if 'student_attempt_id' not in session or 'student_exam_session_id' not in session:
         return jsonify({"error": "No active exam session found. Please start the exam again."}), 403
 
-    exam_session_db_id = session['student_exam_session_id']
+    attempt_id = session['student_attempt_id']
     student_answers = request.json
 
     if not student_answers:
         return jsonify({'error': 'No answers were provided.'}), 400
 
     try:
-        with get_db_connection() as conn:
-            # Fetch the correct answers for this specific exam session ID
-            exam = conn.execute(
-                "SELECT extracted_answers_json FROM exam_sessions WHERE id = ?",
-                (exam_session_db_id,)
-            ).fetchone()
-
-        if not exam or not exam['extracted_answers_json']:
+        # The packed answer key of the exam of this attempt, loaded with the exam
+        exam = exam_registry.get(session['student_exam_session_id'])
+        if not exam or not exam.answer_key:
             return jsonify({'error': 'Correct answers for this exam could not be found. Please contact the administrator.'}), 404
-            
-        correct_answers = json.loads(exam['extracted_answers_json'])
-        
-        score = 0
-        for q_num, correct_ans in correct_answers.items():
-            # Ensure comparison is case-insensitive and handles different types
-            if student_answers.get(q_num, '').strip().lower() == str(correct_ans).strip().lower():
-                score += 1
 
-        # Save the student's score and answers to their specific exam record
-        with get_db_connection() as conn:
-            conn.execute(
-                "UPDATE exam_sessions SET student_answers_json = ?, student_score = ? WHERE id = ?",
-                (json.dumps(student_answers), score, exam_session_db_id)
-            )
-            conn.commit()
-        
-        logger.info(f"Exam session ID {exam_session_db_id} marked. Score: {score}")
+        # Packing makes the comparison case-insensitive and ignores surrounding spaces.
+        answer_vector = answer_vectors.pack_answers(student_answers)
+        score = answer_vectors.score(exam.answer_key, answer_vector)
+
+        # Queue the student's score and answers for their own attempt. Once this
+        # returns they are safe on disk; the writer stores them within moments.
+        record = {
+            'attempt_id': attempt_id,
+            'answer_vector': answer_vector.hex(),
+            'score': score,
+            'submitted_at': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        queue = get_submission_queue()
+        if queue is not None:
+            session['student_submission_seq'] = queue.submit(record)
+        else:
+            write_submissions([record])
+            session.pop('student_submission_seq', None)
+
+        logger.info(f"Exam attempt ID {attempt_id} marked. Score: {score}")
         
         # Return the final score to the frontend
         return jsonify({'message': 'Scoring complete', 'score': score}), 200
         
     except Exception as e:
-        logger.error(f"An error occurred during marking for session ID {exam_session_db_id}: {e}")
+        logger.error(f"An error occurred during marking for attempt ID {attempt_id}: {e}")
         return jsonify({"error": "An internal error occurred while marking the exam."}), 500
     
 @app.route('/get_score', methods=['GET'])
@@ -1319,20 +1620,15 @@ def get_score():
     Securely retrieves the final score and other relevant details for the
     student's completed exam session, including the exam code.
     """
-    if 'student_exam_session_id' not in session:
+    if 'student_attempt_id' not in session:
         return jsonify({"error": "No completed exam session found for this user."}), 404
 
-    exam_session_db_id = session['student_exam_session_id']
+    attempt_id = session['student_attempt_id']
+    wait_for_submission()
 
     try:
-        with get_db_connection() as conn:
-            # --- KEY CHANGE: Add 'exam_code' to the SELECT query ---
-            exam = conn.execute(
-                """SELECT student_score, question_length, subject_name, exam_code, 
-                          student_details_json, student_answers_json, extracted_answers_json 
-                   FROM exam_sessions WHERE id = ?""",
-                (exam_session_db_id,)
-            ).fetchone()
+        with get_db_connection(read_only=True) as conn:
+            exam = fetch_session_attempt(conn)
 
         if not exam:
             return jsonify({"error": "Could not find the results for your exam session."}), 404
@@ -1343,7 +1639,7 @@ def get_score():
         response_data = {
             "student_score": exam['student_score'],
             "student_details": json.loads(exam['student_details_json'] or '{}'),
-            "student_answers": json.loads(exam['student_answers_json'] or '{}'),
+            "student_answers": attempt_answers(exam),
             "extracted_answers": json.loads(exam['extracted_answers_json'] or '{}'),
         }
         
@@ -1358,28 +1654,33 @@ def get_score():
         return jsonify(response_data), 200
 
     except Exception as e:
-        logger.error(f"Error retrieving score for session ID {exam_session_db_id}: {e}")
+        logger.error(f"Error retrieving score for attempt ID {attempt_id}: {e}")
         return jsonify({"error": "An internal error occurred while fetching your score."}), 500
     
 @app.route('/examcenter')
 @require_login
 def examcenter():
-    flask_session_id = session['session_id']
-    with get_db_connection() as conn:
-        exam = conn.execute("SELECT * FROM exam_sessions WHERE session_id = ?", (flask_session_id,)).fetchone()
+    # Only the student's own details come from the database; the exam is in memory.
+    attempt = None
+    if 'student_attempt_id' in session:
+        with get_db_connection(read_only=True) as conn:
+            attempt = conn.execute(
+                "SELECT exam_session_id, student_details_json FROM exam_attempts WHERE id = ?",
+                (session['student_attempt_id'],)
+            ).fetchone()
+    exam = exam_registry.get(attempt['exam_session_id']) if attempt else None
     
-    if not exam or not exam['student_details_json'] or not exam['extracted_questions_json']:
+    if not exam or exam.question_page_count is None:
         return jsonify({'error': 'Exam data is incomplete for this session.'}), 400
 
-    student_data = json.loads(exam['student_details_json'])
-    extracted_questions = json.loads(exam['extracted_questions_json'])
+    student_data = json.loads(attempt['student_details_json'])
     
     # Add other necessary details to student_data for the template
-    student_data['exam_time'] = exam['exam_time']
+    student_data['exam_time'] = exam.exam_time
     print(f"Exam Time: {student_data['exam_time']}")
 
     # Assuming exam['exam_time'] is an integer (e.g., 240)
-    total_seconds = int(exam['exam_time']) # Ensure it's an integer
+    total_seconds = int(exam.exam_time) # Ensure it's an integer
     
     hours = total_seconds // 3600
     minutes = (total_seconds % 3600) // 60
@@ -1392,126 +1693,187 @@ def examcenter():
     print(f"Exam Time (formatted): {student_data['exam_time']}")
     # --- END OF TIMER FIX ---
 
-    student_data['question_length'] = exam['question_length']
+    student_data['question_length'] = exam.question_length
     print(f"Question Length: {student_data['question_length']}")
 
-    student_data['exam_subject'] = exam['subject_name']
+    student_data['exam_subject'] = exam.subject_name
     print(f"Exam Subject: {student_data['exam_subject']}")
 
-    formatted_document = format_extracted_document_with_embedded_images(extracted_questions)
-    
+    # The document itself is fetched from /examcenter/document, which every
+    # student of the exam is served from the same compressed payload.
     return jsonify({
         'student_data': student_data,
-        'formatted_document': formatted_document,
+        'document_url': '/examcenter/document',
+        'document_etag': exam.document_etag,
+        # The paged view: the first chunk is loaded at once, the rest as the student moves on.
+        'pages': {
+            'total': exam.question_page_count,
+            'chunk_size': app.config['EXAM_PAGE_CHUNK'],
+            'chunks': exam_page_chunk_count(exam.question_page_count),
+            'url': '/examcenter/pages/',
+        },
         'exam_time': formatted_exam_time # Send the formatted string to the frontend
     }), 200
 
-# This function was in the original code, preserved for `/examcenter`
-def format_extracted_document_with_embedded_images(extracted_content):
-    html = '''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Extracted Document</title>
-        <style>
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                color: #ffff;
-                max-width: 100%;
-                margin: 0 auto;
-                padding: 15px;
-                font-size: 16px;
-
-            }
-            h1, h2, h3 {
-            color: #667eea;
-            margin-bottom: 15px;
-            line-height: 1.2;
-        }
+@app.route('/examcenter/document')
+@require_login
+def exam_document():
+    """
+    Serves the whole rendered exam document. It is rendered and compressed once
+    per exam version; the ETag is its content hash, so a reload gets a 304.
+    """
+    exam = fetch_active_exam()
+    if not exam or exam.question_page_count is None:
+        return jsonify({'error': 'Exam data is incomplete for this session.'}), 400
+    payload = exam_payloads.get(exam.id, exam.document_etag)
+    if payload is None:  # Dropped from memory and its files are gone
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT * FROM exam_sessions WHERE id = ?", (exam.id,)).fetchone()
+            payload = load_exam_payload(conn, row)
+        if payload.etag != exam.document_etag:
+            exam_registry.invalidate(exam.id)
+    return exam_payload_response(payload)
 
-        h1 {
-            font-size: 2.5em;
-            border-bottom: 2px solid #e2e8f0;
-            padding-bottom: 10px;
-        }
 
-        h2 {
-            font-size: 2em;
-            margin-top: 30px;
-        }
+@app.route('/examcenter/pages/<int:chunk>')
+@require_login
+def exam_page_chunk(chunk):
+    """
+    Serves one chunk of the exam's pages (see 'pages' in /examcenter) as an HTML
+    fragment, so students can start on the first questions before the rest of the
+    exam has been sent. Chunks are cached and conditional like the full document.
+    """
+    exam = fetch_active_exam()
+    if not exam or exam.question_page_count is None:
+        return jsonify({'error': 'Exam data is incomplete for this session.'}), 400
+    if chunk >= exam_page_chunk_count(exam.question_page_count):
+        return jsonify({'error': f'This exam has no page chunk {chunk}.'}), 404
+    payload = exam_payloads.get(exam.id, exam_chunk_etag(exam.document_etag, chunk))
+    if payload is None:  # Not rendered for this version yet, or dropped from the store
+        with get_db_connection() as conn:
+            payload = load_exam_chunk(conn, exam.id, exam.document_etag, chunk)
+    return exam_payload_response(payload)
 
-        h3 {
-            font-size: 1.5em;
-            margin-top: 25px;
-        }
 
-           p {
-            margin-bottom: 15px;
-            text-align: justify;
-        }
-           .math {
-            font-style: italic;
-            color: #2980b9;
-            background-color: #f1f8ff;
-            padding: 2px 5px;
-            border-radius: 4px;
-        }
-           .image-container {
-            margin: 20px 0;
-            text-align: center;
-        }
+def exam_payload_response(payload):
+    """Returns a stored ExamPayload as HTML, revalidated on every use since the exam may be re-extracted."""
+    return encoded_response(
+        payload.etag, payload.bodies, lambda: response_compression.decompress(payload.bodies['gzip'], 'gzip'),
+        'private, no-cache'
+    )
 
-        .image-container img {
-            max-width: 100%;
-            height: auto;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        }
 
-            ol {
-                padding-left: 30px;
-            }
-            li {
-                margin-bottom: 10px;
-            }
-        </style>
-    </head>
-    <body>
-    '''
-
-    def render_item(item):
-        if isinstance(item, str):
-            if item.startswith('data:image/'):
-                return f'<div class="image-container"><img src="{item}" alt="Exam image"></div>\n'
-            else:
-                return f'<p>{item}</p>\n'
-        elif isinstance(item, dict):
-            text = item.get('text', '')
-            formulas = item.get('formulas', [])
-            rendered_text = f'<p>{text}</p>\n'
-            rendered_formulas = ''.join([f'<p class="math">{formula}</p>\n' for formula in formulas])
-            return rendered_text + rendered_formulas
-        else:
-            logger.warning(f"Unsupported item type: {type(item)}")
-            return ''
-
-    if isinstance(extracted_content, list):
-        for item in extracted_content:
-            html += render_item(item)
-    elif isinstance(extracted_content, str):
-        html += render_item(extracted_content)
+def encoded_response(etag, bodies, identity, cache_control, mimetype='text/html'):
+    """
+    Returns content stored pre-compressed in `bodies` ({encoding: bytes}) in the
+    best encoding the client accepts, or uncompressed from `identity()`. Compressed
+    bytes are sent as stored, never compressed again; a request whose If-None-Match
+    holds the current ETag gets a 304.
+    """
+    encoding = response_compression.choose_encoding(request.accept_encodings, tuple(bodies))
+    etag = f"{etag}-{encoding}" if encoding else etag  # One ETag per representation
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif encoding:
+        response = Response(bodies[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
     else:
-        logger.error(f"Unsupported content type: {type(extracted_content)}")
-        html += '<p>Error: Unable to render content.</p>'
-
-    html += '''
-    </body>
-    </html>
-    '''
-    return html
+        response = Response(identity(), mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def fetch_session_exam(conn):
+    """
+    Returns the exam_sessions row being sat in this browser session: the exam whose
+    code the student entered on /student, or else the admin's own session exam.
+    Exams created by provision_exams.py are only reachable by their code.
+    """
+    exam_session_db_id = session.get('student_exam_session_id')
+    if exam_session_db_id is not None:
+        exam = conn.execute("SELECT * FROM exam_sessions WHERE id = ?", (exam_session_db_id,)).fetchone()
+        if exam:
+            return exam
+    return conn.execute("SELECT * FROM exam_sessions WHERE session_id = ?", (session['session_id'],)).fetchone()
+
+
+def fetch_active_exam():
+    """
+    Returns the ActiveExam for the exam fetch_session_exam would return, taken
+    from the exam registry whenever it is there.
+    """
+    exam_session_db_id = session.get('student_exam_session_id')
+    exam = exam_registry.get(exam_session_db_id) if exam_session_db_id is not None else None
+    if exam is None:
+        with get_db_connection(read_only=True) as conn:
+            row = conn.execute("SELECT id FROM exam_sessions WHERE session_id = ?", (session['session_id'],)).fetchone()
+        exam = exam_registry.get(row['id']) if row else None
+    return exam
+
+
+def attempt_answers(attempt):
+    """Returns an attempt's answers as {'q1': 'A', ...}, from its packed sheet or, for older rows, its JSON."""
+    if attempt['answer_vector'] is not None:
+        return answer_vectors.unpack_answers(attempt['answer_vector'])
+    return json.loads(attempt['student_answers_json'] or '{}')
+
+
+def fetch_session_attempt(conn):
+    """
+    Returns the attempt started on /student in this browser session, joined with
+    its exam_sessions row, or None. `id` is the exam's id and `attempt_id` the attempt's.
+    """
+    attempt_id = session.get('student_attempt_id')
+    if attempt_id is None:
+        return None
+    return conn.execute(
+        """SELECT a.id AS attempt_id, a.exam_session_id, a.student_details_json, a.student_answers_json,
+                  a.answer_vector, a.student_score, a.started_at, a.submitted_at, e.*
+           FROM exam_attempts a JOIN exam_sessions e ON e.id = a.exam_session_id
+           WHERE a.id = ?""",
+        (attempt_id,)
+    ).fetchone()
+
+
+@app.route('/examcenter/questions')
+@require_login
+def exam_question_index():
+    """
+    Returns the exam's question index without the question text: the number, pages
+    and option letters of each question, for jump-to-question navigation, and a
+    check of the questions found against the exam's question length.
+    """
+    with get_db_connection() as conn:
+        exam = fetch_session_exam(conn)
+        if not exam or exam['question_page_count'] is None:
+            return jsonify({'error': 'Exam data is incomplete for this session.'}), 400
+        index = load_question_index(conn, exam)
+
+    return jsonify({
+        'questions': [
+            {'number': q['number'], 'page': q['page'], 'pages': q['pages'], 'options': list(q['options'])}
+            for q in index['questions']
+        ],
+        'question_check': question_index.validate_question_index(index, int(exam['question_length'] or 0)),
+    }), 200
+
+
+@app.route('/examcenter/questions/<int:number>')
+@require_login
+def exam_question(number):
+    """Returns a single question from the index: its text, stem, options and images."""
+    with get_db_connection() as conn:
+        exam = fetch_session_exam(conn)
+        if not exam or exam['question_page_count'] is None:
+            return jsonify({'error': 'Exam data is incomplete for this session.'}), 400
+        question = question_index.find_question(load_question_index(conn, exam), number)
+
+    if question is None:
+        return jsonify({'error': f'Question {number} was not found in this exam.'}), 404
+    return jsonify(question), 200
+
 def format_paragraph(paragraph, question_length):
     """
     Format a paragraph of text by converting any math expressions to HTML and returning formatted text.
@@ -1531,15 +1893,15 @@ def format_paragraph(paragraph, question_length):
 @app.route('/Resultbank', methods=['POST'])
 @require_login
 def result_bank():
-    flask_session_id = session['session_id']
+    wait_for_submission()
     with get_db_connection() as conn:
-        exam = dict(conn.execute("SELECT * FROM exam_sessions WHERE session_id = ?", (flask_session_id,)).fetchone())
+        exam = dict(fetch_session_attempt(conn) or {})
 
-    if not all(k in exam and exam[k] is not None for k in ['student_details_json', 'student_answers_json', 'extracted_answers_json', 'student_score']):
+    if not all(k in exam and exam[k] is not None for k in ['student_details_json', 'extracted_answers_json', 'student_score']):
         return jsonify({'error': 'Incomplete exam data for result generation.'}), 400
 
     student_details = json.loads(exam['student_details_json'])
-    student_answers = json.loads(exam['student_answers_json'])
+    student_answers = attempt_answers(exam)
     correct_answers = json.loads(exam['extracted_answers_json'])
 
     filename = f"{student_details['name']}_{student_details['class']}_results.txt"
@@ -1590,6 +1952,9 @@ def handle_connect():
     }
     
     if is_admin:
+        join_room(ADMIN_ROOM)
+        if session.get('session_id'):
+            join_room(session_room(session['session_id']))  # For progress of the jobs it queues
         logger.info(f"Admin '{name}' connected via Socket.IO with SID: {sid}")
     else:
         logger.info(f"Client connected: {connected_clients[sid]}")
@@ -1676,25 +2041,24 @@ This approach avoids page reload and keeps the user on the same page.
 
 @app.route('/Admin1')
 def Admin1():
-    return render_template('Admin1.html')
+    return render_static_page('Admin1.html')
 
 @app.route('/subject')
 def subject():
     """Render the Subject.html page."""
-    return render_template('Subject.html')
+    return render_static_page('Subject.html')
 
 
 @app.route('/Admin2')
 def Adminpage():
     """Render the Admin2body.html page."""
-    timestamp = int(datetime.datetime.now().timestamp())
-    return render_template('Admin2body.html', timestamp=timestamp)
+    return render_static_page('Admin2body.html')
 
 
 
 @app.route('/dialogue1')
 def dialogue1():
-    return render_template('Dialouge1.html')
+    return render_static_page('Dialouge1.html')
 
 @app.route('/timepage')
 def timepage():
@@ -1703,51 +2067,50 @@ def timepage():
 @app.route('/classFolder')
 def render_class_folder():
     """Render the classFolder.html template."""
-    return render_template('classFolder.html')
+    return render_static_page('classFolder.html')
 
 @app.route('/welcome')
 def welcome_screen():
-    return render_template('welcome.html')
+    return render_static_page('welcome.html')
 
 @app.route('/video')
 def video_player():
-    return render_template('video.html')
+    return render_static_page('video.html')
 
 @app.route('/video404', methods=['GET'])
 def video_page():
-    return render_template('404.html')
+    return render_static_page('404.html')
 
 
 @app.route('/examloader')
 def examloader2():
     """Render the examloader.html page."""
-    return render_template('examloader2.html')
+    return render_static_page('examloader2.html')
 
 @app.route('/connect')
 def connect_scan():
-    return render_template('connect.html')
+    return render_static_page('connect.html')
 
 @app.route('/dashboard')
 def dashboard():
-    return render_template('Autofile.html')
+    return render_static_page('Autofile.html')
 
 
 @app.route('/stlogin')
 def stlogin():
     """Render the studentform.html page."""
-    return render_template('studentform.html')
+    return render_static_page('studentform.html')
 
 
 @app.route('/scoreboard')
 def scoreboard():
     """Render the scoreboard.html page."""
-    timestamp = int(datetime.datetime.now().timestamp())
-    return render_template('Score.html', timestamp=timestamp)
+    return render_static_page('Score.html')
 
 @app.route('/pencilLoader')
 def pencilLoader():
     """Render the pencilLoader page"""
-    return render_template('pencil.html')
+    return render_static_page('pencil.html')
 
 
 @app.route('/Result_list')
@@ -1758,7 +2121,7 @@ def list_results():
 
 @app.route('/main_display')
 def main_display():
-    return render_template('examcenter2.html')
+    return render_static_page('examcenter2.html')
 
 @app.errorhandler(Exception)
 def handle_exception(e):
@@ -1769,12 +2132,12 @@ def handle_exception(e):
 
 @app.route('/result')
 def result():
-    return render_template('resultspage.html')
+    return render_static_page('resultspage.html')
 
 
 @app.route('/login')
 def login():
-    return render_template('login.html')
+    return render_static_page('login.html')
 
 @app.route('/RRset')
 def RRset():
@@ -1782,11 +2145,11 @@ def RRset():
 
 @app.route('/profile')
 def profile():
-    return render_template('profilecard.html')
+    return render_static_page('profilecard.html')
 
 @app.route('/resultPortal')
 def resultPortal():
-    return render_template('Admin1Results.html')
+    return render_static_page('Admin1Results.html')
 
 @app.errorhandler(404)
 def page_not_found(e):
@@ -1852,6 +2215,7 @@ def get_host_ip():
 
 def run_flask():
     """Starts the Flask-SocketIO server."""
+    start_submission_queue()
     logger.info("Starting Flask-SocketIO server on http://0.0.0.0:5000")
     # use_reloader=False is important when running in a separate process
     socketio.run(app, host='0.0.0.0', port=5000, use_reloader=False, allow_unsafe_werkzeug=True)
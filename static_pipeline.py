@@ -0,0 +1,184 @@
+# static_pipeline.py fingerprints, minifies and pre-compresses the front-end files and pages
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+
+import response_compression
+
+# The minifiers are optional; without them files are fingerprinted and compressed only.
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+
+logger = logging.getLogger('static_pipeline')
+
+# Built files keep their path and gain the start of their content hash, e.g.
+# 'examprocess.js' -> 'examprocess.3fa9c2e1b0d4.js'.
+FINGERPRINT_LENGTH = 12
+BUILT_NAME_PATTERN = re.compile(r'^(?:[\w\-]+/)*[\w.\-]+\.[0-9a-f]{12}(?:\.\w+)?$')
+# File extension of each stored content encoding.
+ENCODING_EXTENSIONS = {'gzip': 'gz', 'br': 'br'}
+MANIFEST_NAME = 'manifest.json'
+
+# A page rendered once: `etag` is its content hash, `body` the HTML bytes and
+# `bodies` maps each supported content encoding to the HTML compressed with it.
+PrerenderedPage = namedtuple('PrerenderedPage', 'etag body bodies')
+
+
+class StaticAssetPipeline:
+    """
+    The build step for the front end. `build` copies every file in the static
+    folder to `build_dir` under a name that contains its content hash, minifying
+    JavaScript and CSS first and storing compressed copies of text files next to
+    them. A built file's content never changes, so it can be served with an
+    immutable cache lifetime; a changed file gets a new name and URL.
+
+    `page` keeps templates that need no request data rendered and compressed
+    once, so serving them is a dictionary lookup.
+    """
+
+    def __init__(self, static_dir, build_dir, url_prefix='/static-build'):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self._manifest = {}  # Filename under static_dir -> built name
+        self._pages = {}     # Template name -> PrerenderedPage
+        self._lock = threading.Lock()
+        os.makedirs(self.build_dir, exist_ok=True)
+
+    def build(self):
+        """
+        Builds every file in the static folder and removes built files that are no
+        longer current. Files already built with the same content are not rebuilt.
+        Returns the manifest: {filename: built name}.
+        """
+        manifest = {}
+        if os.path.isdir(self.static_dir):
+            for root, _, files in os.walk(self.static_dir):
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    filename = os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+                    try:
+                        manifest[filename] = self._build_file(path, filename)
+                    except OSError as e:
+                        logger.warning(f"Could not build static file '{filename}': {e}")
+        else:
+            logger.warning(f"Static folder '{self.static_dir}' not found; nothing to build.")
+
+        self._remove_stale(set(manifest.values()))
+        with open(os.path.join(self.build_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        with self._lock:
+            self._manifest = manifest
+            self._pages.clear()  # Pages link to built names
+        logger.info(f"Built {len(manifest)} static files into '{self.build_dir}'.")
+        return manifest
+
+    def url_for(self, filename):
+        """Returns the URL of the built copy of a static file, or None if it has none."""
+        built = self._manifest.get(filename)
+        return f"{self.url_prefix}/{built}" if built else None
+
+    def built_file(self, name, accept_encodings):
+        """
+        Returns (path, encoding) of the file to send for a built name: a stored
+        compressed copy in the best encoding the client accepts (a werkzeug Accept
+        object), or the built file itself with encoding None. Returns None for
+        names that were not built.
+        """
+        if not BUILT_NAME_PATTERN.match(name) or name == MANIFEST_NAME:
+            return None
+        path = os.path.join(self.build_dir, *name.split('/'))
+        if not os.path.isfile(path):
+            return None
+        stored = tuple(encoding for encoding in response_compression.SUPPORTED_ENCODINGS
+                       if os.path.isfile(f"{path}.{ENCODING_EXTENSIONS[encoding]}"))
+        encoding = response_compression.choose_encoding(accept_encodings, stored)
+        if encoding:
+            return f"{path}.{ENCODING_EXTENSIONS[encoding]}", encoding
+        return path, None
+
+    def page(self, template_name, render):
+        """
+        Returns the PrerenderedPage of a template, calling `render()` for its HTML
+        the first time it is asked for.
+        """
+        with self._lock:
+            page = self._pages.get(template_name)
+        if page is not None:
+            return page
+        body = render().encode('utf-8')
+        page = PrerenderedPage(
+            hashlib.sha256(body).hexdigest(),
+            body,
+            {encoding: response_compression.compress(body, encoding, response_compression.STATIC_LEVELS[encoding])
+             for encoding in response_compression.SUPPORTED_ENCODINGS},
+        )
+        with self._lock:
+            self._pages[template_name] = page
+        return page
+
+    # --- Internals ---
+
+    def _build_file(self, path, filename):
+        with open(path, 'rb') as f:
+            data = _minify(filename, f.read())
+        stem, extension = os.path.splitext(filename)
+        built = f"{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}{extension}"
+        built_path = os.path.join(self.build_dir, *built.split('/'))
+        if not os.path.exists(built_path):
+            os.makedirs(os.path.dirname(built_path), exist_ok=True)
+            _write_atomically(built_path, data)
+        if _is_compressible(filename):
+            for encoding in response_compression.SUPPORTED_ENCODINGS:
+                compressed_path = f"{built_path}.{ENCODING_EXTENSIONS[encoding]}"
+                if not os.path.exists(compressed_path):
+                    level = response_compression.STATIC_LEVELS[encoding]
+                    _write_atomically(compressed_path, response_compression.compress(data, encoding, level))
+        return built
+
+    def _remove_stale(self, current):
+        for root, _, files in os.walk(self.build_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, self.build_dir).replace(os.sep, '/')
+                base, extension = os.path.splitext(name)
+                if extension.lstrip('.') in ENCODING_EXTENSIONS.values() and base in current:
+                    continue
+                if name != MANIFEST_NAME and name not in current:
+                    os.remove(path)
+
+
+def _minify(filename, data):
+    """Minifies JavaScript and CSS when the minifiers are installed; other files are returned as they are."""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    minifier = {'js': rjsmin and rjsmin.jsmin, 'css': rcssmin and rcssmin.cssmin}.get(extension)
+    if not minifier:
+        return data
+    try:
+        return minifier(data.decode('utf-8')).encode('utf-8')
+    except UnicodeDecodeError:
+        return data
+
+
+def _is_compressible(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return extension in {'js', 'css', 'html', 'htm', 'json', 'svg', 'txt', 'map'}
+
+
+def _write_atomically(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)  # Atomic, so a concurrent reader never sees a partial file
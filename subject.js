@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const questionTemplateInput = document.getElementById('question-template');
     const answerTemplateInput = document.getElementById('answer-template');
     const containsImagesCheckbox = document.getElementById('contains-images');
+    const autoDetectImagesCheckbox = document.getElementById('auto-detect-images');
     const resetBtn = document.getElementById('resetBtn');
     const saveSubjectBtn = document.getElementById('saveSubjectBtn');
     const socket = io();
@@ -38,6 +39,13 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // --- Event Listeners ---
     resetBtn.addEventListener('click', resetForm);
+    // The two image options are mutually exclusive.
+    containsImagesCheckbox.addEventListener('change', () => {
+        if (containsImagesCheckbox.checked) autoDetectImagesCheckbox.checked = false;
+    });
+    autoDetectImagesCheckbox.addEventListener('change', () => {
+        if (autoDetectImagesCheckbox.checked) containsImagesCheckbox.checked = false;
+    });
     saveSubjectBtn.addEventListener('click', saveSubject);
 
     // --- Functions ---
@@ -51,6 +59,7 @@ document.addEventListener('DOMContentLoaded', function() {
         questionTemplateInput.value = ''; // This clears the file selection in the input
         answerTemplateInput.value = '';
         containsImagesCheckbox.checked = false;
+        autoDetectImagesCheckbox.checked = false;
         console.log("Form has been reset.");
     }
 
@@ -93,7 +102,8 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('question-length', questionLengthInput.value);
         formData.append('question-template', questionFile);
         formData.append('answer-template', answerTemplateInput.files[0]);
-        formData.append('contains-images', containsImages); // Sends 'true' or 'false'
+        // Sends 'true' or 'false', or 'auto' to let the server decide page by page
+        formData.append('contains-images', autoDetectImagesCheckbox.checked ? 'auto' : containsImages);
 
         // --- 3. Disable button to prevent multiple submissions ---
         saveSubjectBtn.disabled = true;
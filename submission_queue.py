@@ -0,0 +1,263 @@
+# submission_queue.py accepts exam submissions into a durable log and writes them to the database in batches
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger('submission_queue')
+
+LOG_NAME = 'submissions.log'
+CHECKPOINT_NAME = 'submissions.checkpoint'
+LOCK_NAME = 'submissions.lock'
+DEAD_LETTER_NAME = 'submissions.dead'
+
+
+class SubmissionQueueLocked(RuntimeError):
+    """Raised when another process already has a queue open over the same directory."""
+
+
+class SubmissionQueue:
+    """
+    A write-behind queue for exam submissions. `submit` appends a record to an
+    append-only log and returns once the log is on disk; concurrent submitters
+    share one fsync (group commit), so a hall submitting at once costs a handful
+    of fsyncs rather than one per student. A writer thread drains the records in
+    batches of up to `max_batch`, waiting up to `max_delay` seconds for a batch
+    to fill, and passes each batch to `apply_batch(records)`, which must write
+    them in a single transaction and be idempotent.
+
+    Each record gets a sequence number. The last applied one is kept in a
+    checkpoint file, and once everything logged has been applied the log is
+    emptied. Records logged but not applied when the process stopped are applied
+    again when the queue is next created over the same directory.
+
+    A batch that fails is retried `max_attempts` times, `retry_delay` seconds
+    apart, then split in halves down to single records, so that one record the
+    database rejects does not hold back the rest. A record that still fails is
+    logged and appended to a dead-letter file in the directory, from which it
+    can be inspected and applied by hand.
+
+    Only one queue may be open over a directory at a time: the constructor
+    takes an exclusive lock on a file in it, held until `close`, and raises
+    SubmissionQueueLocked if another process holds it.
+    """
+
+    def __init__(self, queue_dir, apply_batch, max_batch=256, max_delay=0.02, fsync=True, retry_delay=1.0,
+                 max_attempts=5):
+        self.queue_dir = queue_dir
+        self.apply_batch = apply_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.retry_delay = retry_delay
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(self.queue_dir, exist_ok=True)
+        self._log_path = os.path.join(self.queue_dir, LOG_NAME)
+        self._checkpoint_path = os.path.join(self.queue_dir, CHECKPOINT_NAME)
+        self._dead_letter_path = os.path.join(self.queue_dir, DEAD_LETTER_NAME)
+        self._lock_file = self._lock_queue_dir()
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)   # Signalled when the log is flushed to disk
+        self._pending = threading.Condition(self._lock)  # Signalled when records are queued
+        self._applied = threading.Condition(self._lock)  # Signalled when a batch has been written
+        self._queue = deque()
+        self._syncing = False
+        self._closed = False
+
+        self._applied_seq = self._read_checkpoint()
+        self._queue.extend(record for record in self._read_log() if record['seq'] > self._applied_seq)
+        self._appended_seq = self._synced_seq = max([self._applied_seq] + [r['seq'] for r in self._queue])
+        if self._queue:
+            logger.info(f"Replaying {len(self._queue)} submissions that were not yet written.")
+        # Start from a log of just those records, without any partly written last line.
+        tmp_path = f"{self._log_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record, separators=(',', ':')) + '\n' for record in self._queue)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._log_path)
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+        self._writer = threading.Thread(target=self._run_writer, name='submission-writer', daemon=True)
+        self._writer.start()
+
+    def submit(self, record):
+        """
+        Logs a record (a JSON-serializable dict) durably and queues it for the
+        writer. Returns its sequence number.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The submission queue is closed.")
+            self._appended_seq += 1
+            seq = self._appended_seq
+            record = dict(record, seq=seq)
+            self._log.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._queue.append(record)
+            self._pending.notify()
+
+            # Group commit: whoever finds no flush in progress flushes everything
+            # written so far; the rest wait for a flush that covers their record.
+            while self._synced_seq < seq:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+                self._syncing = True
+                target = self._appended_seq
+                self._log.flush()
+                self._lock.release()
+                try:
+                    if self.fsync:
+                        os.fsync(self._log.fileno())
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._synced_seq = max(self._synced_seq, target)
+                    self._truncate_if_caught_up()
+                    self._synced.notify_all()
+        return seq
+
+    def has_pending(self, **fields):
+        """
+        Tells whether a record with these field values is queued but not yet
+        written. A record leaves the queue only once it has been written.
+        """
+        with self._lock:
+            return any(all(record.get(name) == value for name, value in fields.items()) for record in self._queue)
+
+    def wait_applied(self, seq, timeout=None):
+        """Waits until the record `seq` has been written; returns False on timeout."""
+        with self._lock:
+            return self._applied.wait_for(lambda: self._applied_seq >= seq, timeout)
+
+    def close(self, timeout=10):
+        """Stops accepting records and waits for the writer to write those queued."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify()
+        self._writer.join(timeout)
+        with self._lock:
+            self._log.close()
+            self._lock_file.close()  # Releases the directory lock
+
+    # --- Internals ---
+
+    def _lock_queue_dir(self):
+        lock_file = open(os.path.join(self.queue_dir, LOCK_NAME), 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise SubmissionQueueLocked(
+                f"The submission queue in {self.queue_dir} is already open in another process."
+            )
+        return lock_file
+
+    def _run_writer(self):
+        while True:
+            with self._lock:
+                self._pending.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return  # Closed and drained
+                if len(self._queue) < self.max_batch and not self._closed:
+                    # Let a burst of submissions gather into one transaction.
+                    self._pending.wait_for(lambda: len(self._queue) >= self.max_batch or self._closed,
+                                           self.max_delay)
+                batch = [self._queue[i] for i in range(min(self.max_batch, len(self._queue)))]
+
+            if not self._apply(batch, self.max_attempts):
+                return  # Closed while retrying; the batch stays in the log and is replayed on the next start
+
+            with self._lock:
+                for _ in batch:
+                    self._queue.popleft()
+                self._applied_seq = batch[-1]['seq']
+                self._write_checkpoint()
+                self._truncate_if_caught_up()
+                self._applied.notify_all()
+
+    def _apply(self, batch, attempts):
+        """
+        Writes a batch, trying up to `attempts` times, and splits a batch that
+        still fails in halves; single records that keep failing are dead-lettered.
+        Returns False if the queue was closed in the meantime.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                self.apply_batch(batch)
+                return True
+            except Exception as e:
+                error = e
+                logger.error(f"Could not write {len(batch)} submissions (attempt {attempt} of {attempts}): {e}")
+            if self._closed:
+                return False
+            if attempt < attempts:
+                time.sleep(self.retry_delay)
+
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            # Halves are tried once; only single records get every attempt again.
+            return all(self._apply(half, 1 if len(half) > 1 else self.max_attempts)
+                       for half in (batch[:middle], batch[middle:]))
+        self._dead_letter(batch[0], error)
+        return True
+
+    def _dead_letter(self, record, error):
+        logger.error(f"Giving up on submission {record['seq']}; moved to {self._dead_letter_path}: {error}")
+        with open(self._dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(record, error=str(error)), separators=(',', ':')) + '\n')
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())  # The log is emptied once the checkpoint passes this record
+
+    def _truncate_if_caught_up(self):
+        # Called with the lock held. Once everything logged is on disk and in the
+        # database, the log starts afresh.
+        if self._applied_seq == self._synced_seq == self._appended_seq and not self._syncing:
+            self._log.truncate(0)
+
+    def _read_checkpoint(self):
+        try:
+            with open(self._checkpoint_path, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_checkpoint(self):
+        # Not fsynced: a checkpoint lost in a crash only means some records are applied twice.
+        tmp_path = f"{self._checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(self._applied_seq))
+        os.replace(tmp_path, self._checkpoint_path)
+
+    def _read_log(self):
+        records = []
+        try:
+            with open(self._log_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        logger.warning("Skipping a partly written submission at the end of the log.")
+                        break
+        except FileNotFoundError:
+            pass
+        return records
@@ -0,0 +1,58 @@
+# Tests that extraction_worker reports running out of memory under its memory limit
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import extraction_worker
+from extraction_worker import ExtractionWorkerError, ERROR_MEMORY_LIMIT, ERROR_FAILED
+
+pytestmark = pytest.mark.skipif(extraction_worker.resource is None, reason="memory limits need POSIX rlimits")
+
+ALLOCATION_BYTES = 768 * 1024 * 1024
+
+
+def _address_space_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmSize:'):
+                return int(line.split()[1]) * 1024
+    pytest.skip("cannot read this process's address space size")
+
+
+def _limit():
+    # The worker is forked from this process, so it starts at this size; leave
+    # room for ordinary work but not for the allocation the targets make.
+    return _address_space_bytes() + ALLOCATION_BYTES // 3
+
+
+def render_huge_pixmap():
+    side = int((ALLOCATION_BYTES / 3) ** 0.5)
+    fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, side, side))  # MuPDF's malloc fails under the limit
+    yield 'unreachable'
+
+
+def allocate_python_bytes():
+    yield len(bytearray(ALLOCATION_BYTES))
+
+
+def fail_normally():
+    raise RuntimeError("not a memory problem")
+    yield
+
+
+@pytest.mark.parametrize('target', [render_huge_pixmap, allocate_python_bytes])
+def test_allocation_failure_under_memory_limit_is_reported_as_memory_limit(target):
+    with pytest.raises(ExtractionWorkerError) as error:
+        list(extraction_worker.iter_isolated(target, timeout=60, memory_limit=_limit()))
+    assert error.value.code == ERROR_MEMORY_LIMIT
+
+
+def test_other_errors_are_not_reported_as_memory_limit():
+    with pytest.raises(ExtractionWorkerError) as error:
+        list(extraction_worker.iter_isolated(fail_normally, timeout=60, memory_limit=_limit()))
+    assert error.value.code == ERROR_FAILED